@@ -0,0 +1,94 @@
+"""
+Micro-benchmark: building every figure for a 500-user chat, and fixing the Hebrew
+word-cloud labels (the only labels reordered for display) with their cache cold
+(cleared before each run) and warm
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from hebrew_utils import _reshape_and_reorder, fix_labels
+import visualizer
+
+HEBREW_NAMES = ['יונתן', 'דנה', 'נועה', 'איתי', 'מיכל', 'אורי', 'שירה', 'עומר']
+ENGLISH_NAMES = ['John', 'Sarah', 'Mike', 'Emma', 'David', 'Lisa', 'Tom', 'Anna']
+
+
+def make_results(n_users=500, seed=0):
+    """
+    Build analysis-like results for n_users, half with Hebrew names
+    """
+    rng = random.Random(seed)
+    users = [f"{rng.choice(HEBREW_NAMES if i % 2 else ENGLISH_NAMES)} {i}" for i in range(n_users)]
+    per_user = {user: rng.randint(1, 5000) for user in users}
+    return {
+        'messages_per_user': per_user,
+        'avg_message_length': {user: rng.uniform(5, 80) for user in users},
+        'laughs_per_user': per_user,
+        'avg_response_time_per_user': {user: f"{rng.randint(0, 5)}h {rng.randint(0, 59)}m 0s" for user in users},
+        'emoji_per_user': per_user,
+        'message_bursts': per_user,
+        'conversation_starters': per_user,
+        'messages_by_hour': {hour: rng.randint(0, 900) for hour in range(24)},
+        'most_common_words': [(f"מילה{i}", 100 - i) for i in range(10)],
+        # Word cloud vocabulary, a Hebrew/English mix like the users
+        'word_vocabulary': [(f"{rng.choice(HEBREW_NAMES if i % 2 else ENGLISH_NAMES)}{i}", 1000 - i)
+                            for i in range(200)],
+    }
+
+
+def build_all_figures(results):
+    """
+    Build the same figures the dashboard builds from the results
+    """
+    visualizer.get_fig_messages_pie_chart(results['messages_per_user'])
+    visualizer.get_fig_messages_per_user(results['messages_per_user'])
+    visualizer.get_fig_avg_message_length(results['avg_message_length'])
+    visualizer.get_fig_laughs_per_user(results['laughs_per_user'])
+    visualizer.get_fig_response_time_per_user(results['avg_response_time_per_user'])
+    visualizer.get_fig_emoji_per_user(results['emoji_per_user'])
+    visualizer.get_fig_message_bursts(results['message_bursts'])
+    visualizer.get_fig_conversation_starters(results['conversation_starters'])
+    visualizer.get_fig_messages_by_hour(results['messages_by_hour'])
+    visualizer.get_fig_most_common_words(results['most_common_words'])
+
+
+def best_time(func, repeats, before=None):
+    """
+    Return the best wall time (seconds) of func(), calling before() untimed ahead of each run
+    """
+    best = float('inf')
+    for _ in range(repeats):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(n_users=500, repeats=5):
+    results = make_results(n_users)
+    build_all_figures(results)  # warm up Plotly's own validators
+    figures = best_time(lambda: build_all_figures(results), repeats)
+
+    # The labels render_word_cloud fixes before drawing them with matplotlib
+    words = [word for word, _ in results['word_vocabulary']]
+    fix_words = lambda: fix_labels(words)
+    cold = best_time(fix_words, repeats, before=_reshape_and_reorder.cache_clear)
+    warm = best_time(fix_words, repeats)
+    info = _reshape_and_reorder.cache_info()
+
+    print(f"📊 Building all figures for {n_users} users (best of {repeats}): {figures * 1000:8.1f} ms")
+    print(f"☁️ Fixing {len(words)} word cloud labels (best of {repeats})")
+    print(f"  cold Hebrew cache: {cold * 1000:8.2f} ms")
+    print(f"  warm Hebrew cache: {warm * 1000:8.2f} ms")
+    print(f"  cache: {info.currsize} labels, {info.hits} hits, {info.misses} misses")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,96 @@
+"""
+Import-time budget: how long importing each entry module takes in a fresh interpreter,
+and which heavy libraries it pulls in. Exits with status 1 when a module is over budget
+or loads a library it should not, so CI fails on startup regressions.
+
+    python benchmarks/bench_import_time.py [--repeats 5] [--scale 1.0]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+# Milliseconds above a bare interpreter start. pandas alone takes ~500 ms here,
+# Streamlit ~450 ms; the budgets leave room for slower CI machines
+IMPORT_BUDGETS_MS = {
+    'main': 150,
+    'analysis_executor': 200,
+    'analyzer': 1000,
+    'batch': 1000,
+    'visualizer': 1200,
+    'streamlit_app': 1100,
+}
+
+# Libraries each module must not load at import time
+FORBIDDEN_IMPORTS = {
+    'main': ('pandas', 'streamlit', 'plotly'),
+    'analysis_executor': ('pandas', 'streamlit', 'plotly'),
+    'analyzer': ('streamlit', 'plotly', 'emoji', 'arabic_reshaper', 'bidi'),
+    'batch': ('streamlit', 'plotly', 'emoji'),
+    'visualizer': ('streamlit', 'plotly.express', 'arabic_reshaper', 'bidi'),
+    # Streamlit itself loads plotly.graph_objects, the rest is ours to keep out
+    'streamlit_app': ('pandas', 'plotly.express', 'emoji', 'analyzer', 'visualizer'),
+}
+
+
+def run_python(code):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', code], cwd=SRC_DIR, capture_output=True, text=True, check=True)
+    return time.perf_counter() - start, result.stdout
+
+
+def import_time_ms(module, repeats):
+    """
+    Median wall time of importing module in a fresh interpreter, minus the bare start-up
+    """
+    baseline = statistics.median(run_python('pass')[0] for _ in range(repeats))
+    elapsed = statistics.median(run_python(f'import {module}')[0] for _ in range(repeats))
+    return max(elapsed - baseline, 0.0) * 1000
+
+
+def loaded_modules(module, candidates):
+    """
+    Return the candidates that are in sys.modules after importing module
+    """
+    code = f"import sys, {module}\nprint(','.join(m for m in {candidates!r} if m in sys.modules))"
+    return [m for m in run_python(code)[1].strip().split(',') if m]
+
+
+def check_imports(repeats=5, scale=1.0):
+    """
+    Measure every module, print a table and return the list of failures
+    """
+    failures = []
+    for module, budget in IMPORT_BUDGETS_MS.items():
+        budget *= scale
+        ms = import_time_ms(module, repeats)
+        forbidden = loaded_modules(module, FORBIDDEN_IMPORTS.get(module, ()))
+        ok = ms <= budget and not forbidden
+        print(f"{'✅' if ok else '❌'} {module:<18} {ms:7.0f} ms  (budget {budget:.0f} ms)"
+              + (f"  loads {', '.join(forbidden)}" if forbidden else ""))
+        if ms > budget:
+            failures.append(f"{module} imports in {ms:.0f} ms, over its {budget:.0f} ms budget")
+        if forbidden:
+            failures.append(f"{module} loads {', '.join(forbidden)} at import time")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeats', type=int, default=5, help='Fresh interpreters per measurement')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiply all budgets, e.g. for slow machines')
+    args = parser.parse_args()
+
+    failures = check_imports(args.repeats, args.scale)
+    for failure in failures:
+        print(f"❌ {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""
+Memory benchmark: peak and retained memory of every pipeline stage (parsing, preprocessing,
+each analysis step) on synthetic chats, or on a given export with --chat. Each chat is
+measured in a fresh process, once sampling RSS and, up to --traced-max messages, once
+more with tracemalloc (exact Python allocations, about ten times slower).
+Exits with status 1 when a stage's peak grew past its baseline by more than the tolerance,
+or when the whole job needs more memory per chat byte than the analysis executor admits.
+
+    python benchmarks/bench_memory.py --sizes 10000 100000          # quick check
+    python benchmarks/bench_memory.py --chat my_export.txt          # where does my chat spike?
+    python benchmarks/bench_memory.py --save-baseline
+
+The same stage measurements are available in the app and the service by setting
+WHATSAPP_ANALYZER_TRACE_MEMORY (see src/instrumentation.py)
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_scaling import chat_file, write_json
+from synthetic_chat import add_knob_arguments, knobs_from_args
+
+SIZES = (10_000, 100_000, 1_000_000)
+RESULTS_VERSION = 1
+
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, 'results', 'memory.json')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baselines', 'memory.json')
+
+# tracemalloc peaks are exact, RSS depends on the allocator and the machine
+DEFAULT_TOLERANCE = 0.10
+RSS_TOLERANCE = 0.25
+
+# Stages peaking below this in the baseline are not compared
+MIN_COMPARABLE_BYTES = 1024 * 1024
+
+# Chats up to this size are also measured with tracemalloc
+TRACED_MAX_MESSAGES = 100_000
+
+# Smaller chats are checked against the baseline only: their memory is mostly fixed costs,
+# far below any budget
+BUDGET_MIN_CHAT_BYTES = 4 * 1024 * 1024
+
+MB = 1024 * 1024
+
+
+def measure(path, trace_memory):
+    """
+    Parse (streamed, like an upload) and analyze one chat the way an analysis worker does,
+    with memory traced. Runs in a fresh process, so earlier chats and freed memory do not skew RSS
+    """
+    from instrumentation import pipeline_run
+    import analyzer
+    import parser
+
+    # Loaded up front, so module imports are not counted as a stage's memory
+    import emoji
+    emoji.emoji_list('👍')
+
+    gc.collect()
+    with pipeline_run('memory', trace_memory=trace_memory) as run, open(path, 'rb') as f:
+        df = parser.parse_whatsapp_stream(f, os.fstat(f.fileno()).st_size)
+        results = analyzer.analyze_chat(df)
+    timings = run.as_dict()
+    timings['parsed_messages'] = len(df)
+    del df, results
+    return timings
+
+
+def measure_fresh(path, trace_memory):
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+        return pool.submit(measure, path, trace_memory).result()
+
+
+def measure_chat(path, traced):
+    """
+    Memory of the whole job and of every stage: rss_* fields always, tracemalloc
+    peak_bytes/retained_bytes when traced
+    """
+    runs = [measure_fresh(path, 'rss')]
+    if traced:
+        runs.append(measure_fresh(path, 'tracemalloc'))
+
+    job, stages = {}, {}
+    for run, fields in zip(runs, (('rss_peak_bytes', 'rss_retained_bytes'), ('peak_bytes', 'retained_bytes'))):
+        for field in fields:
+            if field in run['memory']:
+                job[field] = run['memory'][field]
+            for name, stage in run['stages'].items():
+                if field in stage:
+                    stages.setdefault(name, {})[field] = stage[field]
+    stages = dict(sorted(stages.items(), key=lambda item: -item[1].get('peak_bytes', item[1].get('rss_peak_bytes', 0))))
+    return {'bytes': os.path.getsize(path), 'parsed_messages': runs[0]['parsed_messages'], 'job': job, 'stages': stages}
+
+
+def label(size):
+    """
+    Display name of a results entry: a synthetic chat size, or the file name of a given chat
+    """
+    return f"{int(size):,} messages" if size.isdigit() else size
+
+
+def check_budget(results, memory_factor):
+    """
+    Return the chats whose job peaked above memory_factor bytes per chat byte,
+    the estimate the analysis executor admits chats by
+    """
+    over = []
+    for size, measured in results['sizes'].items():
+        peak = measured['job'].get('rss_peak_bytes')
+        if measured['bytes'] < BUDGET_MIN_CHAT_BYTES or peak is None:
+            continue
+        if peak > measured['bytes'] * memory_factor:
+            over.append(f"job at {label(size)} needs {peak / measured['bytes']:.1f} bytes per chat byte, "
+                        f"over CHAT_MEMORY_FACTOR ({memory_factor})")
+    return over
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE, rss_tolerance=RSS_TOLERANCE):
+    """
+    Return a list of regressions: stages (and the whole job) whose peak grew past the
+    baseline's by more than tolerance (rss_tolerance for RSS), for sizes present in both
+    """
+    regressions = []
+    for size, measured in results['sizes'].items():
+        base = baseline.get('sizes', {}).get(size)
+        if base is None:
+            continue
+        entries = [('job', measured['job'], base['job'])]
+        entries += [(name, stage, base['stages'].get(name, {})) for name, stage in measured['stages'].items()]
+        for name, current, reference in entries:
+            for field, allowed in (('peak_bytes', tolerance), ('rss_peak_bytes', rss_tolerance)):
+                if field not in current or reference.get(field, 0) < MIN_COMPARABLE_BYTES:
+                    continue
+                growth = current[field] / reference[field] - 1
+                if growth > allowed:
+                    kind = 'RSS peak' if field == 'rss_peak_bytes' else 'peak'
+                    regressions.append(f"{name} at {label(size)}: {kind} {current[field] / MB:.1f} MB, "
+                                       f"{growth * 100:.0f}% over the baseline's {reference[field] / MB:.1f} MB")
+    return regressions
+
+
+def format_mb(value):
+    return f"{value / MB:9.1f}" if value is not None else f"{'-':>9}"
+
+
+def print_table(results):
+    for size, measured in results['sizes'].items():
+        job = measured['job']
+        print(f"\n📊 {label(size)} ({measured['bytes'] / MB:.1f} MB, {measured['parsed_messages']:,} messages) "
+              f"job RSS peak {job['rss_peak_bytes'] / MB:.0f} MB "
+              f"({job['rss_peak_bytes'] / measured['bytes']:.1f} bytes per chat byte)")
+        print(f"   {'stage':<36}{'peak':>9}{'retained':>9}{'RSS peak':>9}{'RSS kept':>9}   (MB)")
+        for name, stage in measured['stages'].items():
+            print(f"   {name:<36}{format_mb(stage.get('peak_bytes'))}{format_mb(stage.get('retained_bytes'))}"
+                  f"{format_mb(stage.get('rss_peak_bytes'))}{format_mb(stage.get('rss_retained_bytes'))}")
+
+
+def main():
+    from analysis_executor import CHAT_MEMORY_FACTOR
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES), help='Chat sizes in messages')
+    parser.add_argument('--chat', help='Measure this chat export instead of synthetic ones')
+    parser.add_argument('--traced-max', type=int, default=TRACED_MAX_MESSAGES,
+                        help='Largest chat (in messages) also measured with tracemalloc')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'whatsapp-analyzer-bench'),
+                        help='Where the generated chats are kept between runs')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='Results JSON to write')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline JSON to compare with')
+    parser.add_argument('--save-baseline', action='store_true', help='Write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Allowed growth of tracemalloc peaks against the baseline (0.1 = 10%%)')
+    parser.add_argument('--rss-tolerance', type=float, default=RSS_TOLERANCE,
+                        help='Allowed growth of RSS peaks against the baseline')
+    add_knob_arguments(parser)
+    args = parser.parse_args()
+
+    knobs = knobs_from_args(args)
+    results = {
+        'version': RESULTS_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'generator': None if args.chat else knobs,
+        'sizes': {},
+    }
+    if args.chat:
+        print(f"⏱️ Measuring {args.chat}...", flush=True)
+        results['sizes'][os.path.basename(args.chat)] = measure_chat(args.chat, traced=True)
+    else:
+        os.makedirs(args.data_dir, exist_ok=True)
+        for messages in sorted(args.sizes):
+            path = chat_file(args.data_dir, messages, knobs)
+            print(f"⏱️ Measuring {messages:,} messages...", flush=True)
+            results['sizes'][str(messages)] = measure_chat(path, traced=messages <= args.traced_max)
+
+    print_table(results)
+    write_json(args.output, results)
+    print(f"\n📄 Results written: {args.output}")
+    if args.save_baseline:
+        write_json(args.baseline, results)
+        print(f"📄 Baseline written: {args.baseline}")
+
+    problems = check_budget(results, CHAT_MEMORY_FACTOR)
+    if not args.save_baseline and not args.chat and os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('generator') != knobs:
+            print("⚠️ The baseline was recorded with other generator settings, not comparing")
+        else:
+            problems += compare(results, baseline, args.tolerance, args.rss_tolerance)
+            if not problems:
+                print(f"✅ No stage peaks more than {args.tolerance * 100:.0f}% above the baseline")
+    for problem in problems:
+        print(f"❌ {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark: Plotly payload bytes and server time of one page run, per dashboard section.
+The page runs under Streamlit's AppTest with a simulated upload (see bench_selector_latency).
+Figures are served from the figure cache after the first run, so the time is what each
+interaction pays for building the page and serializing its charts.
+
+    python benchmarks/bench_page_payload.py --messages 100000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+from streamlit.testing.v1 import AppTest
+
+from bench_selector_latency import PAGE_SCRIPT, SRC_DIR
+from load_test_analysis import make_chat
+from streamlit_app import ANALYSIS_SECTIONS
+
+
+def plotly_payload_bytes(at) -> tuple:
+    """
+    Return (number of charts, total bytes of their figure JSON) on the current page
+    """
+    specs = [chart.proto.spec for chart in at.get('plotly_chart')]
+    return len(specs), sum(len(spec.encode('utf-8')) for spec in specs)
+
+
+def time_runs(at, runs):
+    """
+    Rerun the page as is and return the median wall time
+    """
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        at.run()
+        timings.append(time.perf_counter() - start)
+        assert not at.exception, at.exception
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=100_000, help='Messages in the chat')
+    parser.add_argument('--runs', type=int, default=5, help='Timed reruns per section')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        chat_path = os.path.join(tmp, 'chat.txt')
+        with open(chat_path, 'wb') as f:
+            f.write(make_chat(args.messages, seed=0))
+        page_path = os.path.join(tmp, 'page.py')
+        with open(page_path, 'w', encoding='utf-8') as f:
+            f.write(PAGE_SCRIPT.format(src_dir=os.path.abspath(SRC_DIR), chat_path=chat_path))
+
+        at = AppTest.from_file(page_path, default_timeout=1800)
+        at.run()
+        # Run until every analysis stage is in and nothing is pending
+        while any('Still analyzing' in info.value for info in at.sidebar.info):
+            at.run()
+
+        # With on-demand tabs each section is measured on its own, otherwise it is the whole page
+        sections = ANALYSIS_SECTIONS if 'active_section' in at.session_state else [None]
+        print(f"{args.messages:,} messages")
+        for section in sections:
+            if section is not None:
+                at.session_state['active_section'] = section
+                at.run()
+            charts, payload = plotly_payload_bytes(at)
+            seconds = time_runs(at, args.runs)
+            print(f"{section or 'All tabs'}: {charts} charts, {payload / 1024:,.0f} KB figure JSON, "
+                  f"{seconds * 1000:.0f} ms per run")
+
+
+if __name__ == '__main__':
+    main()
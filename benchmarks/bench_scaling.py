@@ -0,0 +1,222 @@
+"""
+Scaling benchmark: parse and per-metric analysis throughput on synthetic chats of growing size.
+Results are written as JSON and compared with a baseline; exits with status 1 when a step is
+slower than its baseline by more than the tolerance, so CI notices regressions at scale.
+
+    python benchmarks/bench_scaling.py --sizes 10000 100000        # quick check
+    python benchmarks/bench_scaling.py                              # 10k, 100k, 1M and 10M messages
+    python benchmarks/bench_scaling.py --sizes 10000 100000 1000000 --save-baseline
+
+Baselines are only comparable on the machine that recorded them: record one on the CI runner
+(--save-baseline) and after every intended performance change
+"""
+
+import argparse
+import gc
+import hashlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from functools import partial
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+from synthetic_chat import add_knob_arguments, knobs_from_args, write_chat
+
+SIZES = (10_000, 100_000, 1_000_000, 10_000_000)
+RESULTS_VERSION = 1
+
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, 'results', 'scaling.json')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baselines', 'scaling.json')
+
+# Slower than the baseline by more than this share is a regression
+DEFAULT_TOLERANCE = 0.25
+
+# Steps faster than this in the baseline are too noisy to compare
+MIN_COMPARABLE_SECONDS = 0.05
+
+# Chats up to this size are measured --repeats times (best run counts), larger ones once
+REPEAT_MAX_MESSAGES = 100_000
+
+
+def metric_steps():
+    """
+    The analysis steps timed one by one, in analyze_chat order, as (name, function of the
+    preprocessed DataFrame). Emoji extraction adds the columns the emoji analysis reads
+    """
+    import analyzer
+
+    return [
+        ('basic_stats', analyzer.calculate_basic_stats),
+        ('user_metrics', analyzer.calculate_user_metrics),
+        ('time_patterns', analyzer.calculate_time_patterns),
+        ('activity_heatmap', analyzer.calculate_activity_heatmap),
+        ('activity_timeline', analyzer.calculate_activity_timeline),
+        ('laughs', analyzer.calculate_laugh_analysis),
+        ('message_bursts', analyzer.calculate_message_bursts),
+        ('conversation_starters', analyzer.calculate_conversation_starters),
+        ('response_analysis', analyzer.calculate_response_analysis),
+        ('emoji_extraction', analyzer.extract_emojis),
+        ('emoji_analysis', analyzer.calculate_emoji_analysis),
+        ('text_frequencies', partial(analyzer.calculate_text_frequencies, top_n=analyzer.WORD_VOCABULARY_SIZE,
+                                     vocabulary_size=analyzer.WORD_VOCABULARY_SIZE)),
+        ('search_index', analyzer.build_search_index),
+    ]
+
+
+def chat_file(data_dir, messages, knobs):
+    """
+    Path of the synthetic chat, generated on first use. Generation is deterministic,
+    so files are reused across runs
+    """
+    tag = hashlib.blake2b(json.dumps(knobs, sort_keys=True).encode(), digest_size=6).hexdigest()
+    path = os.path.join(data_dir, f"chat-{messages}-{tag}.txt")
+    if not os.path.exists(path):
+        print(f"📝 Generating {messages:,} messages...", flush=True)
+        write_chat(path + '.tmp', messages, **knobs)
+        os.replace(path + '.tmp', path)
+    return path
+
+
+def timed(func, *args, repeats=1):
+    """
+    Return (best seconds, result) of calling func(*args) repeats times
+    """
+    best, result = None, None
+    for _ in range(repeats):
+        result = None
+        gc.collect()
+        start = time.perf_counter()
+        result = func(*args)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def measure(path, messages, repeats):
+    """
+    Time parsing, preprocessing, every metric step and the whole analyze_chat on one chat
+    """
+    from analyzer import analyze_chat, preprocess_df
+    from parser import parse_whatsapp
+
+    repeats = repeats if messages <= REPEAT_MAX_MESSAGES else 1
+    steps = {}
+
+    def record(name, seconds):
+        steps[name] = {'seconds': round(seconds, 4), 'messages_per_second': round(messages / seconds)}
+
+    seconds, df = timed(parse_whatsapp, path, repeats=repeats)
+    record('parse', seconds)
+    seconds, prepared = timed(preprocess_df, df, False, repeats=repeats)
+    record('preprocess', seconds)
+    for name, func in metric_steps():
+        seconds, _ = timed(func, prepared, repeats=repeats)
+        record(name, seconds)
+    del prepared
+
+    seconds, _ = timed(analyze_chat, df, repeats=repeats)
+    record('analyze_chat', seconds)
+    return {'bytes': os.path.getsize(path), 'parsed_messages': len(df), 'steps': steps}
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Return a list of regressions: steps whose throughput dropped below the baseline's
+    by more than tolerance, for sizes and steps present in both
+    """
+    regressions = []
+    for size, measured in results['sizes'].items():
+        base = baseline.get('sizes', {}).get(size)
+        if base is None:
+            continue
+        for step, current in measured['steps'].items():
+            reference = base['steps'].get(step)
+            if reference is None or reference['seconds'] < MIN_COMPARABLE_SECONDS:
+                continue
+            ratio = current['messages_per_second'] / reference['messages_per_second']
+            if ratio < 1 - tolerance:
+                regressions.append(f"{step} at {int(size):,} messages: {current['messages_per_second']:,} msg/s, "
+                                   f"{(1 - ratio) * 100:.0f}% below the baseline's {reference['messages_per_second']:,}")
+    return regressions
+
+
+def print_table(results, baseline):
+    for size, measured in results['sizes'].items():
+        base = baseline.get('sizes', {}).get(size, {}).get('steps', {}) if baseline else {}
+        print(f"\n📊 {int(size):,} messages ({measured['bytes'] / 1024 / 1024:.1f} MB)")
+        for step, current in measured['steps'].items():
+            change = ''
+            if step in base:
+                change = f"  {(current['messages_per_second'] / base[step]['messages_per_second'] - 1) * 100:+5.0f}%"
+            print(f"   {step:<22} {current['seconds']:9.3f}s  {current['messages_per_second']:>13,} msg/s{change}")
+
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+        f.write('\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES), help='Chat sizes in messages')
+    parser.add_argument('--repeats', type=int, default=3, help=f'Runs per step up to {REPEAT_MAX_MESSAGES:,} messages')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'whatsapp-analyzer-bench'),
+                        help='Where the generated chats are kept between runs')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='Results JSON to write')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline JSON to compare with')
+    parser.add_argument('--save-baseline', action='store_true', help='Write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Allowed slowdown against the baseline (0.25 = 25%%)')
+    add_knob_arguments(parser)
+    args = parser.parse_args()
+
+    knobs = knobs_from_args(args)
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = {
+        'version': RESULTS_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                    'processor': platform.processor() or platform.machine(), 'cpus': os.cpu_count()},
+        'generator': knobs,
+        'sizes': {},
+    }
+    for messages in sorted(args.sizes):
+        path = chat_file(args.data_dir, messages, knobs)
+        print(f"⏱️ Measuring {messages:,} messages...", flush=True)
+        results['sizes'][str(messages)] = measure(path, messages, args.repeats)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('generator') != knobs:
+            print("⚠️ The baseline was recorded with other generator settings, not comparing")
+            baseline = {}
+
+    print_table(results, baseline)
+    write_json(args.output, results)
+    print(f"\n📄 Results written: {args.output}")
+
+    if args.save_baseline:
+        write_json(args.baseline, results)
+        print(f"📄 Baseline written: {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"❌ {regression}")
+    if baseline and not regressions:
+        print(f"✅ No step more than {args.tolerance * 100:.0f}% slower than the baseline")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
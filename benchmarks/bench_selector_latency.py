@@ -0,0 +1,141 @@
+"""
+Benchmark: latency of changing the user selector on a large chat.
+The page runs under Streamlit's AppTest with a simulated upload; the first run analyzes the
+chat, then the user selector is changed a few times and each interaction is timed.
+
+AppTest always reruns the whole script, so that number is the full-rerun cost. In the
+browser the selector lives in a fragment and only the user tab reruns; that cost is timed
+on a page that renders just the user tab from the same cached analysis.
+
+    python benchmarks/bench_selector_latency.py --messages 500000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, '..', 'src')
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from streamlit.testing.v1 import AppTest
+
+from cache_utils import content_digest
+from load_test_analysis import make_chat
+
+# The page script: the real main(), with the sidebar replaced by a fixed upload
+PAGE_SCRIPT = '''
+import os
+import sys
+sys.path.insert(0, {src_dir!r})
+os.chdir({src_dir!r})
+
+import streamlit_app
+
+
+class SimulatedUpload:
+    name = "benchmark_chat.txt"
+    file_id = "benchmark-upload"
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = f.read()
+
+    def getbuffer(self):
+        return memoryview(self.data)
+
+    def getvalue(self):
+        return self.data
+
+    def read(self, size=-1):
+        return self.data if size < 0 else self.data[:size]
+
+
+import streamlit as st
+if "simulated_upload" not in st.session_state:
+    st.session_state["simulated_upload"] = SimulatedUpload({chat_path!r})
+streamlit_app.render_sidebar = lambda: (st.session_state["simulated_upload"], False)
+streamlit_app.main()
+'''
+
+# Only the user tab fragment, on the analysis the full page cached
+FRAGMENT_SCRIPT = '''
+import os
+import sys
+sys.path.insert(0, {src_dir!r})
+os.chdir({src_dir!r})
+
+import streamlit_app
+import ui_components
+
+results = streamlit_app.get_analysis_cache().get({digest!r})
+ui_components.render_user_analysis_tab(results, streamlit_app.get_visualizer_functions({digest!r}))
+'''
+
+
+def time_selector_changes(at, changes):
+    """
+    Change the user selector repeatedly and return the wall time of each rerun
+    """
+    users = at.selectbox(key='user_selector').options
+    timings = []
+    for i in range(changes):
+        start = time.perf_counter()
+        at.selectbox(key='user_selector').select(users[(i + 1) % len(users)]).run()
+        timings.append(time.perf_counter() - start)
+        assert not at.exception, at.exception
+    return timings
+
+
+def report(label, timings):
+    print(f"{label}: median {statistics.median(timings) * 1000:.0f} ms, "
+          f"min {min(timings) * 1000:.0f} ms, max {max(timings) * 1000:.0f} ms over {len(timings)} changes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=500_000, help='Messages in the chat')
+    parser.add_argument('--changes', type=int, default=5, help='Selector changes to time')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        chat = make_chat(args.messages, seed=0)
+        chat_path = os.path.join(tmp, 'chat.txt')
+        with open(chat_path, 'wb') as f:
+            f.write(chat)
+        src_dir = os.path.abspath(SRC_DIR)
+        page_path = os.path.join(tmp, 'page.py')
+        with open(page_path, 'w', encoding='utf-8') as f:
+            f.write(PAGE_SCRIPT.format(src_dir=src_dir, chat_path=chat_path))
+        fragment_path = os.path.join(tmp, 'fragment.py')
+        with open(fragment_path, 'w', encoding='utf-8') as f:
+            f.write(FRAGMENT_SCRIPT.format(src_dir=src_dir, digest=content_digest(chat)))
+
+        at = AppTest.from_file(page_path, default_timeout=1800)
+        start = time.perf_counter()
+        at.run()
+        print(f"{args.messages:,} messages: first run (parse + analysis) {time.perf_counter() - start:.1f}s")
+        # The first page may still be filling in stages, run until the user tab is ready
+        while not _has_selector(at):
+            at.run()
+        report("Selector change, full rerun", time_selector_changes(at, args.changes))
+
+        at = AppTest.from_file(fragment_path, default_timeout=1800)
+        at.run()
+        report("Selector change, fragment rerun", time_selector_changes(at, args.changes))
+
+
+def _has_selector(at):
+    try:
+        at.selectbox(key='user_selector')
+        return True
+    except KeyError:
+        return False
+
+
+if __name__ == '__main__':
+    main()
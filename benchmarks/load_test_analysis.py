@@ -0,0 +1,85 @@
+"""
+Load test: N sessions uploading different chats at once to the shared analysis executor.
+Each simulated session submits its chat and polls until done, like the Streamlit page does,
+and the report shows per-upload latency, rejections and throughput.
+
+    python benchmarks/load_test_analysis.py --uploads 16 --messages 20000 --workers 4 --queue 8
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from synthetic_chat import generate_chat
+from analysis_executor import AnalysisExecutor, ExecutorBusyError, JobFailedError
+from cache_utils import content_digest
+
+
+def make_chat(n_messages, seed) -> bytes:
+    """
+    Build a WhatsApp export with n_messages random messages
+    """
+    return generate_chat(n_messages, seed=seed)
+
+
+def simulate_upload(executor, data, poll_seconds):
+    """
+    Submit one chat and poll it to completion, return (outcome, seconds)
+    """
+    start = time.perf_counter()
+    key = content_digest(data)
+    try:
+        executor.submit(key, data)
+    except ExecutorBusyError:
+        return 'rejected', time.perf_counter() - start
+
+    while executor.status(key)['state'] in ('queued', 'running'):
+        time.sleep(poll_seconds)
+    try:
+        executor.result(key)
+        return 'done', time.perf_counter() - start
+    except JobFailedError:
+        return executor.status(key)['state'], time.perf_counter() - start
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--uploads', type=int, default=16, help='Concurrent simulated uploads')
+    parser.add_argument('--messages', type=int, default=20000, help='Messages per chat')
+    parser.add_argument('--workers', type=int, default=4, help='Analysis worker processes')
+    parser.add_argument('--queue', type=int, default=8, help='Jobs allowed to wait for a worker')
+    parser.add_argument('--timeout', type=float, default=300, help='Per-job timeout in seconds')
+    parser.add_argument('--poll', type=float, default=0.1, help='Polling interval in seconds')
+    args = parser.parse_args()
+
+    chats = [make_chat(args.messages, seed) for seed in range(args.uploads)]
+    print(f"{args.uploads} uploads x {args.messages:,} messages ({len(chats[0]) / 1024 / 1024:.1f} MB each), "
+          f"{args.workers} workers, queue {args.queue}")
+
+    executor = AnalysisExecutor(max_workers=args.workers, max_queued=args.queue, job_timeout=args.timeout)
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.uploads) as sessions:
+            outcomes = list(sessions.map(lambda data: simulate_upload(executor, data, args.poll), chats))
+        wall = time.perf_counter() - start
+    finally:
+        executor.shutdown()
+
+    done = [seconds for outcome, seconds in outcomes if outcome == 'done']
+    counts = {outcome: sum(1 for o, _ in outcomes if o == outcome) for outcome, _ in outcomes}
+    print(f"Outcomes: {counts}")
+    print(f"Latency p50 {percentile(done, 0.5):.2f}s, p95 {percentile(done, 0.95):.2f}s, max {max(done, default=0):.2f}s")
+    print(f"Throughput {len(done) / wall:.2f} chats/s over {wall:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Load test of the HTTP analysis service on localhost: N clients posting different chats at once.
+Starts the service in-process on a free port (or targets --url), and reports status codes,
+latency and throughput. With --retry, clients honour 503 Retry-After and try again.
+
+    python benchmarks/load_test_service.py --clients 16 --messages 20000 --workers 4 --queue 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+from analysis_executor import AnalysisExecutor
+from cache_utils import AnalysisCache
+from load_test_analysis import make_chat, percentile
+from service import AnalysisService, create_server
+
+
+def post_chat(url, data, retry, max_attempts=20):
+    """
+    POST one chat and return (final status code, seconds)
+    """
+    start = time.perf_counter()
+    for _ in range(max_attempts):
+        try:
+            request = urllib.request.Request(f"{url}/analyze?metrics=basic_stats", data=data)
+            with urllib.request.urlopen(request, timeout=600) as response:
+                json.loads(response.read())
+                return response.status, time.perf_counter() - start
+        except urllib.error.HTTPError as e:
+            if e.code != 503 or not retry:
+                return e.code, time.perf_counter() - start
+            time.sleep(float(e.headers.get('Retry-After', 1)))
+    return 503, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default=None, help='Running service to target (default: start one in-process)')
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent clients, one chat each')
+    parser.add_argument('--messages', type=int, default=20000, help='Messages per chat')
+    parser.add_argument('--workers', type=int, default=4, help='Analysis worker processes (in-process service)')
+    parser.add_argument('--queue', type=int, default=8, help='Jobs allowed to wait (in-process service)')
+    parser.add_argument('--retry', action='store_true', help='Retry after 503 responses')
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        service = AnalysisService(AnalysisExecutor(max_workers=args.workers, max_queued=args.queue), AnalysisCache())
+        server = create_server(service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    chats = [make_chat(args.messages, seed) for seed in range(args.clients)]
+    print(f"{args.clients} clients x {args.messages:,} messages ({len(chats[0]) / 1024 / 1024:.1f} MB each) -> {url}")
+
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.clients) as clients:
+            outcomes = list(clients.map(lambda data: post_chat(url, data, args.retry), chats))
+        wall = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.service.executor.shutdown()
+
+    ok = [seconds for status, seconds in outcomes if status == 200]
+    print(f"Status codes: {dict(Counter(status for status, _ in outcomes))}")
+    print(f"Latency (200) p50 {percentile(ok, 0.5):.2f}s, p95 {percentile(ok, 0.95):.2f}s, max {max(ok, default=0):.2f}s")
+    print(f"Throughput {len(ok) / wall:.2f} chats/s over {wall:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""
+Deterministic synthetic WhatsApp exports for tests and benchmarks. The same knobs and seed
+always give the same bytes. Written line by line, so 10M-message chats fit in a few MB of RAM.
+
+    python benchmarks/synthetic_chat.py chat.txt --messages 1000000 --users 40 --hebrew-ratio 0.5
+
+Knobs: messages, users, Hebrew/English mix, emoji density, multi-line ratio and system messages
+"""
+
+import argparse
+import random
+from datetime import datetime, timedelta
+
+ENGLISH_NAMES = ['John Smith', 'Sarah Johnson', 'Mike Davis', 'Emily Wilson', 'Emma Brown', 'David Lee',
+                 'Olivia Martin', 'James Taylor', 'Sophia Clark', 'Daniel White']
+HEBREW_NAMES = ['יונתן כהן', 'דנה לוי', 'נועה מזרחי', 'איתי פרץ', 'מיכל ביטון', 'אורי דהן', 'שירה אברהם',
+                'עומר פרידמן', 'תמר שפירא', 'גיל אזולאי']
+
+ENGLISH_WORDS = ('the you and to it is that what for this have are with not on be we at do so can was '
+                 'coffee meeting tomorrow tonight great good morning later today work home dinner call '
+                 'weekend movie game football running happy sorry thanks please sure maybe really plan '
+                 'train traffic rain beach birthday party photo music pizza lunch office project deadline').split()
+HEBREW_WORDS = ('אני לא זה מה של על יש את כן גם אבל רק עוד היום מחר בוקר טוב ערב שלום תודה '
+                'אוכל קפה עבודה בית ארוחה סרט משחק חברים יום הולדת מסיבה תמונה מוזיקה פיצה '
+                'פגישה פרויקט גשם ים חג שבת נסיעה רכבת פקק אחלה סבבה יאללה ממש בדיוק').split()
+LAUGHS = {'en': ['haha', 'lol', 'lmao'], 'he': ['חחח', 'חחחחח']}
+EMOJIS = ['😂', '👍', '❤️', '😊', '🙏', '😅', '🔥', '🎉', '😢', '👏', '☕', '🤔']
+
+# Dropped by the parser (see parser.SYSTEM_MESSAGE_KEYWORDS)
+SYSTEM_LINES = [
+    'Messages and calls are end-to-end encrypted. No one outside of this chat can read them.',
+    '{user}: image omitted',
+    '{user}: sticker omitted',
+    '{user} changed the group description',
+    'ההודעות והשיחות מוצפנות מקצה לקצה',
+    '{user}: ‏התמונה הושמטה',
+]
+
+START = datetime(2023, 1, 1, 8, 0, 0)
+
+
+def user_names(count, hebrew_ratio, rng):
+    """
+    count distinct user names, about hebrew_ratio of them Hebrew
+    """
+    names = []
+    for i in range(count):
+        pool = HEBREW_NAMES if rng.random() < hebrew_ratio else ENGLISH_NAMES
+        name = pool[i % len(pool)]
+        names.append(f"{name} {i}" if name in names else name)
+    return names
+
+
+def zipf_weights(count, exponent=1.1):
+    """
+    Cumulative Zipf weights, so a few words are very common like in real chats
+    """
+    total, cumulative = 0.0, []
+    for rank in range(1, count + 1):
+        total += 1 / rank ** exponent
+        cumulative.append(total)
+    return cumulative
+
+
+def iter_chat_lines(messages=10000, users=6, hebrew_ratio=0.5, emoji_density=0.3, multiline_ratio=0.05,
+                    system_ratio=0.01, date_style='dots', seed=0):
+    """
+    Yield the lines of a synthetic export: messages user messages (the number the parser finds),
+    plus system lines at system_ratio per message and continuation lines of multi-line messages.
+    emoji_density is the average number of emojis per message; date_style is 'dots'
+    (5.8.2025, Hebrew exports) or 'slashes' (05/08/2025, English exports)
+    """
+    rng = random.Random(seed)
+    names = user_names(users, hebrew_ratio, rng)
+    # Some people write a lot more than others
+    user_weights = zipf_weights(len(names), exponent=0.8)
+    vocabularies = {
+        'en': (ENGLISH_WORDS, zipf_weights(len(ENGLISH_WORDS))),
+        'he': (HEBREW_WORDS, zipf_weights(len(HEBREW_WORDS))),
+    }
+
+    timestamp = START
+    for _ in range(messages):
+        # Mostly quick replies, now and then a pause of hours (a new conversation)
+        gap = rng.expovariate(1 / 120)
+        if rng.random() < 0.03:
+            gap += rng.uniform(2, 30) * 3600
+        timestamp += timedelta(seconds=int(gap) + 1)
+        if date_style == 'dots':
+            stamp = f"[{timestamp.day}.{timestamp.month}.{timestamp.year}, {timestamp:%H:%M:%S}]"
+        else:
+            stamp = f"[{timestamp:%d/%m/%Y}, {timestamp:%H:%M:%S}]"
+
+        if rng.random() < system_ratio:
+            yield f"{stamp} {rng.choice(SYSTEM_LINES).format(user=rng.choice(names))}"
+
+        language = 'he' if rng.random() < hebrew_ratio else 'en'
+        words, weights = vocabularies[language]
+        text = rng.choices(words, cum_weights=weights, k=rng.randint(1, 14))
+        if rng.random() < 0.04:
+            text.append(rng.choice(LAUGHS[language]))
+        # emoji_density emojis per message on average
+        emoji_count = int(emoji_density) + (rng.random() < emoji_density % 1)
+        text.extend(rng.choice(EMOJIS) for _ in range(emoji_count))
+        user = rng.choices(names, cum_weights=user_weights)[0]
+        yield f"{stamp} {user}: {' '.join(text)}"
+
+        if rng.random() < multiline_ratio:
+            for _ in range(rng.randint(1, 3)):
+                yield ' '.join(rng.choices(words, cum_weights=weights, k=rng.randint(1, 8)))
+
+
+def generate_chat(messages=10000, **knobs) -> bytes:
+    """
+    Return a synthetic export as bytes (see iter_chat_lines for the knobs)
+    """
+    return ''.join(f"{line}\n" for line in iter_chat_lines(messages, **knobs)).encode('utf-8')
+
+
+def write_chat(path, messages=10000, chunk_lines=100000, **knobs):
+    """
+    Write a synthetic export to path without holding it in memory, return its size in bytes
+    """
+    size, lines = 0, []
+    with open(path, 'wb') as f:
+        for line in iter_chat_lines(messages, **knobs):
+            lines.append(line)
+            if len(lines) >= chunk_lines:
+                size += f.write(('\n'.join(lines) + '\n').encode('utf-8'))
+                lines = []
+        if lines:
+            size += f.write(('\n'.join(lines) + '\n').encode('utf-8'))
+    return size
+
+
+def add_knob_arguments(parser):
+    """
+    Generator knobs as command line options, shared by the benchmarks
+    """
+    parser.add_argument('--users', type=int, default=6, help='Chat members')
+    parser.add_argument('--hebrew-ratio', type=float, default=0.5, help='Share of Hebrew messages and names')
+    parser.add_argument('--emoji-density', type=float, default=0.3, help='Average emojis per message')
+    parser.add_argument('--multiline-ratio', type=float, default=0.05, help='Share of multi-line messages')
+    parser.add_argument('--system-ratio', type=float, default=0.01, help='System lines per message')
+    parser.add_argument('--date-style', choices=['dots', 'slashes'], default='dots', help='Timestamp format')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed, same seed same chat')
+
+
+def knobs_from_args(args) -> dict:
+    return {
+        'users': args.users,
+        'hebrew_ratio': args.hebrew_ratio,
+        'emoji_density': args.emoji_density,
+        'multiline_ratio': args.multiline_ratio,
+        'system_ratio': args.system_ratio,
+        'date_style': args.date_style,
+        'seed': args.seed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('output', help='File to write')
+    parser.add_argument('--messages', type=int, default=10000, help='User messages in the chat')
+    add_knob_arguments(parser)
+    args = parser.parse_args()
+
+    size = write_chat(args.output, args.messages, **knobs_from_args(args))
+    print(f"📄 {args.output}: {args.messages:,} messages, {size / 1024 / 1024:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
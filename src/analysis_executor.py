@@ -0,0 +1,417 @@
+"""
+Process-pool executor for chat analysis, so concurrent uploads do not share one GIL
+"""
+
+import io
+import multiprocessing
+import os
+import threading
+import time
+from itertools import count
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from instrumentation import configure_logging, pipeline_run
+
+# Defaults, overridable with env vars of the same name
+ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', min(4, os.cpu_count() or 1)))
+ANALYSIS_QUEUE_SIZE = int(os.environ.get('ANALYSIS_QUEUE_SIZE', 8))
+ANALYSIS_JOB_TIMEOUT = float(os.environ.get('ANALYSIS_JOB_TIMEOUT', 300))
+ANALYSIS_MAX_CHAT_MB = int(os.environ.get('ANALYSIS_MAX_CHAT_MB', 500))
+ANALYSIS_MEMORY_BUDGET_MB = int(os.environ.get('ANALYSIS_MEMORY_BUDGET_MB', 8192))
+
+# Peak memory of parsing and analyzing a chat, per byte of the export: about 22 measured
+# by benchmarks/bench_memory.py (the search index and the parsed message dicts peak highest)
+CHAT_MEMORY_FACTOR = 24
+
+# Largest chat that can be admitted: the chat limit, unless the memory budget holds less.
+# The upload limits of the web app and the service follow it
+MAX_ADMITTED_CHAT_MB = min(ANALYSIS_MAX_CHAT_MB, ANALYSIS_MEMORY_BUDGET_MB // CHAT_MEMORY_FACTOR)
+
+# Finished jobs stay visible this long, so every session polling the same chat sees the result
+JOB_RETENTION_SECONDS = 120
+
+
+class ExecutorBusyError(Exception):
+    """Raised when the queue is full and a new job is not admitted"""
+
+
+class JobFailedError(Exception):
+    """Raised when a job failed or went over its timeout"""
+
+
+class ChatTooLargeError(Exception):
+    """Raised when a chat is over the size limit, or would not fit the memory budget on its own"""
+
+
+# Worker-side state: the queue partial results go back through, and the running job's
+# (key, submission token), so the messages of a replaced submission are told apart
+_stage_queue = None
+_current_job = None
+_published_stages = 0
+
+
+def _init_worker(stage_queue):
+    global _stage_queue
+    _stage_queue = stage_queue
+    configure_logging()
+
+
+def _warm_worker():
+    """
+    Load the analysis modules into a worker ahead of the first job
+    """
+    import analyzer
+    import parser
+    # Held briefly, so each warm-up call lands on its own worker
+    time.sleep(0.05)
+
+
+def _run_job(job_id, fn, args):
+    """
+    Run fn(*args) for the job (key, submission token) and return (result, number of stages
+    it published). A job that publishes stages also publishes the timings of its run, as the
+    'timings' results key. Runs inside the worker processes
+    """
+    global _current_job, _published_stages
+    _current_job, _published_stages = job_id, 0
+    # No stage and no progress: tells the executor the job has started, its timeout runs from here
+    _stage_queue.put((job_id, None, None))
+    try:
+        with pipeline_run(fn.__name__, chat=str(job_id[0])[:16]) as run:
+            result = fn(*args)
+        if _published_stages:
+            publish_stage('timings', {'timings': run.as_dict()})
+        return result, _published_stages
+    finally:
+        _current_job = None
+
+
+def publish_stage(stage, results: dict):
+    """
+    Send the results of one finished stage to the waiting sessions, before the job ends
+    """
+    global _published_stages
+    _stage_queue.put((_current_job, stage, results))
+    _published_stages += 1
+
+
+def publish_progress(bytes_read, total_bytes):
+    """
+    Send how far parsing has got, for the progress bar of the waiting sessions
+    """
+    _stage_queue.put((_current_job, None, (bytes_read, total_bytes)))
+
+
+def parse_chat_stream(stream, total_bytes):
+    """
+    Parse a binary chat stream chunk by chunk, publishing progress by bytes read.
+    Raises parser.ChatFormatError early for files that are not chat exports
+    """
+    from parser import parse_whatsapp_stream
+
+    return parse_whatsapp_stream(stream, total_bytes, on_progress=publish_progress)
+
+
+def publish_analysis(df):
+    """
+    Analyze parsed messages, publishing each analysis stage as it finishes.
+    Returns an empty dict, also when the chat has no messages
+    """
+    # Only the workers need the analyzer, the web server process never loads it
+    from analyzer import iter_analysis_stages
+
+    for stage, results in iter_analysis_stages(df):
+        publish_stage(stage, results)
+    return {}
+
+
+def analyze_chat_bytes(data: bytes):
+    """
+    Parse and analyze raw chat bytes, publishing parse progress and each analysis stage.
+    Runs inside the worker processes
+    """
+    # BytesIO shares the buffer instead of copying it
+    return publish_analysis(parse_chat_stream(io.BytesIO(data), len(data)))
+
+
+def analyze_chat_upload(path):
+    """
+    Parse and analyze a chat spooled to a temp file (see file_utils.spool_upload), deleting
+    the file once parsed. Large uploads travel this way, so the bytes are not pickled across
+    processes and the worker never holds the whole export. Runs inside the worker processes
+    """
+    try:
+        with open(path, 'rb') as f:
+            df = parse_chat_stream(f, os.fstat(f.fileno()).st_size)
+    finally:
+        os.remove(path)
+    return publish_analysis(df)
+
+
+class AnalysisExecutor:
+    """
+    Bounded process pool with a job queue, per-job timeouts and admission control.
+    Jobs are keyed (e.g. by content digest): submitting a key that is already queued or
+    running joins the existing job instead of analyzing the same chat twice.
+    Jobs may publish partial results stage by stage (see publish_stage), which are
+    readable with partial_results while the job runs and make up its result.
+    The timeout runs from when a worker starts the job, not while it waits in the queue.
+    A timed-out job is reported as failed and its result discarded; it keeps its slot
+    until the analysis returns and its worker process is reused.
+    When a worker process dies (e.g. killed for running out of memory) the jobs in the pool
+    fail and the pool is replaced on the next submit.
+    Chats (the bytes arguments of a job) over max_chat_bytes are refused, and a job is
+    only admitted while the estimated memory of all queued and running chats fits the budget
+    """
+
+    def __init__(self, max_workers=ANALYSIS_WORKERS, max_queued=ANALYSIS_QUEUE_SIZE,
+                 job_timeout=ANALYSIS_JOB_TIMEOUT, max_chat_bytes=ANALYSIS_MAX_CHAT_MB * 1024 * 1024,
+                 memory_budget_bytes=ANALYSIS_MEMORY_BUDGET_MB * 1024 * 1024):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.job_timeout = job_timeout
+        self.max_chat_bytes = max_chat_bytes
+        self.memory_budget_bytes = memory_budget_bytes
+        self._stage_queue = multiprocessing.Queue()
+        self._pool = self._new_pool()
+        self._jobs = {}
+        # Timed-out jobs replaced by a new submission of their key, while their worker still runs them
+        self._replaced = []
+        self._tokens = count()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+        # Files published stages under their job, for every session to read
+        self._collector = threading.Thread(target=self._collect_stages, name="analysis-stages", daemon=True)
+        self._collector.start()
+
+    def warm_up(self, block=True):
+        """
+        Start every worker process and load the analysis modules in it,
+        so the first jobs do not pay for process start-up and imports
+        """
+        futures = [self._pool.submit(_warm_worker) for _ in range(self.max_workers)]
+        if block:
+            wait(futures)
+
+    def check_size(self, size):
+        """
+        Raise ChatTooLargeError if a chat of size bytes can never be admitted
+        """
+        limit = min(self.max_chat_bytes, self.memory_budget_bytes // CHAT_MEMORY_FACTOR)
+        if size > limit:
+            raise ChatTooLargeError(f"Chat is {size / 1024 / 1024:.0f} MB, the limit is {limit // (1024 * 1024)} MB")
+
+    def submit(self, key, *args, fn=analyze_chat_bytes, size=None):
+        """
+        Queue fn(*args) under key, or join the existing job with that key.
+        Returns True when a new job was queued, False when an existing one was joined.
+        size is the chat size in bytes, by default the length of the bytes arguments.
+        Raises ChatTooLargeError for a chat over the limits, ExecutorBusyError when all
+        workers are busy and the queue is full or the memory budget is taken by other chats
+        """
+        if size is None:
+            size = sum(len(arg) for arg in args if isinstance(arg, (bytes, bytearray, memoryview)))
+        self.check_size(size)
+        memory = size * CHAT_MEMORY_FACTOR
+
+        with self._lock:
+            self._purge()
+            job = self._jobs.get(key)
+            if job is not None and not self._failed(job):
+                return False
+
+            if self._active_count() >= self.max_workers + self.max_queued:
+                self.rejected += 1
+                raise ExecutorBusyError(f"Analysis queue is full ({self.max_queued} waiting), try again shortly")
+            if self._active_memory() + memory > self.memory_budget_bytes:
+                self.rejected += 1
+                raise ExecutorBusyError("The server is busy with other large chats, try again shortly")
+
+            if job is not None and not job['future'].done():
+                self._replaced.append(job)
+            token = next(self._tokens)
+            try:
+                future = self._pool.submit(_run_job, (key, token), fn, args)
+            except BrokenProcessPool:
+                self._restart_pool()
+                future = self._pool.submit(_run_job, (key, token), fn, args)
+            job = {
+                'future': future,
+                'token': token,
+                'submitted': time.monotonic(),
+                'started': None,
+                'finished': None,
+                'memory': memory,
+                'progress': None,
+                'stages': {},
+            }
+            job['future'].add_done_callback(lambda _, job=job: job.update(finished=time.monotonic()))
+            self._jobs[key] = job
+            return True
+
+    def status(self, key) -> dict:
+        """
+        Return the job state ('queued', 'running', 'done', 'failed', 'timeout' or 'unknown'),
+        its elapsed seconds, its place in the queue, its finished stages and its parse
+        progress as (bytes read, total bytes), None until parsing starts
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None:
+                return {'state': 'unknown', 'elapsed': 0.0, 'queue_position': None, 'stages': [], 'progress': None}
+
+            future = job['future']
+            elapsed = (job['finished'] or time.monotonic()) - job['submitted']
+            if self._timed_out(job):
+                state = 'timeout'
+            elif future.done() and future.exception():
+                state = 'failed'
+            elif future.done() and len(job['stages']) >= future.result()[1]:
+                state = 'done'
+            else:
+                # A finished job stays running until all its published stages arrived
+                state = 'running' if job['started'] is not None or future.done() else 'queued'
+
+            position = None
+            if state == 'queued':
+                position = sum(
+                    1 for other in self._jobs.values()
+                    if not other['future'].done() and other['started'] is None
+                    and other['submitted'] < job['submitted']
+                ) + 1
+            return {'state': state, 'elapsed': elapsed, 'queue_position': position, 'stages': list(job['stages']),
+                    'progress': job['progress']}
+
+    def partial_results(self, key) -> dict:
+        """
+        Return the merged results of the stages the job has published so far
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            stages = list(job['stages'].values()) if job is not None else []
+        results = {}
+        for stage_results in stages:
+            results.update(stage_results)
+        return results
+
+    def result(self, key):
+        """
+        Return the result of a finished job, raising JobFailedError if it failed or timed out.
+        For a job that published stages, that is its merged stage results
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+        if job is None:
+            raise KeyError(key)
+
+        if self._timed_out(job):
+            raise JobFailedError(f"Analysis took longer than {self.job_timeout:.0f}s and was stopped")
+        if not job['future'].done():
+            raise RuntimeError(f"Job {key} has not finished yet")
+
+        error = job['future'].exception()
+        if error is not None:
+            raise JobFailedError(f"Analysis failed: {error}") from error
+        result, published = job['future'].result()
+        return self.partial_results(key) if published else result
+
+    def stats(self) -> dict:
+        """
+        Return queue counters, for the debug panel and load tests
+        """
+        with self._lock:
+            running = sum(1 for job in self._unfinished() if job['started'] is not None)
+            return {
+                'running': running,
+                'queued': self._active_count() - running,
+                'rejected': self.rejected,
+                'workers': self.max_workers,
+            }
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+        self._stage_queue.put(None)
+        if wait:
+            # Stages still in the queue are filed before the interpreter may exit
+            self._collector.join()
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                   initargs=(self._stage_queue,))
+
+    def _restart_pool(self):
+        """
+        Replace a pool broken by a worker process that died. The jobs it held have already
+        failed (and may be submitted again), the next ones run on fresh workers
+        """
+        self._pool.shutdown(wait=False)
+        self._pool = self._new_pool()
+
+    def _collect_stages(self):
+        while True:
+            try:
+                item = self._stage_queue.get()
+            except (EOFError, OSError):
+                # The queue went away with the interpreter
+                return
+            if item is None:
+                return
+            (key, token), stage, results = item
+            with self._lock:
+                job = self._jobs.get(key)
+                # Messages of a replaced (timed-out) submission are not for the current job
+                if job is None or job['token'] != token or self._timed_out(job):
+                    continue
+                if stage is None and results is None:
+                    job['started'] = job['started'] or time.monotonic()
+                elif stage is None:
+                    job['progress'] = results
+                else:
+                    job['stages'][stage] = results
+
+    def _timed_out(self, job) -> bool:
+        finished = job['finished']
+        if finished is None and job['future'].done():
+            # The done callback has not run yet, the job has just finished
+            return False
+        if job['started'] is None:
+            # Still waiting for a worker (or finished before its start was seen)
+            return False
+        return (finished or time.monotonic()) - job['started'] > self.job_timeout
+
+    def _failed(self, job) -> bool:
+        future = job['future']
+        return self._timed_out(job) or (future.done() and future.exception() is not None)
+
+    def _active_count(self) -> int:
+        """
+        Jobs holding a worker or a queue slot: unfinished, timed-out ones too while their worker still runs them
+        """
+        return len(self._unfinished())
+
+    def _active_memory(self) -> int:
+        """
+        Estimated memory of unfinished jobs, timed-out ones too while their worker still runs them
+        """
+        return sum(job['memory'] for job in self._unfinished())
+
+    def _unfinished(self) -> list:
+        """
+        Jobs whose future is not done, including replaced ones
+        """
+        self._replaced = [job for job in self._replaced if not job['future'].done()]
+        return [job for job in [*self._jobs.values(), *self._replaced] if not job['future'].done()]
+
+    def _purge(self):
+        """
+        Forget finished jobs after the retention period
+        """
+        now = time.monotonic()
+        expired = [
+            key for key, job in self._jobs.items()
+            if job['finished'] is not None and now - job['finished'] > JOB_RETENTION_SECONDS
+        ]
+        for key in expired:
+            del self._jobs[key]
@@ -3,10 +3,13 @@ Analyzing functions the analyze the data
 """
 
 import pandas as pd
+import numpy as np
+from bisect import bisect_left
 from collections import Counter
 import re
-import emoji
 from typing import List
+from instrumentation import count, pipeline_run, timed
+from metrics import SUMMARY_METRICS
 
 # Quick regex prefilter for emoji-like codepoints
 _EMOJI_QUICK_ROW = re.compile(
@@ -17,9 +20,11 @@ _EMOJI_QUICK_ROW = re.compile(
     r"]"
 )
 
-def preprocess_df(df: pd.DataFrame) -> pd.DataFrame:
+@timed()
+def preprocess_df(df: pd.DataFrame, emojis=True) -> pd.DataFrame:
     """
-    Preprocess dataframe with all needed columns for the analyzing process
+    Preprocess dataframe with all needed columns for the analyzing process.
+    With emojis=False the (slow) emoji columns are left for extract_emojis to add later
     """
     df = df.copy()
     # Converting the messages to string
@@ -32,17 +37,21 @@ def preprocess_df(df: pd.DataFrame) -> pd.DataFrame:
     df['day_name'] = df['datetime'].dt.day_name()
 
     # Extract emojis from messages
-    df['emojis'] = extract_emojis(df)
-    df['emoji_count'] = df['emojis'].apply(len)
-        
+    if emojis:
+        extract_emojis(df)
+
     return df
 
+@timed()
 def extract_emojis(df: pd.DataFrame) -> pd.Series:
     """
     Extract emojis from a DataFrame column.
     The function uses a regex prefilter to quickly identify rows that may contain emojis,
     and then applies a more accurate extraction method to those rows.
     """
+    # Imported on first use, so importing the analyzer stays light
+    import emoji
+
     # Regex prefilter 
     mask_likely_em = df['message'].str.contains(_EMOJI_QUICK_ROW)
 
@@ -50,6 +59,7 @@ def extract_emojis(df: pd.DataFrame) -> pd.Series:
     emojis_col: List[List[str]] = [[] for _ in range(len(df))]
 
     # Run accurate extraction only on flagged rows
+    count('emojis.flagged_messages', int(mask_likely_em.sum()))
     flagged_idx = df.index[mask_likely_em]
     flagged_msgs = df.loc[mask_likely_em, 'message']
     for i, s in zip(flagged_idx, flagged_msgs):
@@ -61,6 +71,7 @@ def extract_emojis(df: pd.DataFrame) -> pd.Series:
 
     return df['emojis']
 
+@timed()
 def calculate_basic_stats(df: pd.DataFrame):
     """
     Calculate basic statistics from the DataFrame
@@ -71,6 +82,7 @@ def calculate_basic_stats(df: pd.DataFrame):
 
     return total_messages, total_users, date_range
 
+@timed()
 def calculate_user_metrics(df: pd.DataFrame):
     """
     Calculate user-related metrics
@@ -80,6 +92,7 @@ def calculate_user_metrics(df: pd.DataFrame):
 
     return messages_per_user, avg_length_per_user
 
+@timed()
 def calculate_time_patterns(df: pd.DataFrame):
     """
     Calculate time-based patterns
@@ -90,6 +103,127 @@ def calculate_time_patterns(df: pd.DataFrame):
 
     return messages_by_hour, messages_by_day
 
+@timed()
+def calculate_activity_heatmap(df: pd.DataFrame):
+    """
+    Calculate hour x weekday message counts for every user in one grouped count:
+      - users: sorted user names, slice i of counts
+      - counts: users x 7 (Monday first) x 24 hours
+    The whole-chat heatmap is counts.sum(axis=0)
+    """
+    users = sorted(df['user'].unique())
+    codes = pd.Categorical(df['user'], categories=users).codes.astype(np.int64)
+
+    # Integer (user, weekday, hour) keys, no day_name strings involved
+    keys = codes * 168 + df['datetime'].dt.dayofweek.to_numpy(dtype=np.int64) * 24 + df['hour'].to_numpy(dtype=np.int64)
+    counts = np.bincount(keys, minlength=len(users) * 168).astype(np.int32)
+
+    return {
+        'users': users,
+        'counts': counts.reshape(len(users), 7, 24),
+    }
+
+@timed()
+def calculate_activity_timeline(df: pd.DataFrame):
+    """
+    Calculate per-day message counts per user, stored as cumulative (prefix-sum) arrays,
+    so any date range total or rolling average is a subtraction of two entries:
+      - start: the first day of the chat (numpy datetime64[D])
+      - users: sorted user names, row i of cumulative
+      - cumulative: users x (days + 1), cumulative[i, d] = messages of user i before day d
+      - total_cumulative: the same for all users together
+    """
+    users = sorted(df['user'].unique())
+    days = df['datetime'].to_numpy().astype('datetime64[D]')
+    start = days.min()
+    day_idx = (days - start).astype(np.int64)
+    n_days = int(day_idx.max()) + 1
+
+    # One bincount over (user, day) keys counts everything in a single pass
+    codes = pd.Categorical(df['user'], categories=users).codes.astype(np.int64)
+    counts = np.bincount(codes * n_days + day_idx, minlength=len(users) * n_days).reshape(len(users), n_days)
+
+    cumulative = np.zeros((len(users), n_days + 1), dtype=np.int32)
+    np.cumsum(counts, axis=1, out=cumulative[:, 1:])
+    total_cumulative = np.zeros(n_days + 1, dtype=np.int64)
+    np.cumsum(counts.sum(axis=0), out=total_cumulative[1:])
+
+    return {
+        'start': start,
+        'users': users,
+        'cumulative': cumulative,
+        'total_cumulative': total_cumulative,
+    }
+
+def _timeline_cumulative(timeline: dict, user=None) -> np.ndarray:
+    """
+    Return the cumulative counts of one user, or of the whole chat when user is None
+    """
+    if user is None:
+        return timeline['total_cumulative']
+    i = bisect_left(timeline['users'], user)
+    if i == len(timeline['users']) or timeline['users'][i] != user:
+        return np.zeros_like(timeline['total_cumulative'])
+    return timeline['cumulative'][i]
+
+def _timeline_bounds(timeline: dict, start=None, end=None):
+    """
+    Convert an inclusive [start, end] date range to a clamped [first, last) day range
+    """
+    n_days = len(timeline['total_cumulative']) - 1
+    first = 0 if start is None else int((np.datetime64(start, 'D') - timeline['start']).astype(np.int64))
+    last = n_days if end is None else int((np.datetime64(end, 'D') - timeline['start']).astype(np.int64)) + 1
+    first, last = min(max(first, 0), n_days), min(max(last, 0), n_days)
+    return first, max(first, last)
+
+def timeline_range_total(timeline: dict, start=None, end=None, user=None) -> int:
+    """
+    Total messages between start and end (inclusive dates), for one user or everyone
+    """
+    first, last = _timeline_bounds(timeline, start, end)
+    cumulative = _timeline_cumulative(timeline, user)
+    return int(cumulative[last] - cumulative[first])
+
+def timeline_daily_counts(timeline: dict, start=None, end=None, user=None) -> pd.Series:
+    """
+    Daily message counts between start and end (inclusive dates), indexed by date
+    """
+    first, last = _timeline_bounds(timeline, start, end)
+    counts = np.diff(_timeline_cumulative(timeline, user)[first:last + 1])
+    dates = (timeline['start'] + np.arange(first, last)).astype('datetime64[ns]')
+    return pd.Series(counts, index=pd.DatetimeIndex(dates))
+
+def timeline_rolling_average(timeline: dict, window=7, start=None, end=None, user=None) -> pd.Series:
+    """
+    Rolling average of daily messages over the last window days, for every day in the range.
+    Each value is one subtraction on the cumulative array, windows reach back before start
+    """
+    first, last = _timeline_bounds(timeline, start, end)
+    cumulative = _timeline_cumulative(timeline, user)
+    ends = np.arange(first, last) + 1
+    averages = (cumulative[ends] - cumulative[np.maximum(ends - window, 0)]) / window
+    dates = (timeline['start'] + np.arange(first, last)).astype('datetime64[ns]')
+    return pd.Series(averages, index=pd.DatetimeIndex(dates))
+
+def timeline_rollup(timeline: dict, freq='W', start=None, end=None, user=None) -> pd.Series:
+    """
+    Message counts per week ('W') or month ('M') between start and end, indexed by period start
+    """
+    first, last = _timeline_bounds(timeline, start, end)
+    cumulative = _timeline_cumulative(timeline, user)
+    if first == last:
+        return pd.Series(dtype=np.int64)
+
+    # Period boundaries are the days where the week / month label changes
+    dates = pd.DatetimeIndex((timeline['start'] + np.arange(first, last)).astype('datetime64[ns]'))
+    periods = dates.to_period(freq)
+    changes = np.flatnonzero(periods[1:] != periods[:-1]) + 1
+    bounds = np.concatenate([[0], changes, [last - first]]) + first
+
+    totals = cumulative[bounds[1:]] - cumulative[bounds[:-1]]
+    return pd.Series(totals, index=periods[bounds[:-1] - first].start_time)
+
+@timed()
 def calculate_laugh_analysis(df: pd.DataFrame):
     """
     Calculate laugh patterns for both Hebrew and English, based on common patterns
@@ -103,35 +237,204 @@ def calculate_laugh_analysis(df: pd.DataFrame):
 
     return laughs_per_user
 
+# Define Hebrew and English stopwords that wont be a common word
+STOPWORDS = frozenset({
+    'את', 'של', 'על', 'כל', 'לא', 'זה', 'אם', 'או', 'כן', 'לו', 'הוא', 'היא', 'אני', 'אתה', 'זו', 'מה', 'איך',
+    'מי', 'למה', 'איפה', 'מתי', 'עם', 'בלי', 'אבל', 'גם', 'רק', 'כבר', 'עוד', 'פה', 'שם', 'הם', 'אנחנו', 'אתם',
+    'לי', 'שלי', 'שלך', 'שלנו', 'שלכם', 'שלהם', 'שלהן', 'סבבה', 'אז', 'טוב', 'אין', 'יש', 'לך', 'כי', 'איתך',
+    'עכשיו', 'שיחה', 'קולית', 'היום', 'כאילו', 'יהיה', 'איזה', 'נראה', 'היה',
+    'the', 'and', 'is', 'on', 'to', 'you', 'a', 'i', 'of', 'in', 'it', 'this', 'that', 'for', 'was', 'with', 'are',
+    'at', 'but', 'be', 'have', 'not', 'we', 'they', 'he', 'she'
+})
+
+# Words over 2 characters, allowing Hebrew and English letters
+WORD_PATTERN = re.compile(r'[א-תa-zA-Z]{2,}')
+
+# Top words kept per chat and per user, e.g. for word clouds
+WORD_VOCABULARY_SIZE = 200
+
+def _prune_counter(counter: Counter, max_size: int):
+    """
+    Keep a counter bounded: once it grows past max_size, drop everything but the
+    max_size // 2 most frequent entries. Frequent items survive, so top-N stays accurate
+    while rare phrases (the long tail) never accumulate
+    """
+    if len(counter) > max_size:
+        keep = counter.most_common(max_size // 2)
+        counter.clear()
+        counter.update(dict(keep))
+
+@timed()
+def calculate_text_frequencies(df: pd.DataFrame, top_n=10, ngram_sizes=(2, 3),
+                               max_phrases=200_000, max_user_phrases=1_000, top_user_phrases=5,
+                               vocabulary_size=0, chunk_size=5_000):
+    """
+    Calculate most common words and phrases (bigrams, trigrams) in one streaming pass over the messages.
+    Phrases never cross a stopword, so "going to the beach" yields no phrase but "happy birthday" does.
+    Counters are updated once per chunk of messages and then pruned to max_phrases
+    (max_user_phrases per user), which bounds memory on huge chats.
+    With vocabulary_size, the top words of every user are counted too (e.g. for word clouds).
+    Returns (most common words, {n: most common n-grams}, {user: top phrases}, {user: top words})
+    """
+    words = Counter()
+    phrases = {n: Counter() for n in ngram_sizes}
+    user_phrases = {}
+    user_words = {}
+
+    users = df['user'].tolist()
+    messages = df['lower_message'].tolist()
+    for start in range(0, len(messages), chunk_size):
+        chunk_words = []
+        chunk_phrases = {n: [] for n in ngram_sizes}
+        chunk_user_phrases = {}
+        chunk_user_words = {}
+
+        for user, message in zip(users[start:start + chunk_size], messages[start:start + chunk_size]):
+            # Collect runs of non-stopwords, the empty sentinel closes the last run
+            run = []
+            message_start = len(chunk_words)
+            for token in WORD_PATTERN.findall(message) + ['']:
+                if token and token not in STOPWORDS:
+                    run.append(token)
+                    chunk_words.append(token)
+                    continue
+                if len(run) > 1 and ngram_sizes:
+                    user_grams = chunk_user_phrases.setdefault(user, [])
+                    for n in ngram_sizes:
+                        grams = [' '.join(run[i:i + n]) for i in range(len(run) - n + 1)]
+                        chunk_phrases[n].extend(grams)
+                        user_grams.extend(grams)
+                run = []
+            if vocabulary_size:
+                chunk_user_words.setdefault(user, []).extend(chunk_words[message_start:])
+
+        # Counter.update on whole lists runs in C, so counting happens per chunk
+        words.update(chunk_words)
+        for user, user_chunk in chunk_user_words.items():
+            counter = user_words.setdefault(user, Counter())
+            counter.update(user_chunk)
+            _prune_counter(counter, max(max_user_phrases, vocabulary_size * 2))
+        for n, counter in phrases.items():
+            counter.update(chunk_phrases[n])
+            _prune_counter(counter, max_phrases)
+        for user, grams in chunk_user_phrases.items():
+            counter = user_phrases.setdefault(user, Counter())
+            counter.update(grams)
+            _prune_counter(counter, max_user_phrases)
+
+    return (
+        words.most_common(top_n),
+        {n: counter.most_common(top_n) for n, counter in phrases.items()},
+        {user: counter.most_common(top_user_phrases) for user, counter in user_phrases.items()},
+        {user: counter.most_common(vocabulary_size) for user, counter in user_words.items()},
+    )
+
 def calculate_word_frequency(df: pd.DataFrame):
     """
     Calculate most common words
     """
-    # Converting all the messages to one long text
-    text = ' '.join(df['lower_message'])
-
-    # Define Hebrew and English stopwords that wont be a common word
-    stopwords = {
-        'את', 'של', 'על', 'כל', 'לא', 'זה', 'אם', 'או', 'כן', 'לו', 'הוא', 'היא', 'אני', 'אתה', 'זו', 'מה', 'איך',
-        'מי', 'למה', 'איפה', 'מתי', 'עם', 'בלי', 'אבל', 'גם', 'רק', 'כבר', 'עוד', 'פה', 'שם', 'הם', 'אנחנו', 'אתם',
-        'לי', 'שלי', 'שלך', 'שלנו', 'שלכם', 'שלהם', 'שלהן', 'סבבה', 'אז', 'טוב', 'אין', 'יש', 'לך', 'כי', 'איתך',
-        'עכשיו', 'שיחה', 'קולית', 'היום', 'כאילו', 'יהיה', 'איזה', 'נראה', 'היה',
-        'the', 'and', 'is', 'on', 'to', 'you', 'a', 'i', 'of', 'in', 'it', 'this', 'that', 'for', 'was', 'with', 'are',
-        'at', 'but', 'be', 'have', 'not', 'we', 'they', 'he', 'she'
+    most_common_words, _, _, _ = calculate_text_frequencies(df, ngram_sizes=())
+    return most_common_words
+
+@timed()
+def build_search_index(df: pd.DataFrame):
+    """
+    Build an inverted index from word to the rows (messages) containing it.
+    Uses the same tokenization and stopwords as calculate_word_frequency.
+    Posting lists are stored delta-encoded in one flat array:
+      - vocabulary: sorted words, word j owns postings[offsets[j]:offsets[j + 1]]
+      - postings: row id gaps (uint32), the cumulative sum restores the row ids
+      - row_days, row_users, users: day and user code of every row, for timelines
+    """
+    tokens = df['lower_message'].str.findall(WORD_PATTERN)
+    rows = np.repeat(np.arange(len(df), dtype=np.int64), tokens.str.len().to_numpy())
+    pairs = pd.DataFrame({'word': [w for words in tokens for w in words], 'row': rows})
+
+    # A message counts once per word, and stopwords are not indexed
+    pairs = pairs[~pairs['word'].isin(STOPWORDS)].drop_duplicates()
+    codes, vocabulary = pd.factorize(pairs['word'], sort=True)
+    row_ids = pairs['row'].to_numpy()
+
+    # Sort by (word, row) so every posting list is contiguous and ascending
+    order = np.lexsort((row_ids, codes))
+    codes, row_ids = codes[order], row_ids[order]
+    offsets = np.searchsorted(codes, np.arange(len(vocabulary) + 1))
+
+    # Delta-encode inside each posting list, the first entry of each list stays absolute
+    postings = np.diff(row_ids, prepend=0)
+    postings[offsets[:-1]] = row_ids[offsets[:-1]]
+
+    users = sorted(df['user'].unique())
+    return {
+        'vocabulary': list(vocabulary),
+        'offsets': offsets,
+        'postings': postings.astype(np.uint32),
+        'row_days': df['datetime'].to_numpy().astype('datetime64[D]').astype(np.int32),
+        'row_users': pd.Categorical(df['user'], categories=users).codes.astype(np.int32),
+        'users': users,
     }
 
-    # Using regex to find words over 2 characters, allowing Hebrew and English letters
-    words = re.findall(r'[א-תa-zA-Z]{2,}', text)
+def search_messages(search_index: dict, query: str, prefix=False) -> np.ndarray:
+    """
+    Return the sorted row ids of messages containing every word of the query.
+    With prefix=True each query word matches all words starting with it
+    """
+    words = WORD_PATTERN.findall(query.lower())
+    if not words:
+        return np.zeros(0, dtype=np.int64)
+
+    vocabulary = search_index['vocabulary']
+    offsets = search_index['offsets']
+    result = None
+    for word in words:
+        # Vocabulary is sorted, so exact and prefix matches are one contiguous range
+        lo = bisect_left(vocabulary, word)
+        if prefix:
+            hi = bisect_left(vocabulary, word + '\uffff')
+        else:
+            hi = lo + 1 if lo < len(vocabulary) and vocabulary[lo] == word else lo
+
+        lists = [np.cumsum(search_index['postings'][offsets[j]:offsets[j + 1]], dtype=np.int64) for j in range(lo, hi)]
+        rows = np.unique(np.concatenate(lists)) if lists else np.zeros(0, dtype=np.int64)
+        result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+
+    return result
+
+def search_term_per_user(search_index: dict, query: str, prefix=False):
+    """
+    Count messages matching the query per user, sorted from high to low
+    """
+    rows = search_messages(search_index, query, prefix)
+    counts = np.bincount(search_index['row_users'][rows], minlength=len(search_index['users']))
+    per_user = pd.Series(counts, index=search_index['users'])
+    return per_user[per_user > 0].sort_values(ascending=False).to_dict()
 
-    # Filtering out stopwords and returning top 10 most common words
-    filtered = [w for w in words if w not in stopwords]
+def search_term_timeline(search_index: dict, query: str, prefix=False, freq='W', user=None):
+    """
+    Count messages matching the query over time, resampled to freq ('D', 'W', 'MS'),
+    optionally only for one user ({} for a user not in the chat)
+    """
+    rows = search_messages(search_index, query, prefix)
+    if user is not None:
+        users = search_index['users']
+        code = bisect_left(users, user)
+        if code == len(users) or users[code] != user:
+            return {}
+        rows = rows[search_index['row_users'][rows] == code]
+    if len(rows) == 0:
+        return {}
 
-    return Counter(filtered).most_common(10)
+    days = search_index['row_days'][rows]
+    first = days.min()
+    counts = np.bincount(days - first)
+    index = pd.to_datetime(np.arange(first, first + len(counts)).astype('datetime64[D]'))
+    return pd.Series(counts, index=index).resample(freq).sum().to_dict()
 
-def get_avg_response(df: pd.DataFrame):
+def _response_pairs(df: pd.DataFrame, max_gap_hours=6):
     """
-    Calculate average response time per user, 
-    excluding messages from the same user and ignoring gaps over 6 hours
+    Pair every reply with the message it answered.
+    Returns the responders, the previous speakers and the gaps between them,
+    excluding messages from the same user and gaps over max_gap_hours
     """
     # Sort DataFrame by datetime
     df_sorted = df.sort_values('datetime').reset_index(drop=True)
@@ -144,22 +447,230 @@ def get_avg_response(df: pd.DataFrame):
     changed = df_sorted['user'].ne(prev_user)
     gaps = df_sorted['datetime'] - prev_time
 
-    # Create mask for valid response times, when user changed, and the gap is under 6 hours
-    mask = changed & gaps.notna() & (gaps <= pd.Timedelta(hours=6))
+    # Create mask for valid response times, when user changed, and the gap is under the limit
+    mask = changed & gaps.notna() & (gaps <= pd.Timedelta(hours=max_gap_hours))
+
+    return df_sorted.loc[mask, 'user'], prev_user[mask], gaps[mask]
 
+def format_duration(seconds: float) -> str:
+    """
+    Format a duration in seconds to 0h 0m 0s for display
+    """
+    total = int(seconds)
+    h, rem = divmod(total, 3600)
+    m, s = divmod(rem, 60)
+    return f"{h}h {m}m {s}s" if h else f"{m}m {s}s" if m else f"{s}s"
+
+def _avg_response_from_pairs(responders: pd.Series, gaps: pd.Series):
+    """
+    Mean response time per responder, formatted for display
+    """
+    mean_resp = gaps.groupby(responders).mean().sort_values(ascending=False)
+    return {user: format_duration(td.total_seconds()) for user, td in mean_resp.items()}
+
+def get_avg_response(df: pd.DataFrame):
+    """
+    Calculate average response time per user, 
+    excluding messages from the same user and ignoring gaps over 6 hours
+    """
     # Get the responders and their mean response times
-    responders = df_sorted.loc[mask, 'user']
-    mean_resp = gaps[mask].groupby(responders).mean().sort_values(ascending=False)
+    responders, _, gaps = _response_pairs(df)
+    return _avg_response_from_pairs(responders, gaps)
 
-    # Format the timedelta objects to 0h 0m 0s for display
-    def format_td(td: pd.Timedelta) -> str:
-        total = int(td.total_seconds())
-        h, rem = divmod(total, 3600)
-        m, s = divmod(rem, 60)
-        return f"{h}h {m}m {s}s" if h else f"{m}m {s}s" if m else f"{s}s"
+def _reply_graph_from_pairs(users: list, responders: pd.Series, previous: pd.Series, gaps: pd.Series):
+    """
+    Build the sparse reply graph from already paired replies, see calculate_reply_graph
+    """
+    n_users = len(users)
+
+    # Encode both sides as user codes and build one int64 key per reply
+    resp_codes = pd.Categorical(responders, categories=users).codes.astype(np.int64)
+    prev_codes = pd.Categorical(previous, categories=users).codes.astype(np.int64)
+    keys = resp_codes * n_users + prev_codes
+    seconds = gaps.dt.total_seconds().to_numpy(dtype=np.float64)
+
+    # Sorting by key groups every pair together, so each pair is one contiguous slice
+    order = np.argsort(keys, kind='stable')
+    keys, seconds = keys[order], seconds[order]
+    pair_keys, starts, counts = np.unique(keys, return_index=True, return_counts=True)
+    latency_sums = np.add.reduceat(seconds, starts) if len(seconds) else np.zeros(0)
+
+    rows = pair_keys // n_users if n_users else pair_keys
+    return {
+        'users': users,
+        'indptr': np.searchsorted(rows, np.arange(n_users + 1)),
+        'partners': (pair_keys % n_users if n_users else pair_keys).astype(np.int32),
+        'counts': counts.astype(np.int64),
+        'latency_sums': latency_sums,
+        'latency_offsets': np.append(starts, len(seconds)),
+        'latencies': seconds.astype(np.float32),
+    }
+
+def calculate_reply_graph(df: pd.DataFrame, max_gap_hours=6):
+    """
+    Calculate who replies to whom, as a sparse responder x previous speaker matrix.
+    Only pairs that actually occurred are stored (CSR layout), so memory grows with the
+    number of replies and not with users squared:
+      - users: sorted user names, row/column i of the matrix
+      - indptr: partners of responder i are partners[indptr[i]:indptr[i + 1]]
+      - partners, counts, latency_sums: one entry per (responder, previous speaker) pair
+      - latency_offsets, latencies: the gaps (seconds) of pair j are
+        latencies[latency_offsets[j]:latency_offsets[j + 1]]
+    """
+    responders, previous, gaps = _response_pairs(df, max_gap_hours)
+    return _reply_graph_from_pairs(sorted(df['user'].unique()), responders, previous, gaps)
+
+# Fixed log-spaced bucket edges (seconds) for response time histograms:
+# one bucket for sub-second replies, then 63 buckets from 1s up to the 6 hour cap.
+# Every histogram shares these edges, which is what makes them mergeable
+LATENCY_BUCKET_EDGES = np.concatenate([[0.0], np.geomspace(1, 6 * 3600, 64)])
+
+def _latency_histograms_from_pairs(users: list, responders: pd.Series, gaps: pd.Series):
+    """
+    Build per-user response time histograms from already paired replies
+    """
+    n_buckets = len(LATENCY_BUCKET_EDGES) - 1
+    codes = pd.Categorical(responders, categories=users).codes.astype(np.int64)
+    seconds = gaps.dt.total_seconds().to_numpy(dtype=np.float64)
+    buckets = np.clip(np.searchsorted(LATENCY_BUCKET_EDGES, seconds, side='right') - 1, 0, n_buckets - 1)
+
+    # One bincount over (user, bucket) keys fills the whole users x buckets table
+    counts = np.bincount(codes * n_buckets + buckets, minlength=len(users) * n_buckets)
+    return {
+        'users': users,
+        'edges': LATENCY_BUCKET_EDGES,
+        'counts': counts.reshape(len(users), n_buckets),
+    }
+
+def calculate_response_time_histograms(df: pd.DataFrame, max_gap_hours=6):
+    """
+    Calculate log-bucketed response time histograms per user:
+      - users: sorted user names, row i of counts
+      - edges: the shared bucket edges in seconds
+      - counts: users x buckets reply counts
+    """
+    responders, _, gaps = _response_pairs(df, max_gap_hours)
+    return _latency_histograms_from_pairs(sorted(df['user'].unique()), responders, gaps)
+
+def merge_response_time_histograms(*histograms):
+    """
+    Merge response time histograms (e.g. from chunks of the same chat) by adding counts per user
+    """
+    for hist in histograms:
+        if not np.array_equal(hist['edges'], LATENCY_BUCKET_EDGES):
+            raise ValueError("Cannot merge response time histograms with different bucket edges")
+
+    users = sorted(set().union(*(hist['users'] for hist in histograms)))
+    counts = np.zeros((len(users), len(LATENCY_BUCKET_EDGES) - 1), dtype=np.int64)
+    for hist in histograms:
+        rows = np.searchsorted(users, hist['users']) if hist['users'] else []
+        counts[rows] += hist['counts']
 
-    return {user: format_td(td) for user, td in mean_resp.items()}
+    return {'users': users, 'edges': LATENCY_BUCKET_EDGES, 'counts': counts}
+
+def histogram_percentile(counts: np.ndarray, edges: np.ndarray, q: float) -> float:
+    """
+    Estimate the q-th percentile (0-100) from histogram counts.
+    Interpolates geometrically inside log buckets and linearly inside the first bucket
+    """
+    total = counts.sum()
+    if total == 0:
+        return float('nan')
+
+    # Find the bucket holding the target rank and the position inside it
+    target = q / 100 * total
+    cumulative = np.cumsum(counts)
+    b = min(int(np.searchsorted(cumulative, target, side='left')), len(counts) - 1)
+    before = cumulative[b - 1] if b > 0 else 0
+    fraction = (target - before) / counts[b] if counts[b] else 0.0
+
+    low, high = edges[b], edges[b + 1]
+    if low <= 0:
+        return float(low + (high - low) * fraction)
+    return float(low * (high / low) ** fraction)
+
+@timed()
+def calculate_response_time_percentiles(histograms: dict, percentiles=(50, 90, 99)):
+    """
+    Calculate response time percentiles per user from the histograms, formatted for display
+    """
+    names = {50: 'median'}
+    result = {}
+    for user, row in zip(histograms['users'], histograms['counts']):
+        if row.sum() == 0:
+            continue
+        result[user] = {
+            names.get(q, f"p{q}"): format_duration(histogram_percentile(row, histograms['edges'], q))
+            for q in percentiles
+        }
+    return result
+
+@timed()
+def calculate_response_analysis(df: pd.DataFrame, max_gap_hours=6):
+    """
+    Calculate every response-time metric from a single pairing pass:
+    average response time, reply graph and response time histograms
+    """
+    responders, previous, gaps = _response_pairs(df, max_gap_hours)
+    users = sorted(df['user'].unique())
+
+    return (
+        _avg_response_from_pairs(responders, gaps),
+        _reply_graph_from_pairs(users, responders, previous, gaps),
+        _latency_histograms_from_pairs(users, responders, gaps),
+    )
+
+def _reply_graph_row(reply_graph: dict, user):
+    """
+    Return the [start, end) slice of the user's partners in the reply graph
+    """
+    users = reply_graph['users']
+    i = bisect_left(users, user)
+    if i == len(users) or users[i] != user:
+        return i, 0, 0
+    return i, reply_graph['indptr'][i], reply_graph['indptr'][i + 1]
 
+def get_top_reply_partners(reply_graph: dict, user, n=5):
+    """
+    Return the top n users this user replies to, as (partner, replies, mean seconds) tuples
+    """
+    _, start, end = _reply_graph_row(reply_graph, user)
+    counts = reply_graph['counts'][start:end]
+    if len(counts) == 0:
+        return []
+
+    # argpartition keeps this O(partners) even for very large groups
+    n = min(n, len(counts))
+    top = np.argpartition(-counts, n - 1)[:n]
+    top = top[np.argsort(-counts[top], kind='stable')]
+
+    partners = reply_graph['partners'][start:end]
+    sums = reply_graph['latency_sums'][start:end]
+    return [
+        (reply_graph['users'][partners[j]], int(counts[j]), float(sums[j] / counts[j]))
+        for j in top
+    ]
+
+def get_pair_response_times(reply_graph: dict, responder, previous) -> np.ndarray:
+    """
+    Return all response times (seconds) of responder replying to previous
+    """
+    _, start, end = _reply_graph_row(reply_graph, responder)
+    users = reply_graph['users']
+    j_prev = bisect_left(users, previous)
+    if j_prev == len(users) or users[j_prev] != previous:
+        return np.zeros(0, dtype=np.float32)
+    partners = reply_graph['partners'][start:end]
+
+    # Partners are sorted inside each row, so a binary search finds the pair
+    pos = int(np.searchsorted(partners, j_prev))
+    if pos == len(partners) or partners[pos] != j_prev:
+        return np.zeros(0, dtype=np.float32)
+
+    offsets = reply_graph['latency_offsets']
+    return reply_graph['latencies'][offsets[start + pos]:offsets[start + pos + 1]]
+
+@timed()
 def calculate_emoji_analysis(df: pd.DataFrame):
     """
     Calculate emoji usage statistics per user using emoji package
@@ -177,6 +688,7 @@ def calculate_emoji_analysis(df: pd.DataFrame):
     
     return emoji_per_user, most_common_emojis
 
+@timed()
 def calculate_message_bursts(df: pd.DataFrame, burst_threshold_minutes=5, min_burst_size=3):
     """
     Calculate message burst patterns - when users send multiple messages quickly within a short time frame.
@@ -202,6 +714,7 @@ def calculate_message_bursts(df: pd.DataFrame, burst_threshold_minutes=5, min_bu
     # Return the result sorted from high to low
     return bursts_per_user.sort_values(ascending=False)
 
+@timed()
 def calculate_conversation_starters(df: pd.DataFrame, inactivity_threshold_hours=2):
     """
     Calculate who starts conversations after periods of inactivity
@@ -219,9 +732,11 @@ def calculate_conversation_starters(df: pd.DataFrame, inactivity_threshold_hours
     return starter_counts.sort_values(ascending=False)
 
 
+@timed()
 def calculate_all_user_analysis(messages_per_user_dict, emoji_per_user_dict, laughs_per_user_dict, 
                                 message_bursts_dict, conversation_starters_dict, avg_response_time_dict,
-                                df_for_processing):
+                                df_for_processing, reply_graph=None, response_time_percentiles=None,
+                                user_phrases=None, activity_heatmap=None, user_vocabularies=None):
     """
     Pre-calculate all user-specific analysis to avoid repeated computation
     """
@@ -259,42 +774,44 @@ def calculate_all_user_analysis(messages_per_user_dict, emoji_per_user_dict, lau
             'laugh_count': laughs_per_user_dict.get(user, 0),
             'burst_count': message_bursts_dict.get(user, 0),
             'starter_count': conversation_starters_dict.get(user, 0),
-            'response_time': avg_response_time_dict.get(user, 'N/A')
+            'response_time': avg_response_time_dict.get(user, 'N/A'),
+            'top_reply_partners': get_top_reply_partners(reply_graph, user) if reply_graph else [],
+            'response_time_percentiles': (response_time_percentiles or {}).get(user, {}),
+            'top_phrases': (user_phrases or {}).get(user, []),
+            'word_vocabulary': (user_vocabularies or {}).get(user, []),
+            # A view into the shared heatmap array, not a copy
+            'weekday_hour_activity': (
+                activity_heatmap['counts'][bisect_left(activity_heatmap['users'], user)]
+                if activity_heatmap else None
+            )
         }
     
     return all_users_data
 
-def analyze_chat(df: pd.DataFrame):
+# Analysis stages, in the order they finish. 'basic' is cheap and renders first,
+# the expensive sections fill in as their stage is done
+ANALYSIS_STAGES = ('basic', 'responses', 'emojis', 'words', 'users')
+
+def iter_analysis_stages(df: pd.DataFrame, search_index=True):
     """
-    Analyze WhatsApp chat DataFrame and return statistics, using the functions above
+    Analyze the chat stage by stage, yielding (stage, results of that stage).
+    Together the stage results are the analyze_chat result.
+    search_index=False skips the search index (the largest allocation), for runs that never search
     """
     if df.empty:
-        return {}
+        return
+    count('analyze.messages', len(df))
 
-    # Calculate basic statistics
-    df = preprocess_df(df)
+    # Counts, time patterns and streaks, without the slow emoji extraction
+    df = preprocess_df(df, emojis=False)
     total_messages, total_users, date_range = calculate_basic_stats(df)
     messages_per_user, avg_length_per_user = calculate_user_metrics(df)
     messages_by_hour, messages_by_day = calculate_time_patterns(df)
+    activity_heatmap = calculate_activity_heatmap(df)
     laughs_per_user = calculate_laugh_analysis(df)
-    most_common_words = calculate_word_frequency(df)
-    avg_response_time_per_user = get_avg_response(df)
-    emoji_per_user, most_common_emojis = calculate_emoji_analysis(df)
     message_bursts = calculate_message_bursts(df)
     conversation_starters = calculate_conversation_starters(df)
-    
-    # Pre-calculate all user analysis data 
-    all_users_data = calculate_all_user_analysis(
-        messages_per_user.to_dict(),
-        emoji_per_user.to_dict(),
-        laughs_per_user.to_dict(),
-        message_bursts.to_dict(),
-        conversation_starters.to_dict(),
-        avg_response_time_per_user,
-        df
-    )
-
-    return {
+    yield 'basic', {
         'basic_stats': {
             'total_messages': total_messages,
             'total_users': total_users,
@@ -305,12 +822,90 @@ def analyze_chat(df: pd.DataFrame):
         'avg_message_length': avg_length_per_user.to_dict(),
         'messages_by_hour': messages_by_hour.to_dict(),
         'messages_by_day': messages_by_day.to_dict(),
-        'most_common_words': most_common_words,
-        'avg_response_time_per_user': avg_response_time_per_user,
+        'activity_timeline': calculate_activity_timeline(df),
+        'activity_heatmap': activity_heatmap,
         'laughs_per_user': laughs_per_user.to_dict(),
-        'emoji_per_user': emoji_per_user.to_dict(),
-        'most_common_emojis': most_common_emojis,
         'message_bursts': message_bursts.to_dict(),
         'conversation_starters': conversation_starters.to_dict(),
-        'all_users_data': all_users_data
     }
+
+    avg_response_time_per_user, reply_graph, response_time_histograms = calculate_response_analysis(df)
+    response_time_percentiles = calculate_response_time_percentiles(response_time_histograms)
+    yield 'responses', {
+        'avg_response_time_per_user': avg_response_time_per_user,
+        'reply_graph': reply_graph,
+        'response_time_histograms': response_time_histograms,
+        'response_time_percentiles': response_time_percentiles,
+    }
+
+    extract_emojis(df)
+    emoji_per_user, most_common_emojis = calculate_emoji_analysis(df)
+    yield 'emojis', {
+        'emoji_per_user': emoji_per_user.to_dict(),
+        'most_common_emojis': most_common_emojis,
+    }
+
+    word_vocabulary, most_common_ngrams, user_phrases, user_vocabularies = calculate_text_frequencies(
+        df, top_n=WORD_VOCABULARY_SIZE, vocabulary_size=WORD_VOCABULARY_SIZE
+    )
+    words = {
+        'most_common_words': word_vocabulary[:10],
+        'most_common_bigrams': most_common_ngrams[2][:10],
+        'most_common_trigrams': most_common_ngrams[3][:10],
+        'word_vocabulary': word_vocabulary,
+    }
+    if search_index:
+        words['search_index'] = build_search_index(df)
+    yield 'words', words
+
+    # Pre-calculate all user analysis data 
+    yield 'users', {
+        'all_users_data': calculate_all_user_analysis(
+            messages_per_user.to_dict(),
+            emoji_per_user.to_dict(),
+            laughs_per_user.to_dict(),
+            message_bursts.to_dict(),
+            conversation_starters.to_dict(),
+            avg_response_time_per_user,
+            df,
+            reply_graph,
+            response_time_percentiles,
+            user_phrases,
+            activity_heatmap,
+            user_vocabularies
+        )
+    }
+
+def analyze_chat(df: pd.DataFrame, search_index=True):
+    """
+    Analyze WhatsApp chat DataFrame and return statistics, using the functions above.
+    search_index=False leaves out the search index
+    """
+    results = {}
+    with pipeline_run('analyze_chat'):
+        for _, stage_results in iter_analysis_stages(df, search_index):
+            results.update(stage_results)
+    return results
+
+def _to_builtin(value):
+    """
+    Convert numpy / pandas values inside nested results to plain Python (JSON-friendly) values
+    """
+    if isinstance(value, dict):
+        return {str(k) if not isinstance(k, str) else k: _to_builtin(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [_to_builtin(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return str(value)
+    return value
+
+def summarize_results(results: dict, metrics=SUMMARY_METRICS) -> dict:
+    """
+    Return the selected plain metrics of the analyze_chat results as JSON-friendly values
+    """
+    unknown = set(metrics) - set(SUMMARY_METRICS)
+    if unknown:
+        raise ValueError(f"Unknown metrics: {', '.join(sorted(unknown))}")
+    return {metric: _to_builtin(results[metric]) for metric in metrics if metric in results}
@@ -0,0 +1,152 @@
+"""
+Headless batch analysis: analyze many chat files in parallel and write their metrics
+as JSON or Parquet. Imports only the parser and analyzer, no UI or plotting libraries
+"""
+
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from analyzer import analyze_chat, summarize_results, SUMMARY_METRICS
+from instrumentation import pipeline_run
+from parser import parse_whatsapp_file
+
+OUTPUT_FORMATS = ('json', 'parquet')
+
+# Columns of the Parquet table: one row per value of a metric, in metric order.
+# A chat that failed gets a single 'error' row with the message as its text
+PARQUET_COLUMNS = ('chat', 'metric', 'key', 'field', 'value', 'text')
+
+
+def expand_chat_paths(patterns):
+    """
+    Expand file names and glob patterns to a list of unique chat files, in the given order
+    """
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        paths.extend(m for m in matches if m not in paths)
+    return paths
+
+
+def output_name(path, used):
+    """
+    Unique output name for a chat file, based on its file name
+    """
+    stem = os.path.splitext(os.path.basename(path))[0] or 'chat'
+    name, i = stem, 1
+    while name in used:
+        i += 1
+        name = f"{stem}_{i}"
+    used.add(name)
+    return name
+
+
+def analyze_chat_file(path):
+    """
+    Parse and analyze one chat file, without the interactive-only search index (never built).
+    Raises OSError for a file that cannot be read, reported per chat by the callers.
+    Runs inside the worker processes
+    """
+    with pipeline_run('analyze_chat_file', chat=os.path.basename(path)):
+        return analyze_chat(parse_whatsapp_file(path), search_index=False)
+
+
+def summarize_chat_file(path, metrics=SUMMARY_METRICS):
+    """
+    Parse and analyze one chat file and return only the selected plain metrics
+    ({} for a chat without messages). Runs inside the worker processes
+    """
+    results = analyze_chat_file(path)
+    return summarize_results(results, metrics) if results else {}
+
+
+def metrics_to_rows(chat, summary):
+    """
+    Flatten the summary of one chat to table rows (see PARQUET_COLUMNS).
+    Dicts give a row per key (nested dicts a row per field), (item, count) lists a row per item;
+    numbers go to the value column and formatted values (e.g. durations) to text
+    """
+    rows = []
+
+    def add(metric, key, field, value):
+        is_number = isinstance(value, (int, float)) and not isinstance(value, bool)
+        rows.append((chat, metric, key, field, float(value) if is_number else None,
+                     None if is_number else str(value)))
+
+    for metric, data in summary.items():
+        items = data.items() if isinstance(data, dict) else data
+        for key, value in items:
+            if isinstance(value, dict):
+                for field, field_value in value.items():
+                    add(metric, str(key), field, field_value)
+            else:
+                add(metric, str(key), None, value)
+    return rows
+
+
+def write_parquet(rows, destination):
+    """
+    Write metric rows to a Parquet file path or binary stream
+    """
+    # Imported here, only Parquet output needs pandas' Parquet engine
+    import pandas as pd
+
+    pd.DataFrame(rows, columns=list(PARQUET_COLUMNS)).to_parquet(destination, index=False)
+
+
+def analyze_chats(chat_paths, output_dir=None, output_format='json', metrics=SUMMARY_METRICS, workers=None):
+    """
+    Analyze many chat files on a process pool and write their metrics.
+    Without output_dir, JSON goes to stdout as one line per chat ({"chat": path, "metrics": ...})
+    and Parquet as one table for all chats; with it, each chat gets its own <name>.json/.parquet.
+    A chat that cannot be read or analyzed is reported and the others still written: as an
+    error line ({"chat": path, "error": ...}) or an 'error' row on stdout, on stderr with an
+    output directory. Progress messages go to stderr. Returns {chat path: summary}
+    """
+    paths = expand_chat_paths(chat_paths)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    summaries, rows, used = {}, [], set()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [(path, pool.submit(summarize_chat_file, path, metrics)) for path in paths]
+        for path, future in futures:
+            try:
+                summary = future.result()
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                print(f"❌ Could not analyze {path}: {error}", file=sys.stderr)
+                if output_dir:
+                    continue
+                if output_format == 'json':
+                    print(json.dumps({'chat': path, 'error': error}, ensure_ascii=False), flush=True)
+                else:
+                    rows.append((path, 'error', None, None, None, error))
+                continue
+            if not summary:
+                print(f"❌ No messages found in {path}, skipped", file=sys.stderr)
+                continue
+            summaries[path] = summary
+
+            if output_dir:
+                name = output_name(path, used)
+                target = os.path.join(output_dir, f"{name}.{output_format}")
+                if output_format == 'json':
+                    with open(target, 'w', encoding='utf-8') as f:
+                        json.dump({'chat': path, 'metrics': summary}, f, ensure_ascii=False, indent=2)
+                else:
+                    write_parquet(metrics_to_rows(path, summary), target)
+                print(f"📄 Metrics written: {target}", file=sys.stderr)
+            elif output_format == 'json':
+                # Streamed as each chat finishes, in input order
+                print(json.dumps({'chat': path, 'metrics': summary}, ensure_ascii=False), flush=True)
+            else:
+                rows.extend(metrics_to_rows(path, summary))
+
+    if not output_dir and output_format == 'parquet':
+        write_parquet(rows, sys.stdout.buffer)
+        sys.stdout.buffer.flush()
+    return summaries
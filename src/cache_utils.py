@@ -0,0 +1,221 @@
+"""
+Caching utilities: content digests and bounded LRU caches, shared by the UI, CLI and service
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# Optional faster digest for large uploads
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# Upper bound on the memory of cached analysis results, shared by all sessions
+ANALYSIS_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Setting this env var persists analysis results on disk, so a restart keeps them
+ANALYSIS_CACHE_DIR_ENV = 'WHATSAPP_ANALYZER_CACHE_DIR'
+
+# Upper bound on the analysis results kept on disk, least recently used files are deleted first
+ANALYSIS_CACHE_DISK_MAX_BYTES = 4 * 1024 * 1024 * 1024
+
+# Part of the file names on disk: bump it when the shape of the analyze_chat results changes,
+# so results written by older versions are never loaded (and age out of the disk budget)
+ANALYSIS_RESULTS_VERSION = 1
+
+# Temp files in the cache dir older than this were left by a crashed write, and are deleted
+ANALYSIS_CACHE_STALE_TMP_SECONDS = 60 * 60
+
+
+def content_digest(data) -> str:
+    """
+    Return a digest of raw chat bytes (bytes or memoryview), used as the analysis cache key.
+    Uses xxh3-128 when xxhash is installed, else blake2b
+    """
+    if xxhash is not None:
+        return "xxh3-" + xxhash.xxh3_128_hexdigest(data)
+    return "b2-" + hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def params_digest(*args, **kwargs) -> str:
+    """
+    Return a short digest of the parameters a cached item is built from
+    """
+    payload = pickle.dumps((args, sorted(kwargs.items())), protocol=pickle.HIGHEST_PROTOCOL)
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+class BoundedCache:
+    """
+    Thread-safe LRU cache with a total size budget in bytes.
+    Values are stored together with their size, the least recently used ones are evicted first
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Return the cached value, or None (counted as a miss)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        """
+        Insert a value and evict the least recently used ones until under budget
+        """
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+
+    def stats(self) -> dict:
+        """
+        Return hit/miss counters and the current size of the cache
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self._size,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+
+class AnalysisCache(BoundedCache):
+    """
+    Process-wide LRU of analyze_chat results keyed by content digest, with a memory budget.
+    Sizes are measured as the pickled size of the results. With cache_dir, results are
+    also written to disk, up to disk_max_bytes, and loaded back on a memory miss
+    (e.g. after a server restart). Unreadable files are deleted and count as a miss
+    """
+
+    def __init__(self, max_bytes=ANALYSIS_CACHE_MAX_BYTES, cache_dir=None, disk_max_bytes=ANALYSIS_CACHE_DISK_MAX_BYTES):
+        super().__init__(max_bytes)
+        self.cache_dir = cache_dir
+        self.disk_max_bytes = disk_max_bytes
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.v{ANALYSIS_RESULTS_VERSION}.pkl")
+
+    def get(self, key):
+        """
+        Return the cached results from memory, then from disk, or None
+        """
+        if key is None:
+            return None
+        results = super().get(key)
+        if results is not None or not self.cache_dir:
+            return results
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            results = pickle.loads(data)
+        except Exception:
+            # Truncated or corrupt, e.g. the disk filled up while it was written
+            self._remove(path)
+            return None
+        # Recently read files are the last to be deleted when the disk budget is full
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        super().put(key, results, len(data))
+        return results
+
+    def put(self, key, results, size=None):
+        """
+        Cache results in memory (and on disk when persistence is enabled).
+        Results already on disk, e.g. written by another process, are not pickled or written again
+        """
+        if self.cache_dir:
+            path = self._path(key)
+            try:
+                os.utime(path)
+                disk_size = os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+            else:
+                super().put(key, results, size or disk_size)
+                return
+
+        data = pickle.dumps(results, protocol=pickle.HIGHEST_PROTOCOL)
+        super().put(key, results, size or len(data))
+        if not self.cache_dir:
+            return
+
+        # Write to a temp file and rename, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(key))
+        self._trim_disk()
+
+    def _trim_disk(self):
+        """
+        Delete stale temp files, then the least recently used result files until the disk budget is met
+        """
+        files = []
+        stale_before = time.time() - ANALYSIS_CACHE_STALE_TMP_SECONDS
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(('.pkl', '.tmp')):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if entry.name.endswith('.pkl'):
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+            elif stat.st_mtime < stale_before:
+                self._remove(entry.path)
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,41 @@
+"""
+Bounded cache of built Plotly figures, stored as serialized JSON
+"""
+
+import json
+
+from cache_utils import BoundedCache, params_digest
+from instrumentation import count
+
+# Upper bound on the total size of cached figure JSON
+FIGURE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+class FigureCache(BoundedCache):
+    """
+    LRU cache of figures keyed on (function, analysis fingerprint, parameters).
+    Figures are kept as JSON, which is what the browser receives anyway; a hit rebuilds
+    the Figure without Plotly's validation, a small fraction of building it from scratch
+    """
+
+    def __init__(self, max_bytes=FIGURE_CACHE_MAX_BYTES):
+        super().__init__(max_bytes)
+
+    def get_or_build(self, func, fingerprint, *args, **kwargs):
+        """
+        Return func(*args, **kwargs), from the cache when the same figure was built before
+        """
+        key = (func.__name__, fingerprint, params_digest(*args, **kwargs))
+
+        fig_json = self.get(key)
+        if fig_json is not None:
+            count('figures.cached')
+            # Plotly is already loaded by whoever built the figure, this import is free
+            import plotly.graph_objects as go
+            return go.Figure(json.loads(fig_json), _validate=False)
+
+        count('figures.built')
+        fig = func(*args, **kwargs)
+        fig_json = fig.to_json()
+        self.put(key, fig_json, len(fig_json))
+        return fig
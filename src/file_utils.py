@@ -4,37 +4,57 @@ File handling utilities
 
 import streamlit as st
 import os
-from parser import parse_whatsapp
+import tempfile
+from cache_utils import content_digest
 
+SAMPLE_FILE = "conversation_sample.txt"
 
-def load_chat_data(uploaded_file, use_sample):
-    """Load chat data from uploaded file or sample data"""
+# Uploads are copied this many bytes at a time
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+def spool_upload(uploaded_file):
+    """
+    Copy an upload to a private temp file in chunks and return its path, for the analysis
+    workers to stream from. The caller (or the worker) deletes the file
+    """
+    fd, path = tempfile.mkstemp(prefix="chat-", suffix=".txt")
     try:
-        # Using sample data
-        if use_sample:
-            if os.path.exists("conversation_sample.txt"):
-                df = parse_whatsapp("conversation_sample.txt")
-                return df, "✅ Sample data loaded!", None
-            else:
-                return None, None, "❌ Sample file not found!"
-        # using uploaded file data
-        else:
-            # Save uploaded file temporarily
-            with open("temp_chat.txt", "wb") as f:
-                f.write(uploaded_file.getbuffer())
-            df = parse_whatsapp("temp_chat.txt")
-            return df, f"✅ Uploaded {uploaded_file.name}", None
-            
-    except Exception as e:
-        return None, None, f"❌ Error loading file: {str(e)}"
-
-
-def validate_chat_data(df):
-    """Validate that the chat data is not empty"""
-    if df is None:
-        return False, "❌ Failed to load chat data!"
-    
-    if df.empty:
-        return False, "❌ No messages found in the chat file!"
-    
-    return True, None
+        with os.fdopen(fd, "wb") as f:
+            uploaded_file.seek(0)
+            while chunk := uploaded_file.read(UPLOAD_CHUNK_BYTES):
+                f.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def read_chat_bytes(uploaded_file, use_sample):
+    """Raw chat bytes of the uploaded file or sample data, None if the sample is missing"""
+    if use_sample:
+        if not os.path.exists(SAMPLE_FILE):
+            return None
+        with open(SAMPLE_FILE, "rb") as f:
+            return f.read()
+    return bytes(uploaded_file.getbuffer())
+
+
+def get_content_hash(uploaded_file, use_sample):
+    """Digest of the raw chat bytes, identifies the chat before any parsing"""
+    if use_sample:
+        if not os.path.exists(SAMPLE_FILE):
+            return None
+        with open(SAMPLE_FILE, "rb") as f:
+            return content_digest(f.read())
+    return content_digest(uploaded_file.getbuffer())
+
+
+def get_upload_digest(uploaded_file, use_sample):
+    """Content digest of the current upload, computed once per upload and kept in the session"""
+    upload_id = SAMPLE_FILE if use_sample else uploaded_file.file_id
+    if st.session_state.get("upload_id") != upload_id:
+        st.session_state["upload_digest"] = get_content_hash(uploaded_file, use_sample)
+        st.session_state["upload_id"] = upload_id
+    return st.session_state["upload_digest"]
+
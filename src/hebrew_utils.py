@@ -2,21 +2,36 @@
 Hebrew fixer for data, dictionaries, lables using Bidi Algorithm
 """
 
-import arabic_reshaper
-from bidi.algorithm import get_display
+from functools import lru_cache
 import re
 
+# Precompiled Hebrew block detector, used to skip non-Hebrew text without reshaping
+_HEBREW_CHARS = re.compile(r'[\u0590-\u05FF]')
+
+# Upper bound on memoized labels, user names and top words repeat on every figure build
+FIX_CACHE_SIZE = 4096
+
+@lru_cache(maxsize=FIX_CACHE_SIZE)
+def _reshape_and_reorder(text: str) -> str:
+    """Reshape and reorder a Hebrew string, memoized"""
+    # Imported on the first Hebrew label, most labels never get here
+    import arabic_reshaper
+    from bidi.algorithm import get_display
+
+    return get_display(arabic_reshaper.reshape(text))
+
 def fix_hebrew(text: str) -> str:
-    """Fix Hebrew text for display in Plotly or Matplotlib.
-    Reorders text using arabic_reshaper and python-bidi."""
+    """Fix Hebrew text for display in Matplotlib (e.g. the word cloud); browsers, and so
+    Plotly, reorder it themselves. Reorders text using arabic_reshaper and python-bidi."""
     # Check if the text contains Hebrew characters, if so, reshape and reorder it
-    if isinstance(text, str) and re.search(r'[\u0590-\u05FF]', text):
-        reshaped = arabic_reshaper.reshape(text)
-        return get_display(reshaped)
+    if isinstance(text, str) and _HEBREW_CHARS.search(text):
+        return _reshape_and_reorder(text)
     return text
 
 def fix_labels(labels: list[str]) -> list[str]:
+    """Fix a batch of labels, returning non-Hebrew batches untouched after a single regex scan"""
+    labels = list(labels)
+    # One search over the joined labels rules out the common all-English case
+    if not _HEBREW_CHARS.search('\n'.join(label for label in labels if isinstance(label, str))):
+        return labels
     return [fix_hebrew(label) for label in labels]
-
-def fix_dict_keys(d: dict) -> dict:
-    return {fix_hebrew(k): v for k, v in d.items()}
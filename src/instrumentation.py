@@ -0,0 +1,357 @@
+"""
+Lightweight timing and counters for the analysis pipeline.
+
+A run (parsing and analyzing one chat, rendering one page) collects the time spent in
+each stage and counters such as messages parsed. Stages are marked with the timed
+decorator or the stage context manager, counters with count; outside a run they cost
+a clock read and nothing is kept.
+
+    with pipeline_run('upload', chat=digest) as run:
+        df = parse_whatsapp_stream(...)    # @timed('parse'), count('parse.messages', ...)
+        analyze_chat(df)
+    run.as_dict()    # {'run': 'upload', 'seconds': ..., 'stages': {...}, 'counters': {...}}
+
+Each finished run is logged as one JSON line on the 'whatsapp_analyzer.timing' logger,
+each stage too at DEBUG level. Set WHATSAPP_ANALYZER_LOG_LEVEL (e.g. INFO) to print them.
+Set WHATSAPP_ANALYZER_PROFILE_DIR to also write a cProfile dump (.pstats) of every run.
+
+Set WHATSAPP_ANALYZER_TRACE_MEMORY to also measure the peak and retained memory of every
+stage and run: 'rss' samples the resident set size (cheap, Linux only), any other value
+adds tracemalloc (Python allocations, exact but several times slower). Memory is
+process-wide, so measure one run at a time
+"""
+
+import gc
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+LOG_LEVEL_ENV = 'WHATSAPP_ANALYZER_LOG_LEVEL'
+PROFILE_DIR_ENV = 'WHATSAPP_ANALYZER_PROFILE_DIR'
+TRACE_MEMORY_ENV = 'WHATSAPP_ANALYZER_TRACE_MEMORY'
+
+# How often the resident set size is sampled while memory is traced
+RSS_SAMPLE_SECONDS = 0.005
+
+logger = logging.getLogger('whatsapp_analyzer.timing')
+
+# The run of the current thread (or task), None outside a run
+_current_run = ContextVar('pipeline_run', default=None)
+
+
+def rss_bytes():
+    """
+    Return the resident set size of this process, None where /proc is not available
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class _RssSampler:
+    """
+    Background thread keeping the highest resident set size seen since the last reset
+    """
+
+    def __init__(self):
+        self.peak = rss_bytes()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._sample_loop, name="rss-sampler", daemon=True)
+        self._thread.start()
+
+    def _sample_loop(self):
+        while not self._stopped.wait(RSS_SAMPLE_SECONDS):
+            self.traced_memory()
+
+    def traced_memory(self):
+        """Return (current, peak) like tracemalloc.get_traced_memory"""
+        current = rss_bytes()
+        self.peak = max(self.peak, current)
+        return current, self.peak
+
+    def reset_peak(self):
+        self.peak = rss_bytes()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+
+class _TracemallocSource:
+    """
+    Python allocations traced by tracemalloc, started for the run unless already tracing
+    """
+
+    def __init__(self):
+        import tracemalloc
+
+        self._tracemalloc = tracemalloc
+        self._started = not tracemalloc.is_tracing()
+        if self._started:
+            tracemalloc.start()
+
+    def traced_memory(self):
+        return self._tracemalloc.get_traced_memory()
+
+    def reset_peak(self):
+        self._tracemalloc.reset_peak()
+
+    def stop(self):
+        if self._started:
+            self._tracemalloc.stop()
+
+
+class MemoryTracker:
+    """
+    Peak and retained memory of nested stages. A source has one peak for the whole process,
+    so entering a stage folds the peak so far into the stages around it before resetting it.
+    With tracemalloc, garbage (e.g. pandas reference cycles) is collected when a stage ends,
+    so its retained memory is what its results keep rather than what gc has not freed yet
+    """
+
+    def __init__(self, mode):
+        self.sources = {}
+        if mode != 'rss':
+            self.sources['traced'] = _TracemallocSource()
+        if rss_bytes() is not None:
+            self.sources['rss'] = _RssSampler()
+        # Open stages, innermost last: {source: [memory at entry, peak so far]}
+        self._frames = []
+
+    def enter(self):
+        frame = {}
+        for name, source in self.sources.items():
+            current, peak = source.traced_memory()
+            for outer in self._frames:
+                outer[name][1] = max(outer[name][1], peak)
+            source.reset_peak()
+            frame[name] = [current, current]
+        self._frames.append(frame)
+
+    def exit(self) -> dict:
+        """
+        Close the innermost stage, returning {source: (peak bytes, retained bytes)} above
+        the memory at its entry
+        """
+        frame = self._frames.pop()
+        peaks = {}
+        for name, source in self.sources.items():
+            start, stage_peak = frame[name]
+            peaks[name] = max(stage_peak, source.traced_memory()[1])
+            for outer in self._frames:
+                outer[name][1] = max(outer[name][1], peaks[name])
+        if 'traced' in self.sources:
+            gc.collect()
+
+        usage = {}
+        for name, source in self.sources.items():
+            start = frame[name][0]
+            usage[name] = (peaks[name] - start, source.traced_memory()[0] - start)
+        return usage
+
+    def stop(self):
+        for source in self.sources.values():
+            source.stop()
+
+
+class PipelineRun:
+    """
+    Stage timings and counters of one run, and their memory when it is traced
+    """
+
+    def __init__(self, name, **info):
+        self.name = name
+        self.info = info
+        self.started = time.perf_counter()
+        self.seconds = None
+        self.stages = {}
+        self.counters = {}
+        self.profile_path = None
+        self.memory = None
+        self.stage_memory = {}
+        self.run_memory = None
+
+    def add_time(self, stage, seconds):
+        total, calls = self.stages.get(stage, (0.0, 0))
+        self.stages[stage] = (total + seconds, calls + 1)
+
+    def add_count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_memory(self, stage, usage):
+        """
+        Record {source: (peak, retained)} of one call: the highest peak of all calls
+        and the memory all calls kept
+        """
+        recorded = self.stage_memory.setdefault(stage, {})
+        for source, (peak, retained) in usage.items():
+            old_peak, old_retained = recorded.get(source, (0, 0))
+            recorded[source] = (max(old_peak, peak), old_retained + retained)
+
+    def as_dict(self) -> dict:
+        """
+        The run as plain values, slowest stages first. Nested stages are also part of
+        the time (and memory) of the stage around them, so stage times may add up to more
+        than the run. With traced memory, stages and the run get peak and retained bytes:
+        'peak_bytes'/'retained_bytes' from tracemalloc, 'rss_peak_bytes'/'rss_retained_bytes'
+        from RSS samples
+        """
+        seconds = self.seconds if self.seconds is not None else time.perf_counter() - self.started
+        stages = sorted(self.stages.items(), key=lambda item: item[1][0], reverse=True)
+        result = {
+            'run': self.name,
+            **self.info,
+            'seconds': round(seconds, 4),
+            'stages': {
+                stage: {'seconds': round(total, 4), 'calls': calls, **_memory_fields(self.stage_memory.get(stage))}
+                for stage, (total, calls) in stages
+            },
+            'counters': dict(self.counters),
+            'profile': self.profile_path,
+        }
+        if self.run_memory is not None:
+            result['memory'] = _memory_fields(self.run_memory)
+        return result
+
+
+def _memory_fields(usage) -> dict:
+    fields = {}
+    for source, prefix in (('traced', ''), ('rss', 'rss_')):
+        if usage and source in usage:
+            fields[f'{prefix}peak_bytes'], fields[f'{prefix}retained_bytes'] = usage[source]
+    return fields
+
+
+def current_run():
+    """
+    Return the run in progress, None outside a run
+    """
+    return _current_run.get()
+
+
+def configure_logging():
+    """
+    Print timing logs to stderr at the level set in the log level env var, if any.
+    Safe to call more than once
+    """
+    level = os.environ.get(LOG_LEVEL_ENV)
+    parent = logging.getLogger('whatsapp_analyzer')
+    if not level or parent.handlers:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s %(name)s %(message)s'))
+    parent.addHandler(handler)
+    parent.setLevel(level.upper())
+
+
+def _start_profile():
+    if not os.environ.get(PROFILE_DIR_ENV):
+        return None
+    import cProfile
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler is active in this thread
+        return None
+    return profiler
+
+
+def _save_profile(run, profiler):
+    profiler.disable()
+    profile_dir = os.environ[PROFILE_DIR_ENV]
+    os.makedirs(profile_dir, exist_ok=True)
+    path = os.path.join(profile_dir, f"{run.name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.pstats")
+    profiler.dump_stats(path)
+    run.profile_path = path
+
+
+@contextmanager
+def pipeline_run(name, trace_memory=None, **info):
+    """
+    Collect the stages and counters of the block into a new run and log it when done.
+    trace_memory ('rss', 'tracemalloc' or None for the env var) also measures memory.
+    Inside another run, the block is part of that run instead
+    """
+    outer = _current_run.get()
+    if outer is not None:
+        yield outer
+        return
+
+    run = PipelineRun(name, **info)
+    trace_memory = trace_memory or os.environ.get(TRACE_MEMORY_ENV)
+    if trace_memory:
+        run.memory = MemoryTracker(trace_memory)
+        run.memory.enter()
+    token = _current_run.set(run)
+    profiler = _start_profile()
+    try:
+        yield run
+    finally:
+        run.seconds = time.perf_counter() - run.started
+        _current_run.reset(token)
+        if profiler is not None:
+            _save_profile(run, profiler)
+        if run.memory is not None:
+            run.run_memory = run.memory.exit()
+            run.memory.stop()
+            run.memory = None
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({'event': 'run', **run.as_dict()}, default=str))
+
+
+@contextmanager
+def stage(name):
+    """
+    Time the block as a stage of the current run
+    """
+    run = _current_run.get()
+    memory = run.memory if run is not None else None
+    if memory is not None:
+        memory.enter()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        usage = None
+        if memory is not None:
+            usage = memory.exit()
+            run.add_memory(name, usage)
+        if run is not None:
+            run.add_time(name, seconds)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps({'event': 'stage', 'run': run.name if run else None, 'stage': name,
+                                     'seconds': round(seconds, 4), **_memory_fields(usage)}))
+
+
+def timed(name=None):
+    """
+    Decorator timing every call of a function as a stage, named after the function by default
+    """
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, value=1):
+    """
+    Add value to a counter of the current run
+    """
+    run = _current_run.get()
+    if run is not None:
+        run.add_count(name, value)
@@ -1,44 +1,133 @@
 """
 Main entry point for WhatsApp Chat Analyzer
-Launches Streamlit web interface
+Launches Streamlit web interface, or runs headless commands:
+    python main.py report chat.txt other_chats/*.txt -o reports
+    python main.py analyze "chats/*.txt" --format parquet -o metrics
+    python main.py serve --port 8502
+Also runnable from the repository root as python -m src.main
 """
 
+import argparse
 import subprocess
 import sys
 import os
 
-def main():
-    """Main entry point - Launch Streamlit app"""
+# The app modules import each other by bare name, from this directory
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+# Metrics the analyze command can write, listed without importing the analyzer
+from metrics import SUMMARY_METRICS
+
+def launch_streamlit():
+    """Launch the Streamlit web app"""
     print("📱 WhatsApp Chat Analyzer")
     print("=" * 40)
     print("🌐 Launching Streamlit Web App...")
-    
-    # Check if streamlit_app.py exists
-    if not os.path.exists("streamlit_app.py"):
+
+    # The app is found next to this file, whatever the working directory
+    app_path = os.path.join(APP_DIR, "streamlit_app.py")
+    if not os.path.exists(app_path):
         print("❌ streamlit_app.py not found!")
-        print("💡 Make sure streamlit_app.py is in the same directory")
+        print(f"💡 Make sure streamlit_app.py is in {APP_DIR}")
         return
-    
+
     try:
         print("🚀 Starting web interface...")
         print("💡 Your browser will open automatically")
         print("📍 URL: http://localhost:8501")
         print("\n" + "="*40)
-        
-        # Launch Streamlit
-        subprocess.run([sys.executable, "-m", "streamlit", "run", "streamlit_app.py"])
-        
+
+        # Streamlit's upload limit follows the largest chat the analysis pool admits
+        from analysis_executor import MAX_ADMITTED_CHAT_MB
+
+        # Launch Streamlit from the app directory, which holds the sample data and styles
+        subprocess.run([sys.executable, "-m", "streamlit", "run", app_path,
+                        "--server.maxUploadSize", str(MAX_ADMITTED_CHAT_MB)], cwd=APP_DIR)
+
     except FileNotFoundError:
         print("❌ Streamlit not installed!")
         print("💡 Install with: pip install streamlit plotly")
         print("💡 Then run: python main.py")
-        
+
     except KeyboardInterrupt:
         print("\n👋 Goodbye!")
-        
+
     except Exception as e:
         print(f"❌ Error launching Streamlit: {e}")
         print("💡 Try running directly: streamlit run streamlit_app.py")
 
+def run_report(args):
+    """Write headless reports for every chat file"""
+    # Imported here so launching the web app does not pay for it
+    from report import generate_reports
+
+    reports = generate_reports(args.chats, args.output, formats=args.formats, workers=args.workers)
+    print(f"✅ {len(reports)} report(s) written to {args.output}")
+
+def run_analyze(args):
+    """Write the metrics of every chat file, to stdout or an output directory"""
+    # Imported here: only the parser and analyzer, no Streamlit or Plotly
+    from batch import analyze_chats
+
+    summaries = analyze_chats(args.chats, args.output, output_format=args.format,
+                              metrics=args.metrics, workers=args.workers)
+    print(f"✅ {len(summaries)} chat(s) analyzed", file=sys.stderr)
+
+def run_serve(args):
+    """Run the local HTTP analysis service"""
+    from service import serve
+
+    if args.max_upload_mb is None:
+        serve(args.host, args.port, workers=args.workers)
+    else:
+        serve(args.host, args.port, workers=args.workers, max_upload_mb=args.max_upload_mb)
+
+def build_arg_parser():
+    """Command line arguments, no command launches the web app"""
+    parser = argparse.ArgumentParser(description="📱 WhatsApp Chat Analyzer")
+    commands = parser.add_subparsers(dest="command")
+
+    report = commands.add_parser("report", help="Write HTML/PNG/JSON reports for chat files, without the UI")
+    report.add_argument("chats", nargs="+", help="Chat .txt files or glob patterns")
+    report.add_argument("-o", "--output", default="reports", help="Output directory (default: reports)")
+    report.add_argument("--formats", nargs="+", choices=["html", "png", "json"], default=["html", "png", "json"],
+                        help="Report formats to write (default: all)")
+    report.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    report.set_defaults(handler=run_report)
+
+    analyze = commands.add_parser("analyze", help="Write chat metrics as JSON or Parquet, without the UI")
+    analyze.add_argument("chats", nargs="+", help="Chat .txt files or glob patterns")
+    analyze.add_argument("-o", "--output", default=None,
+                         help="Output directory, one file per chat (default: all chats to stdout)")
+    analyze.add_argument("--format", choices=["json", "parquet"], default="json",
+                         help="json: one JSON line per chat on stdout; parquet: one table (default: json)")
+    analyze.add_argument("--metrics", nargs="+", choices=SUMMARY_METRICS, default=list(SUMMARY_METRICS),
+                         help="Metrics to include (default: all)")
+    analyze.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    analyze.set_defaults(handler=run_analyze)
+
+    serve = commands.add_parser("serve", help="Run the HTTP analysis service for other tools")
+    serve.add_argument("--host", default="127.0.0.1", help="Interface to listen on (default: 127.0.0.1)")
+    serve.add_argument("--port", type=int, default=8502, help="Port (default: 8502)")
+    serve.add_argument("--workers", type=int, default=None, help="Analysis worker processes (default: ANALYSIS_WORKERS)")
+    serve.add_argument("--max-upload-mb", type=int, default=None,
+                       help="Largest accepted chat in MB (default: MAX_UPLOAD_MB, else the largest chat the pool admits)")
+    serve.set_defaults(handler=run_serve)
+
+    return parser
+
+def main(argv=None):
+    """Main entry point - Launch Streamlit app or run a headless command"""
+    args = build_arg_parser().parse_args(argv)
+    # Timing logs, when the log level env var asks for them
+    from instrumentation import configure_logging
+    configure_logging()
+    if args.command is None:
+        launch_streamlit()
+        return
+    args.handler(args)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
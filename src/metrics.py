@@ -0,0 +1,13 @@
+"""
+Names of the plain analysis metrics, apart from the analyzer so the command line
+can list them without importing pandas
+"""
+
+# Plain metrics of the analyze_chat results, in display order.
+# The remaining keys are indexes and arrays meant for interactive queries
+SUMMARY_METRICS = (
+    'basic_stats', 'messages_per_user', 'avg_message_length', 'messages_by_hour', 'messages_by_day',
+    'most_common_words', 'most_common_bigrams', 'most_common_trigrams', 'avg_response_time_per_user',
+    'response_time_percentiles', 'laughs_per_user', 'emoji_per_user', 'most_common_emojis',
+    'message_bursts', 'conversation_starters',
+)
@@ -2,91 +2,147 @@
 Universal WhatsApp chat parser supporting both Hebrew and English formats
 """
 
+import codecs
 import pandas as pd
 import re
+import sys
 from datetime import datetime
+from instrumentation import count, stage, timed
 
-def parse_whatsapp(file_path):
+# Hebrew-style datetime format: [5.8.2025, 15:40:24], user: message
+HEBREW_PATTERN = re.compile(r'\[(\d{1,2}\.\d{1,2}\.\d{4}), (\d{1,2}:\d{2}:\d{2})\] ([^:]+): (.+)')
+
+# English-style datetime format: [01/08/2024, 0:51:22], user: message (24-hour format)
+ENGLISH_PATTERN = re.compile(r'\[(\d{1,2}/\d{1,2}/\d{4}), (\d{1,2}:\d{2}:\d{2})\] ([^:]+): (.+)')
+
+# Any timestamped line, messages and system lines alike, in either format
+TIMESTAMP_PATTERN = re.compile(r'\[\d{1,2}[./]\d{1,2}[./]\d{4}, \d{1,2}:\d{2}:\d{2}\]')
+
+SYSTEM_MESSAGE_KEYWORDS = [
+    "הושמט", "omitted", "media omitted", "group created",
+    "שינה את שם הקבוצה", "שינתה את שם הקבוצה", "שם הקבוצה שונה",
+    "created group", "You changed", "נוצרה הקבוצה", "את\ה",
+    "את/ה", "Messages and calls are end-to-end encrypted",
+    "ההודעות והשיחות מוצפנות מקצה לקצה"
+]
+
+# Streams are parsed this many bytes at a time
+PARSE_CHUNK_BYTES = 1024 * 1024
+
+# A stream without a single timestamped line in its first bytes is not a chat export
+FORMAT_SNIFF_BYTES = 16 * 1024
+
+
+class ChatFormatError(ValueError):
+    """Raised when a stream does not look like a WhatsApp chat export"""
+
+
+def parse_line(line):
+    """
+    Parse one line of an export into a message dict, None for system, empty and other lines
+    """
+    line = line.strip()
+    if not line or ':' not in line:
+        return None
+    if any(keyword in line for keyword in SYSTEM_MESSAGE_KEYWORDS):
+        return None
+
+    # Try matching Hebrew pattern first, then English (DD/MM/YYYY format, 24-hour time)
+    for pattern, date_format in ((HEBREW_PATTERN, "%d.%m.%Y %H:%M:%S"), (ENGLISH_PATTERN, "%d/%m/%Y %H:%M:%S")):
+        match = pattern.match(line)
+        if match:
+            date_str, time_str = match.group(1), match.group(2)
+            message = match.group(4).strip()
+
+            # Skip if message is empty
+            if not message:
+                return None
+
+            return {
+                'datetime': datetime.strptime(f"{date_str} {time_str}", date_format),
+                'user': match.group(3).strip(),
+                'message': message
+            }
+    return None
+
+
+@timed('parse')
+def parse_whatsapp_file(file_path):
     """
-    Parsing data according to Whatsapp exporting format
+    Parse a chat export file according to Whatsapp exporting format.
+    Raises OSError when it cannot be read and UnicodeDecodeError when it is not UTF-8 text
     """
-    # Containts tuples of datetime, user, and message
+    # Containts dicts of datetime, user, and message
     chat_data = []
 
-    # Hebrew-style datetime format: [5.8.2025, 15:40:24], user: message
-    hebrew_pattern = r'\[(\d{1,2}\.\d{1,2}\.\d{4}), (\d{1,2}:\d{2}:\d{2})\] ([^:]+): (.+)'
+    # Read the file line by line
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            message = parse_line(line)
+            if message is not None:
+                chat_data.append(message)
 
-    # English-style datetime format: [01/08/2024, 0:51:22], user: message (24-hour format)
-    english_pattern = r'\[(\d{1,2}/\d{1,2}/\d{4}), (\d{1,2}:\d{2}:\d{2})\] ([^:]+): (.+)'
+    # Create DataFrame
+    count('parse.messages', len(chat_data))
+    with stage('parse.dataframe'):
+        return pd.DataFrame(chat_data)
 
-    system_message_keywords = [
-        "הושמט", "omitted", "media omitted", "group created",
-        "שינה את שם הקבוצה", "שינתה את שם הקבוצה", "שם הקבוצה שונה",
-        "created group", "You changed", "נוצרה הקבוצה", "את\ה",
-        "את/ה", "Messages and calls are end-to-end encrypted",
-        "ההודעות והשיחות מוצפנות מקצה לקצה"
-    ]
 
-    # Read the file line by line
+def parse_whatsapp(file_path):
+    """
+    Parsing data according to Whatsapp exporting format.
+    A file that cannot be read is reported on stderr and gives an empty DataFrame
+    """
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            for line in file:
-                line = line.strip()
-                if not line or ':' not in line:
-                    continue
-                if any(keyword in line for keyword in system_message_keywords):
-                    continue
-
-                # Try matching Hebrew pattern first
-                hebrew_match = re.match(hebrew_pattern, line)
-                if hebrew_match:
-                    date_str = hebrew_match.group(1)
-                    time_str = hebrew_match.group(2)
-                    user = hebrew_match.group(3).strip()
-                    message = hebrew_match.group(4).strip()
-
-                    # Skip if message is empty
-                    if not message:
-                        continue
-
-                    # Convert Hebrew date to datetime object
-                    datetime_obj = datetime.strptime(f"{date_str} {time_str}", "%d.%m.%Y %H:%M:%S")
-
-                    chat_data.append({
-                        'datetime': datetime_obj,
-                        'user': user,
-                        'message': message
-                    })
-                    continue
-
-                # Try matching English pattern
-                english_match = re.match(english_pattern, line)
-                if english_match:
-                    date_str = english_match.group(1)
-                    time_str = english_match.group(2)
-                    user = english_match.group(3).strip()
-                    message = english_match.group(4).strip()
-
-                    # Skip if message is empty
-                    if not message:
-                        continue
-
-                    # Convert English date to datetime object (DD/MM/YYYY format, 24-hour time)
-                    datetime_obj = datetime.strptime(f"{date_str} {time_str}", "%d/%m/%Y %H:%M:%S")
-
-                    chat_data.append({
-                        'datetime': datetime_obj,
-                        'user': user,
-                        'message': message
-                    })
-
-        # Create DataFrame
-        df = pd.DataFrame(chat_data)
-        return df
-
+        return parse_whatsapp_file(file_path)
     except FileNotFoundError:
-        print(f"❌ File not found: {file_path}")
+        print(f"❌ File not found: {file_path}", file=sys.stderr)
         return pd.DataFrame()
     except Exception as e:
-        print(f"❌ Error parsing chat: {e}")
-        return pd.DataFrame()
\ No newline at end of file
+        print(f"❌ Error parsing chat: {e}", file=sys.stderr)
+        return pd.DataFrame()
+
+
+@timed('parse')
+def parse_whatsapp_stream(stream, total_bytes=None, on_progress=None, chunk_size=PARSE_CHUNK_BYTES):
+    """
+    Parse a binary stream (an upload, BytesIO, open file) chunk by chunk, without a temp file
+    or a second copy of the text. on_progress(bytes read, total_bytes) is called after each chunk.
+    Raises ChatFormatError when the first FORMAT_SNIFF_BYTES hold no timestamped line,
+    or the stream is not UTF-8 text
+    """
+    chat_data = []
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    pending = ''
+    bytes_read = 0
+    recognized = False
+
+    while True:
+        chunk = stream.read(chunk_size)
+        try:
+            text = pending + decoder.decode(chunk, final=not chunk)
+        except UnicodeDecodeError:
+            raise ChatFormatError("Not a text file, WhatsApp exports are UTF-8 .txt files") from None
+
+        # The last line may continue in the next chunk
+        lines = text.split('\n')
+        pending = lines.pop() if chunk else ''
+        for line in lines:
+            message = parse_line(line)
+            if message is not None:
+                chat_data.append(message)
+
+        bytes_read += len(chunk)
+        if not recognized:
+            recognized = bool(chat_data) or any(TIMESTAMP_PATTERN.match(line.strip()) for line in lines)
+            if not recognized and (bytes_read >= FORMAT_SNIFF_BYTES or not chunk):
+                raise ChatFormatError("This does not look like a WhatsApp chat export")
+        if on_progress is not None:
+            on_progress(bytes_read, total_bytes)
+        if not chunk:
+            break
+
+    count('parse.bytes', bytes_read)
+    count('parse.messages', len(chat_data))
+    with stage('parse.dataframe'):
+        return pd.DataFrame(chat_data)
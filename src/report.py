@@ -0,0 +1,241 @@
+"""
+Headless report generation: HTML report, static images and JSON metrics from analyze_chat results
+"""
+
+import html
+import importlib.util
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import plotly.offline
+
+import visualizer
+from analyzer import summarize_results, timeline_daily_counts, timeline_rolling_average
+from batch import analyze_chat_file, expand_chat_paths, output_name
+
+REPORT_FORMATS = ('html', 'png', 'json')
+
+# Report figures, in page order: (file name, title, visualizer function, results key)
+REPORT_FIGURES = (
+    ('messages_pie', "🥧 Message Distribution", 'get_fig_messages_pie_chart', 'messages_per_user'),
+    ('messages_per_user', "📊 Messages per User", 'get_fig_messages_per_user', 'messages_per_user'),
+    ('response_time', "⏱️ Response Time per User", 'get_fig_response_time_per_user', 'avg_response_time_per_user'),
+    ('avg_length', "📏 Average Message Length", 'get_fig_avg_message_length', 'avg_message_length'),
+    ('message_bursts', "💬 Message Bursts", 'get_fig_message_bursts', 'message_bursts'),
+    ('conversation_starters', "🗣️ Conversation Starters", 'get_fig_conversation_starters', 'conversation_starters'),
+    ('laughs', "😂 Laughs per User", 'get_fig_laughs_per_user', 'laughs_per_user'),
+    ('by_hour', "🕒 Activity by Hour", 'get_fig_messages_by_hour', 'messages_by_hour'),
+    ('common_words', "🔤 Most Common Words", 'get_fig_most_common_words', 'most_common_words'),
+    ('common_phrases', "💬 Most Common Phrases", 'get_fig_most_common_phrases', 'most_common_bigrams'),
+    ('common_emojis', "😊 Most Common Emojis", 'get_fig_most_common_emojis', 'most_common_emojis'),
+    ('emoji_per_user', "😊 Emoji Usage per User", 'get_fig_emoji_per_user', 'emoji_per_user'),
+)
+
+# Shared assets are written once per batch into this folder of the output directory
+ASSETS_DIR = 'assets'
+PLOTLY_JS_FILE = 'plotly.min.js'
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+{plotly_js}
+<style>
+body {{ background: #0f172a; color: white; font-family: "Segoe UI", Arial, sans-serif; margin: 2rem; }}
+h1 {{ color: #6ee7b7; }}
+.metrics {{ display: flex; gap: 1rem; flex-wrap: wrap; }}
+.metric {{ background: #065f46; border-radius: 10px; padding: 1rem 1.5rem; min-width: 10rem; }}
+.metric .value {{ font-size: 1.8rem; font-weight: 700; }}
+.figure {{ margin-top: 2rem; }}
+</style>
+</head>
+<body>
+<h1>📱 {title}</h1>
+<div class="metrics">{metrics}</div>
+{figures}
+</body>
+</html>
+"""
+
+
+def png_export_available() -> bool:
+    """
+    Static image export needs the optional kaleido package
+    """
+    return importlib.util.find_spec('kaleido') is not None
+
+
+def figure_jobs(results: dict):
+    """
+    Return the (file name, title, visualizer function, args) of every figure in the report
+    """
+    jobs = [
+        (name, title, func_name, (results[key],))
+        for name, title, func_name, key in REPORT_FIGURES
+        if results.get(key)
+    ]
+
+    heatmap = results.get('activity_heatmap')
+    if heatmap is not None:
+        jobs.append(('activity_heatmap', "🗓️ Activity by Weekday and Hour", 'get_fig_activity_heatmap',
+                     (heatmap['counts'].sum(axis=0),)))
+
+    # The timeline is sliced from the cumulative arrays here, workers only get plain dicts
+    timeline = results.get('activity_timeline')
+    if timeline is not None:
+        daily = timeline_daily_counts(timeline).to_dict()
+        rolling = timeline_rolling_average(timeline, 7).to_dict()
+        jobs.append(('activity_timeline', "📈 Activity Over Time", 'get_fig_activity_timeline', (daily, rolling)))
+    return jobs
+
+
+def render_figure(name, func_name, args, png_path=None):
+    """
+    Build one figure and return (name, html div, png error or None).
+    Runs inside the worker processes
+    """
+    fig = getattr(visualizer, func_name)(*args)
+    div = fig.to_html(full_html=False, include_plotlyjs=False, div_id=name)
+
+    png_error = None
+    if png_path:
+        try:
+            fig.write_image(png_path)
+        except Exception as e:
+            png_error = str(e)
+    return name, div, png_error
+
+
+def write_plotly_js(output_dir):
+    """
+    Write the Plotly JS bundle once into the shared assets folder and return its path
+    """
+    assets_dir = os.path.join(output_dir, ASSETS_DIR)
+    os.makedirs(assets_dir, exist_ok=True)
+    path = os.path.join(assets_dir, PLOTLY_JS_FILE)
+    if not os.path.exists(path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(plotly.offline.get_plotlyjs())
+    return path
+
+
+def generate_report(results, output_dir, title="WhatsApp Chat Report", formats=REPORT_FORMATS,
+                    executor=None, plotly_js_path=None):
+    """
+    Write the report of one analyzed chat into output_dir:
+    report.html, metrics.json and figures/*.png, depending on formats.
+    Figures are built on the executor when given (e.g. a shared process pool).
+    Without plotly_js_path the HTML inlines Plotly and is fully self-contained
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    written = {}
+
+    if 'json' in formats:
+        path = os.path.join(output_dir, 'metrics.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(summarize_results(results), f, ensure_ascii=False, indent=2)
+        written['json'] = path
+
+    want_png = 'png' in formats and png_export_available()
+    if 'png' in formats and not want_png:
+        print("⚠️ PNG export skipped: install kaleido to export static images")
+    if not ('html' in formats or want_png):
+        return written
+
+    figures_dir = os.path.join(output_dir, 'figures')
+    if want_png:
+        os.makedirs(figures_dir, exist_ok=True)
+
+    # Submit every figure first so they render in parallel across the pool
+    jobs = figure_jobs(results)
+    calls = [
+        (name, func_name, args, os.path.join(figures_dir, f"{name}.png") if want_png else None)
+        for name, _, func_name, args in jobs
+    ]
+    if executor is not None:
+        rendered = [f.result() for f in [executor.submit(render_figure, *call) for call in calls]]
+    else:
+        rendered = [render_figure(*call) for call in calls]
+
+    for name, _, png_error in rendered:
+        if png_error:
+            print(f"⚠️ PNG export failed for {name}: {png_error}")
+    if want_png:
+        written['png'] = figures_dir
+
+    if 'html' in formats:
+        path = os.path.join(output_dir, 'report.html')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(render_html(results, title, jobs, rendered, output_dir, plotly_js_path))
+        written['html'] = path
+
+    return written
+
+
+def render_html(results, title, jobs, rendered, output_dir, plotly_js_path=None):
+    """
+    Assemble the report page from the metrics and the rendered figure divs
+    """
+    if plotly_js_path:
+        src = os.path.relpath(plotly_js_path, output_dir).replace(os.sep, '/')
+        plotly_js = f'<script src="{html.escape(src)}"></script>'
+    else:
+        plotly_js = f'<script>{plotly.offline.get_plotlyjs()}</script>'
+
+    stats = results['basic_stats']
+    metrics = "".join(
+        f'<div class="metric"><div>{label}</div><div class="value">{value}</div></div>'
+        for label, value in (
+            ("📱 Total Messages", f"{stats['total_messages']:,}"),
+            ("👥 Active Users", stats['total_users']),
+            ("📅 Days Active", stats['date_range_days']),
+            ("📊 Daily Average", f"{stats['messages_per_day']:.1f}"),
+        )
+    )
+
+    titles = {name: title for name, title, _, _ in jobs}
+    figures = "\n".join(
+        f'<div class="figure"><h3>{html.escape(titles[name])}</h3>{div}</div>'
+        for name, div, _ in rendered
+    )
+    return HTML_TEMPLATE.format(title=html.escape(title), plotly_js=plotly_js, metrics=metrics, figures=figures)
+
+
+def generate_reports(chat_paths, output_dir, formats=REPORT_FORMATS, workers=None):
+    """
+    Parse, analyze and write reports for many chat files.
+    Chats are analyzed and figures rendered on one shared process pool,
+    and the Plotly JS bundle is written once for the whole batch.
+    A chat that cannot be analyzed or reported is skipped with its error, the others are
+    still written. Returns {chat path: written files}
+    """
+    paths = expand_chat_paths(chat_paths)
+    os.makedirs(output_dir, exist_ok=True)
+    if 'png' in formats and not png_export_available():
+        print("⚠️ PNG export skipped: install kaleido to export static images")
+        formats = tuple(f for f in formats if f != 'png')
+    plotly_js_path = write_plotly_js(output_dir) if 'html' in formats else None
+
+    reports, used = {}, set()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        analyses = [(path, pool.submit(analyze_chat_file, path)) for path in paths]
+        for path, future in analyses:
+            try:
+                results = future.result()
+                if not results:
+                    print(f"❌ No messages found in {path}, skipped")
+                    continue
+
+                name = output_name(path, used)
+                reports[path] = generate_report(
+                    results, os.path.join(output_dir, name),
+                    title=f"WhatsApp Chat Report - {name}",
+                    formats=formats, executor=pool, plotly_js_path=plotly_js_path
+                )
+            except Exception as e:
+                print(f"❌ Could not write the report for {path}, skipped: {type(e).__name__}: {e}")
+                continue
+            print(f"📄 Report written: {os.path.join(output_dir, name)}")
+    return reports
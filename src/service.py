@@ -0,0 +1,319 @@
+"""
+Local HTTP service: analyze chats for other tools, without the Streamlit UI.
+Stdlib only. Analysis runs on the shared, pre-warmed process pool and results go to the
+same content-hash cache as the web app (shared on disk through WHATSAPP_ANALYZER_CACHE_DIR).
+
+    POST /analyze              raw chat bytes as the body  -> 200 metrics JSON
+    POST /analyze?wait=0       queue only                  -> 202 {"hash": ..., "state": ...}
+    GET  /analysis/<hash>      cached or running analysis  -> 200 metrics / 202 state / 404
+    GET  /analysis/<hash>/snapshot                         -> 200 analysis snapshot (.zip)
+    POST /snapshot             snapshot .zip as the body   -> 200 {"hash": ...} of the snapshot, cached without analysis
+    GET  /health               pool and cache counters
+
+Metrics are the plain analyze_chat metrics (see analyzer.SUMMARY_METRICS), optionally
+narrowed with ?metrics=basic_stats,messages_per_user.
+Backpressure: 413 when the body is over the size limit, 503 with Retry-After when the
+pool queue or memory budget is full, 504 when the analysis times out. Files that are not
+chat exports are rejected with 422 after their first few KB are parsed.
+"""
+
+import json
+import os
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from analysis_executor import AnalysisExecutor, ExecutorBusyError, JobFailedError, ChatTooLargeError, MAX_ADMITTED_CHAT_MB
+from cache_utils import AnalysisCache, content_digest, ANALYSIS_CACHE_DIR_ENV
+from instrumentation import configure_logging
+
+SERVICE_HOST = '127.0.0.1'
+SERVICE_PORT = 8502
+
+# Largest accepted upload, overridable with the env var of the same name (in MB),
+# by default the largest chat the analysis pool admits
+MAX_UPLOAD_MB = int(os.environ.get('MAX_UPLOAD_MB', MAX_ADMITTED_CHAT_MB))
+
+# How often a waiting request polls its job, and the Retry-After sent with 503
+POLL_SECONDS = 0.1
+RETRY_AFTER_SECONDS = 5
+
+# Rejected bodies up to this size are read and dropped so the client gets the 413,
+# larger ones are cut off by closing the connection
+DISCARD_MAX_BYTES = 16 * 1024 * 1024
+
+# Content digests as made by cache_utils.content_digest, anything else is not a valid hash
+DIGEST_PATTERN = re.compile(r'^(xxh3|b2)-[0-9a-f]{16,64}$')
+
+
+class AnalysisService:
+    """
+    The pool, cache and limits behind the HTTP handler
+    """
+
+    def __init__(self, executor=None, cache=None, max_upload_bytes=MAX_UPLOAD_MB * 1024 * 1024):
+        self.executor = executor or AnalysisExecutor()
+        self.cache = cache or AnalysisCache(cache_dir=os.environ.get(ANALYSIS_CACHE_DIR_ENV))
+        self.max_upload_bytes = max_upload_bytes
+
+    def submit(self, data: bytes) -> str:
+        """
+        Queue the analysis of raw chat bytes unless cached, return its content hash.
+        Raises ExecutorBusyError when the pool is full, ChatTooLargeError over its memory budget
+        """
+        digest = content_digest(data)
+        if self.cache.get(digest) is None:
+            self.executor.submit(digest, data)
+        return digest
+
+    def lookup(self, digest):
+        """
+        Return (state, results): 'done' with the results (cached on completion),
+        'queued'/'running' while in progress, 'empty' for a chat without messages,
+        'unknown' when never analyzed. Raises JobFailedError for failed or timed-out jobs
+        """
+        results = self.cache.get(digest)
+        if results is not None:
+            return 'done', results
+
+        state = self.executor.status(digest)['state']
+        if state in ('queued', 'running', 'unknown'):
+            return state, None
+
+        results = self.executor.result(digest)
+        if not results:
+            return 'empty', None
+        results['fingerprint'] = digest
+        self.cache.put(digest, results)
+        return 'done', results
+
+    def wait(self, digest):
+        """
+        Block until the analysis is no longer queued or running, return lookup()
+        """
+        state, results = self.lookup(digest)
+        while state in ('queued', 'running'):
+            time.sleep(POLL_SECONDS)
+            state, results = self.lookup(digest)
+        return state, results
+
+    def import_snapshot(self, data: bytes) -> str:
+        """
+        Cache the results stored in a snapshot and return the snapshot's own content hash.
+        The chat fingerprint in its manifest is not trusted: results are only ever cached
+        under a hash computed here, so an import cannot stand in for another chat's analysis.
+        Raises snapshot.SnapshotError when it cannot be opened
+        """
+        from snapshot import import_snapshot
+
+        results = import_snapshot(data)
+        digest = content_digest(data)
+        results['fingerprint'] = digest
+        self.cache.put(digest, results)
+        return digest
+
+    def health(self) -> dict:
+        return {'executor': self.executor.stats(), 'cache': self.cache.stats()}
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP front of an AnalysisService (set as the server's service attribute)
+    """
+
+    server_version = 'WhatsAppAnalyzer/1.0'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/health':
+            self.send_json(200, self.server.service.health())
+        elif url.path.startswith('/analysis/') and url.path.endswith('/snapshot'):
+            self.send_snapshot(url.path[len('/analysis/'):-len('/snapshot')], parse_qs(url.query))
+        elif url.path.startswith('/analysis/'):
+            self.respond_with_analysis(url.path[len('/analysis/'):], parse_qs(url.query), wait=False)
+        else:
+            self.send_json(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path not in ('/analyze', '/snapshot'):
+            self.send_json(404, {'error': 'Not found'})
+            return
+
+        service = self.server.service
+        length = self.content_length()
+        if length is None:
+            self.close_connection = True
+            self.send_json(400, {'error': 'Invalid Content-Length header'})
+            return
+        if length <= 0:
+            self.send_json(400, {'error': 'Send the chat file as the request body'})
+            return
+        if length > service.max_upload_bytes:
+            self.discard_body(length)
+            self.send_too_large()
+            return
+
+        data = self.rfile.read(length)
+        if url.path == '/snapshot':
+            self.receive_snapshot(data)
+            return
+        try:
+            digest = service.submit(data)
+        except ExecutorBusyError as e:
+            self.send_json(503, {'error': str(e)}, {'Retry-After': str(RETRY_AFTER_SECONDS)})
+            return
+        except ChatTooLargeError as e:
+            self.send_json(413, {'error': str(e)})
+            return
+
+        query = parse_qs(url.query)
+        self.respond_with_analysis(digest, query, wait=query.get('wait', ['1'])[0] != '0')
+
+    def handle_expect_100(self):
+        """
+        Clients sending "Expect: 100-continue" (e.g. curl, for large files) learn about
+        an oversized upload before sending it
+        """
+        if (self.content_length() or 0) > self.server.service.max_upload_bytes:
+            self.close_connection = True
+            self.send_too_large()
+            return False
+        return super().handle_expect_100()
+
+    def content_length(self):
+        """
+        The Content-Length header as a number (0 when missing), None when it is not one
+        """
+        value = self.headers.get('Content-Length') or '0'
+        if not value.strip().isdigit():
+            return None
+        return int(value)
+
+    def discard_body(self, length):
+        if length > DISCARD_MAX_BYTES:
+            self.close_connection = True
+            return
+        while length > 0:
+            chunk = self.rfile.read(min(length, 64 * 1024))
+            if not chunk:
+                break
+            length -= len(chunk)
+
+    def send_too_large(self):
+        limit_mb = self.server.service.max_upload_bytes // (1024 * 1024)
+        self.send_json(413, {'error': f"Chat is larger than the {limit_mb} MB limit"})
+
+    def respond_with_analysis(self, digest, query, wait):
+        if not DIGEST_PATTERN.match(digest):
+            self.send_json(404, {'error': 'Unknown content hash'})
+            return
+
+        # Imported here so the handler module itself stays light
+        from analyzer import summarize_results, SUMMARY_METRICS
+        from parser import ChatFormatError
+
+        service = self.server.service
+        try:
+            state, results = service.wait(digest) if wait else service.lookup(digest)
+        except JobFailedError as e:
+            if isinstance(e.__cause__, ChatFormatError):
+                status = 422
+            else:
+                status = 504 if service.executor.status(digest)['state'] == 'timeout' else 500
+            self.send_json(status, {'hash': digest, 'error': str(e)})
+            return
+
+        if state in ('queued', 'running'):
+            self.send_json(202, {'hash': digest, 'state': state})
+        elif state == 'unknown':
+            self.send_json(404, {'hash': digest, 'error': 'Unknown content hash'})
+        elif state == 'empty':
+            self.send_json(422, {'hash': digest, 'error': 'No messages found in the chat file'})
+        else:
+            metrics = query.get('metrics', [','.join(SUMMARY_METRICS)])[0].split(',')
+            try:
+                summary = summarize_results(results, metrics)
+            except ValueError as e:
+                self.send_json(400, {'error': str(e)})
+                return
+            self.send_json(200, {'hash': digest, 'metrics': summary})
+
+    def send_snapshot(self, digest, query):
+        from snapshot import export_snapshot
+
+        if not DIGEST_PATTERN.match(digest):
+            self.send_json(404, {'error': 'Unknown content hash'})
+            return
+        try:
+            state, results = self.server.service.lookup(digest)
+        except JobFailedError as e:
+            self.send_json(500, {'hash': digest, 'error': str(e)})
+            return
+        if state != 'done':
+            self.send_json(202 if state in ('queued', 'running') else 404, {'hash': digest, 'state': state})
+            return
+        include_indexes = query.get('indexes', ['1'])[0] != '0'
+        self.send_body(200, export_snapshot(results, include_indexes), 'application/zip',
+                       {'Content-Disposition': f'attachment; filename="{digest}.zip"'})
+
+    def receive_snapshot(self, data):
+        from snapshot import SnapshotError
+
+        try:
+            digest = self.server.service.import_snapshot(data)
+        except SnapshotError as e:
+            self.send_json(422, {'error': str(e)})
+            return
+        self.send_json(200, {'hash': digest})
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_body(status, body, 'application/json; charset=utf-8', headers)
+
+    def send_body(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Quiet by default, the counters are on /health
+        pass
+
+
+def create_server(service=None, host=SERVICE_HOST, port=SERVICE_PORT):
+    """
+    Build the HTTP server around a service, pre-warming its worker pool.
+    Port 0 picks a free port (see server.server_address)
+    """
+    service = service or AnalysisService()
+    # Workers start before any request thread exists, and the first request skips their start-up
+    service.executor.warm_up()
+    server = ThreadingHTTPServer((host, port), AnalysisRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def serve(host=SERVICE_HOST, port=SERVICE_PORT, workers=None, max_upload_mb=MAX_UPLOAD_MB):
+    """
+    Run the service until interrupted
+    """
+    configure_logging()
+    executor = AnalysisExecutor(max_workers=workers) if workers else None
+    service = AnalysisService(executor, max_upload_bytes=max_upload_mb * 1024 * 1024)
+    server = create_server(service, host, port)
+    print(f"📡 Analysis service on http://{host}:{server.server_address[1]} "
+          f"({service.executor.max_workers} workers, {max_upload_mb} MB upload limit)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Goodbye!")
+    finally:
+        server.server_close()
+        service.executor.shutdown()
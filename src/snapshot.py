@@ -0,0 +1,164 @@
+"""
+Analysis snapshots: the complete analyze_chat results in one versioned zip file,
+so a chat can be opened again without parsing or analyzing it.
+
+    manifest.json    format, version, chat fingerprint, creation time
+    results.json     aggregates and per-user tables, arrays replaced by references
+    arrays/<n>.npy   NumPy arrays (timelines, heatmaps, reply graph, search index)
+
+No pickle anywhere, so opening a snapshot from someone else cannot run code
+"""
+
+import io
+import json
+import time
+import zipfile
+from collections.abc import Mapping
+
+import numpy as np
+
+SNAPSHOT_FORMAT = 'whatsapp-analyzer-snapshot'
+SNAPSHOT_EXTENSION = '.zip'
+
+# Bump when the results layout changes, and add a migration from the previous version
+SNAPSHOT_VERSION = 1
+
+# Results keys that are only needed for interactive search, optional in a snapshot
+INDEX_KEYS = ('search_index',)
+
+# Largest uncompressed snapshot accepted, against zip bombs
+SNAPSHOT_MAX_BYTES = 1024 * 1024 * 1024
+
+# version -> function upgrading results of that version to the next one.
+# Versions without a migration are rejected as no longer supported
+MIGRATIONS = {}
+
+
+class SnapshotError(ValueError):
+    """Raised when a file is not a snapshot, or one this version cannot open"""
+
+
+def _encode(value, arrays):
+    """
+    Turn results into JSON-able values, collecting arrays as (name, array).
+    Tuples, non-string dict keys and NumPy values are tagged, so they come back as they were
+    """
+    if isinstance(value, np.ndarray):
+        name = f"arrays/{len(arrays)}.npy"
+        arrays.append((name, value))
+        return {'$array': name}
+    if isinstance(value, np.datetime64):
+        return {'$datetime64': str(value)}
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, Mapping):
+        if all(isinstance(k, str) and not k.startswith('$') for k in value):
+            return {k: _encode(v, arrays) for k, v in value.items()}
+        return {'$dict': [[_encode(k, arrays), _encode(v, arrays)] for k, v in value.items()]}
+    if isinstance(value, tuple):
+        return {'$tuple': [_encode(v, arrays) for v in value]}
+    if isinstance(value, list):
+        # (item, count) lists are the bulk of the results, stored without a tag per pair
+        if value and all(type(v) is tuple for v in value):
+            return {'$tuples': [[_encode(x, arrays) for x in v] for v in value]}
+        return [_encode(v, arrays) for v in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    raise SnapshotError(f"Cannot store {type(value).__name__} values in a snapshot")
+
+
+def _decode(value, archive):
+    if isinstance(value, list):
+        return [_decode(v, archive) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if '$array' in value:
+        return np.load(io.BytesIO(archive.read(value['$array'])), allow_pickle=False)
+    if '$datetime64' in value:
+        return np.datetime64(value['$datetime64'])
+    if '$dict' in value:
+        return {_decode(k, archive): _decode(v, archive) for k, v in value['$dict']}
+    if '$tuple' in value:
+        return tuple(_decode(v, archive) for v in value['$tuple'])
+    if '$tuples' in value:
+        return [tuple(_decode(x, archive) for x in v) for v in value['$tuples']]
+    return {k: _decode(v, archive) for k, v in value.items()}
+
+
+def export_snapshot(results, include_indexes=True) -> bytes:
+    """
+    Return the snapshot of analysis results as zip bytes.
+    Without include_indexes, the search index is left out (keyword search is then unavailable)
+    """
+    results = {k: v for k, v in results.items() if include_indexes or k not in INDEX_KEYS}
+    arrays = []
+    encoded = _encode(results, arrays)
+    manifest = {
+        'format': SNAPSHOT_FORMAT,
+        'version': SNAPSHOT_VERSION,
+        'fingerprint': results.get('fingerprint'),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'indexes': include_indexes,
+    }
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('manifest.json', json.dumps(manifest, indent=2))
+        archive.writestr('results.json', json.dumps(encoded, ensure_ascii=False, separators=(',', ':')))
+        for name, array in arrays:
+            array_buffer = io.BytesIO()
+            try:
+                np.save(array_buffer, array, allow_pickle=False)
+            except ValueError:
+                raise SnapshotError(f"Cannot store {array.dtype} arrays in a snapshot") from None
+            archive.writestr(name, array_buffer.getvalue())
+    return buffer.getvalue()
+
+
+def read_manifest(archive) -> dict:
+    """
+    Return the manifest of an open snapshot zip, raising SnapshotError for other files
+    and for versions this app cannot open
+    """
+    try:
+        manifest = json.loads(archive.read('manifest.json'))
+    except (KeyError, ValueError):
+        raise SnapshotError("Not an analysis snapshot") from None
+    if not isinstance(manifest, dict) or manifest.get('format') != SNAPSHOT_FORMAT:
+        raise SnapshotError("Not an analysis snapshot")
+
+    version = manifest.get('version')
+    if not isinstance(version, int) or version < 1:
+        raise SnapshotError("Snapshot has no valid version")
+    if version > SNAPSHOT_VERSION:
+        raise SnapshotError(f"Snapshot version {version} is newer than this app supports "
+                            f"({SNAPSHOT_VERSION}), update the app to open it")
+    for old in range(version, SNAPSHOT_VERSION):
+        if old not in MIGRATIONS:
+            raise SnapshotError(f"Snapshot version {version} is no longer supported, analyze the chat again")
+    return manifest
+
+
+def import_snapshot(source, max_bytes=SNAPSHOT_MAX_BYTES) -> dict:
+    """
+    Return the analysis results stored in a snapshot (bytes or a binary file),
+    migrated to the current version. Raises SnapshotError when it cannot be opened
+    """
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+    except zipfile.BadZipFile:
+        raise SnapshotError("Not an analysis snapshot") from None
+
+    with archive:
+        manifest = read_manifest(archive)
+        if sum(info.file_size for info in archive.infolist()) > max_bytes:
+            raise SnapshotError(f"Snapshot is larger than {max_bytes // (1024 * 1024)} MB unpacked")
+        try:
+            results = _decode(json.loads(archive.read('results.json')), archive)
+        except (KeyError, ValueError, zipfile.BadZipFile) as e:
+            raise SnapshotError(f"Snapshot is damaged: {e}") from None
+
+    for version in range(manifest['version'], SNAPSHOT_VERSION):
+        results = MIGRATIONS[version](results)
+    results['fingerprint'] = manifest.get('fingerprint') or results.get('fingerprint')
+    return results
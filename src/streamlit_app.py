@@ -3,23 +3,14 @@ Streamlit web interface
 """
 
 import streamlit as st
+import time
 import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from types import MappingProxyType
 
-# Import modules
-from analyzer import analyze_chat
-from visualizer import (
-    get_fig_messages_by_hour,
-    get_fig_messages_per_user,
-    get_fig_avg_message_length,
-    get_fig_laughs_per_user,
-    get_fig_most_common_words,
-    get_fig_messages_pie_chart,
-    get_fig_response_time_per_user,
-    get_fig_emoji_per_user,
-    get_fig_most_common_emojis,
-    get_fig_message_bursts,
-    get_fig_conversation_starters
-)
+# Import modules. The analyzer runs in worker processes and the visualizer (Plotly)
+# loads with the first figure, so the landing page only needs Streamlit
 from ui_components import (
     load_css,
     render_header,
@@ -29,9 +20,38 @@ from ui_components import (
     render_user_analysis_tab,
     render_time_analysis_tab,
     render_words_emojis_tab,
-    render_landing_page
+    render_landing_page,
+    render_debug_panel,
+    render_snapshot_export,
+    prebuild_figures
 )
-from file_utils import load_chat_data, validate_chat_data
+import os
+from file_utils import read_chat_bytes, get_upload_digest, spool_upload
+from analysis_executor import (AnalysisExecutor, ExecutorBusyError, JobFailedError, ChatTooLargeError,
+                               analyze_chat_upload)
+from figure_cache import FigureCache
+from instrumentation import configure_logging, pipeline_run
+from cache_utils import AnalysisCache, BoundedCache, content_digest, params_digest, ANALYSIS_CACHE_DIR_ENV
+
+# Memory budget for rendered word cloud images, shared by all sessions
+WORD_CLOUD_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# How often a waiting session polls its analysis job
+ANALYSIS_POLL_SECONDS = 0.25
+
+# Rough analysis throughput, only used to pace the progress bar
+ANALYSIS_BYTES_PER_SECOND = 1024 * 1024
+
+# Dashboard sections, one tab each
+ANALYSIS_SECTIONS = ["Chat Analysis", "User Analysis", "Time Patterns", "Words & Emojis"]
+
+# A results key that is present once each stage has finished
+STAGE_RESULT_KEYS = {
+    'response times': 'avg_response_time_per_user',
+    'emojis': 'most_common_emojis',
+    'words': 'word_vocabulary',
+    'user profiles': 'all_users_data',
+}
 
 
 def configure_page():
@@ -46,70 +66,338 @@ def configure_page():
     )
 
 
-def get_visualizer_functions():
+@st.cache_resource
+def get_figure_cache():
+    """
+    Return the process-wide figure cache, shared by all sessions
+    """
+    return FigureCache()
+
+
+@st.cache_resource
+def get_word_cloud_cache():
+    """
+    Return the process-wide cache of rendered word cloud images
+    """
+    return BoundedCache(WORD_CLOUD_CACHE_MAX_BYTES)
+
+
+@st.cache_resource
+def get_pending_word_clouds():
+    """
+    Return the word cloud renders in flight, so a repeated request joins the running one
     """
-    Return dictionary of visualizer functions for easy passing
+    return {}
+
+
+@st.cache_resource
+def get_render_executor():
     """
-    return {
-        'by_hour': get_fig_messages_by_hour,
-        'per_user': get_fig_messages_per_user,
-        'avg_length': get_fig_avg_message_length,
-        'laughs': get_fig_laughs_per_user,
-        'common_words': get_fig_most_common_words,
-        'pie_chart': get_fig_messages_pie_chart,
-        'response_time': get_fig_response_time_per_user,
-        'emoji_per_user': get_fig_emoji_per_user,
-        'most_common_emojis': get_fig_most_common_emojis,
-        'message_bursts': get_fig_message_bursts,
-        'conversation_starters': get_fig_conversation_starters
+    Return the background threads that render images off the script thread
+    """
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="render")
+
+
+def request_word_cloud(fingerprint, user, word_frequencies, **params) -> Future:
+    """
+    Return a future of the word cloud PNG, cached by (chat fingerprint, user, parameters).
+    Rendering takes seconds, so it runs on a background thread while the page keeps rendering
+    """
+    cache = get_word_cloud_cache()
+    pending = get_pending_word_clouds()
+    key = (fingerprint, user, params_digest(**params))
+
+    png = cache.get(key)
+    if png is not None:
+        future = Future()
+        future.set_result(png)
+        return future
+    if key in pending:
+        return pending[key]
+
+    def render():
+        from visualizer import render_word_cloud
+        png = render_word_cloud(word_frequencies, **params)
+        cache.put(key, png, len(png))
+        return png
+
+    future = get_render_executor().submit(render)
+    pending[key] = future
+    future.add_done_callback(lambda _: pending.pop(key, None))
+    return future
+
+
+def get_visualizer_functions(fingerprint=None, figure_cache=None):
+    """
+    Return dictionary of visualizer functions for easy passing.
+    With an analysis fingerprint, every function goes through the figure cache
+    (the shared one unless another is given)
+    """
+    import visualizer
+
+    funcs = {
+        'by_hour': visualizer.get_fig_messages_by_hour,
+        'activity_timeline': visualizer.get_fig_activity_timeline,
+        'activity_heatmap': visualizer.get_fig_activity_heatmap,
+        'per_user': visualizer.get_fig_messages_per_user,
+        'avg_length': visualizer.get_fig_avg_message_length,
+        'laughs': visualizer.get_fig_laughs_per_user,
+        'common_words': visualizer.get_fig_most_common_words,
+        'common_phrases': visualizer.get_fig_most_common_phrases,
+        'pie_chart': visualizer.get_fig_messages_pie_chart,
+        'response_time': visualizer.get_fig_response_time_per_user,
+        'emoji_per_user': visualizer.get_fig_emoji_per_user,
+        'most_common_emojis': visualizer.get_fig_most_common_emojis,
+        'message_bursts': visualizer.get_fig_message_bursts,
+        'conversation_starters': visualizer.get_fig_conversation_starters,
+        'term_timeline': visualizer.get_fig_term_timeline
     }
+    if fingerprint is None:
+        return funcs
 
+    figure_cache = figure_cache or get_figure_cache()
+    cached_funcs = {name: partial(figure_cache.get_or_build, func, fingerprint) for name, func in funcs.items()}
+    cached_funcs['word_cloud'] = partial(request_word_cloud, fingerprint)
+    return cached_funcs
 
-def process_chat_analysis(df):
+
+@st.cache_resource
+def get_analysis_cache():
     """
-    Process chat data and return analysis results with session state caching
+    Return the process-wide analysis cache, shared by all sessions.
+    Persisted on disk when the cache dir env var is set
     """
-    # Create a hash of the DataFrame for caching, so we can avoid re-analysis
-    # The hash is based on the DataFrame's shape and a string representation of its first and last 5 rows
-    df_hash = hash(str(df.shape) + str(df.head().to_string()) + str(df.tail().to_string()))
+    return AnalysisCache(cache_dir=os.environ.get(ANALYSIS_CACHE_DIR_ENV))
 
-    # Check if we already have this analysis cached, if not we will compute it
-    # and store it in the cache - with a dict
-    if 'analysis_cache' not in st.session_state:
-        st.session_state.analysis_cache = {}
-    
-    if df_hash in st.session_state.analysis_cache:
-        return st.session_state.analysis_cache[df_hash]
-    
-    # Show spinner while analyzing
-    with st.spinner("📊 Analyzing chat data..."):
-        results = analyze_chat(df)
-        # Cache the results
-        st.session_state.analysis_cache[df_hash] = results
-        return results
+
+@st.cache_resource
+def get_analysis_executor():
+    """
+    Return the process-wide analysis pool, shared by all sessions.
+    Workers start loading the analysis modules right away, in the background
+    """
+    executor = AnalysisExecutor()
+    executor.warm_up(block=False)
+    return executor
 
 
-def render_analysis_tabs(results):
+@st.cache_resource
+def get_sample_figure_cache():
+    """
+    Return the figure cache of the sample chat, apart from the shared one so uploads never evict it
+    """
+    return FigureCache()
+
+
+def warm_sample_analysis(executor, visualizer_funcs_for):
+    """
+    Analyze the sample chat on the pool and build all its default figures.
+    Returns the results as a read-only mapping, None without the sample file.
+    Runs once per server process, on a render thread, waiting for a free slot when
+    the pool is busy with uploads
+    """
+    data = read_chat_bytes(None, use_sample=True)
+    if data is None:
+        return None
+    fingerprint = content_digest(data)
+    while True:
+        try:
+            executor.submit(fingerprint, data)
+            break
+        except ExecutorBusyError:
+            time.sleep(ANALYSIS_POLL_SECONDS)
+    while executor.status(fingerprint)['state'] in ('queued', 'running'):
+        time.sleep(ANALYSIS_POLL_SECONDS)
+    results = executor.result(fingerprint)
+    results['fingerprint'] = fingerprint
+    with pipeline_run('prebuild_figures', chat='sample'):
+        prebuild_figures(results, visualizer_funcs_for(fingerprint))
+    return MappingProxyType(results)
+
+
+@st.cache_resource
+def get_sample_analysis() -> Future:
+    """
+    Return a future of the sample chat analysis, shared read-only by all sessions.
+    Started by the first page load of the server process, so by the time anyone clicks
+    "Use Sample Data" it is ready and costs no CPU per visitor
+    """
+    figure_cache = get_sample_figure_cache()
+    return get_render_executor().submit(warm_sample_analysis, get_analysis_executor(),
+                                        partial(get_visualizer_functions, figure_cache=figure_cache))
+
+
+def submit_chat_analysis(executor, uploaded_file, content_hash):
+    """
+    Queue the analysis of the upload unless this or another session already did.
+    The upload is spooled to a temp file the worker streams from
+    """
+    # Reruns while the job runs, and other sessions with the same chat, join it without a copy
+    if executor.status(content_hash)['state'] in ('queued', 'running', 'done'):
+        return
+    executor.check_size(uploaded_file.size)
+    path = spool_upload(uploaded_file)
+    try:
+        joined = not executor.submit(content_hash, path, fn=analyze_chat_upload, size=uploaded_file.size)
+    except BaseException:
+        os.remove(path)
+        raise
+    if joined:
+        os.remove(path)
+
+
+def process_chat_analysis(uploaded_file, content_hash):
+    """
+    Analyze the upload on the shared process pool and return (results so far, finished).
+    Waits with a progress bar, driven by the bytes parsed so far, until the basic stats are in;
+    the other stages fill in on later reruns. Finished results are cached under the digest
+    of the raw chat bytes. Returns (None, True) (after showing why) when the chat is refused,
+    not admitted or fails
+    """
+    executor = get_analysis_executor()
+    try:
+        submit_chat_analysis(executor, uploaded_file, content_hash)
+    except ChatTooLargeError as e:
+        st.error(f"❌ {e}")
+        return None, True
+    except ExecutorBusyError as e:
+        st.warning(f"⏳ {e}")
+        return None, True
+
+    # Without parse progress yet, the bar approaches (but never reaches) 100% around the expected duration
+    expected_seconds = max(uploaded_file.size / ANALYSIS_BYTES_PER_SECOND, 1.0)
+    status = executor.status(content_hash)
+    if status['state'] in ('queued', 'running') and 'basic' not in status['stages']:
+        progress = st.progress(0.0, text="📊 Analyzing chat data...")
+        while status['state'] in ('queued', 'running') and 'basic' not in status['stages']:
+            value = min(status['elapsed'] / (status['elapsed'] + expected_seconds), 0.99)
+            if status['state'] == 'queued':
+                text = f"⏳ Waiting for a free worker (#{status['queue_position']} in line)..."
+            elif status['progress'] is None:
+                text = f"📊 Reading chat... {status['elapsed']:.0f}s"
+            elif status['progress'][0] < status['progress'][1]:
+                bytes_read, total_bytes = status['progress']
+                # Parsing is most of the wait before the basic stats
+                value = 0.9 * bytes_read / total_bytes
+                text = f"📖 Reading chat... {bytes_read / 1024 / 1024:.0f} of {total_bytes / 1024 / 1024:.0f} MB"
+            else:
+                value = 0.95
+                text = "📊 Counting messages..."
+            progress.progress(value, text=text)
+            time.sleep(ANALYSIS_POLL_SECONDS)
+            status = executor.status(content_hash)
+        progress.empty()
+
+    if status['state'] in ('queued', 'running'):
+        # Figures of the finished stages are cached already, keyed by their data
+        results = executor.partial_results(content_hash)
+        results['fingerprint'] = content_hash
+        return results, False
+
+    try:
+        results = executor.result(content_hash)
+    except JobFailedError as e:
+        st.error(f"❌ {e}")
+        return None, True
+
+    if not results:
+        st.error("❌ No messages found in the chat file!")
+        return None, True
+
+    # The fingerprint keys the figures built from these results
+    results['fingerprint'] = content_hash
+    get_analysis_cache().put(content_hash, results)
+    return results, True
+
+
+def load_sample_analysis():
+    """
+    Return the shared sample analysis, waiting if it is still being prepared.
+    A failed preparation is dropped and started over once. Returns None (after showing why)
+    when the sample is missing or its analysis failed again
+    """
+    for _ in range(2):
+        sample = get_sample_analysis()
+        try:
+            if sample.done():
+                results = sample.result()
+            else:
+                with st.spinner("📊 Preparing sample data..."):
+                    results = sample.result()
+            break
+        except Exception as e:
+            # Never keep a failed future: the retry, or the next visit, prepares the sample anew
+            get_sample_analysis.clear()
+            error = e
+    else:
+        st.error(f"❌ Could not prepare the sample data: {error}")
+        return None
+
+    if results is None:
+        st.error("❌ Sample file not found!")
+        return None
+    st.sidebar.success("✅ Sample data loaded!")
+    return results
+
+
+def is_snapshot_upload(uploaded_file):
+    """
+    Whether the upload is an analysis snapshot rather than a chat export
+    """
+    from snapshot import SNAPSHOT_EXTENSION
+
+    return uploaded_file.name.lower().endswith(SNAPSHOT_EXTENSION)
+
+
+def load_snapshot_upload(uploaded_file):
+    """
+    Open an uploaded analysis snapshot, no parsing or analysis. Opened snapshots are kept in
+    the analysis cache under the digest of the file. Returns None (after showing why)
+    when the file cannot be opened
+    """
+    from snapshot import import_snapshot, SnapshotError
+
+    digest = get_upload_digest(uploaded_file, use_sample=False)
+    results = get_analysis_cache().get(digest)
+    if results is None:
+        uploaded_file.seek(0)
+        try:
+            results = import_snapshot(uploaded_file)
+        except SnapshotError as e:
+            st.error(f"❌ {e}")
+            return None
+        # Figures are cached by fingerprint: the manifest's could belong to another chat
+        results['fingerprint'] = digest
+        get_analysis_cache().put(digest, results)
+    st.sidebar.success(f"✅ Opened snapshot {uploaded_file.name}")
+    return results
+
+
+def render_analysis_progress(results):
+    """
+    Show which analysis stages are still running
+    """
+    pending = [stage for stage, key in STAGE_RESULT_KEYS.items() if key not in results]
+    st.sidebar.info(f"⏳ Still analyzing: {', '.join(pending)}")
+
+
+def render_analysis_tabs(results, figure_cache=None):
     """
     Render the main analysis tabs
     """
-    # Get visualizer functions
-    visualizer_funcs = get_visualizer_functions()
+    # Get visualizer functions, cached per analysis
+    visualizer_funcs = get_visualizer_functions(results.get('fingerprint'), figure_cache)
 
-    # Create tabs for different analysis sections
-    tab1, tab2, tab3, tab4 = st.tabs(["Chat Analysis", "User Analysis", "Time Patterns", "Words & Emojis"])
-    
-    with tab1:
-        render_chat_analysis_tab(results, visualizer_funcs)
-    
-    with tab2:
-        render_user_analysis_tab(results, visualizer_funcs)
-    
-    with tab3:
-        render_time_analysis_tab(results, visualizer_funcs)
-    
-    with tab4:
-        render_words_emojis_tab(results, visualizer_funcs)
+    # Create tabs for different analysis sections. Tab changes rerun the page and only
+    # the open tab is rendered, so hidden tabs build and send no figures
+    tabs = st.tabs(ANALYSIS_SECTIONS, key="active_section", on_change="rerun")
+    renderers = (render_chat_analysis_tab, render_user_analysis_tab, render_time_analysis_tab,
+                 render_words_emojis_tab)
+
+    for tab, render_tab in zip(tabs, renderers):
+        if tab.open:
+            with tab:
+                render_tab(results, visualizer_funcs)
 
 
 def handle_error(error):
@@ -127,6 +415,7 @@ def main():
     """
     # Configure page
     configure_page()
+    configure_logging()
     
     # Load CSS and render header
     load_css()
@@ -134,34 +423,63 @@ def main():
     
     # Render sidebar and get user inputs
     uploaded_file, use_sample = render_sidebar()
+
+    # The first page load of the server process starts preparing the sample in the background
+    get_sample_analysis()
     
     # Process file if uploaded or sample requested
     if uploaded_file is not None or use_sample:
         try:
-            # Load chat data
-            df, success_msg, error_msg = load_chat_data(uploaded_file, use_sample)
-            
-            if error_msg:
-                st.error(error_msg)
-                return
-            
-            if success_msg:
-                st.sidebar.success(success_msg)
-            
-            # Validate data
-            is_valid, validation_error = validate_chat_data(df)
-            if not is_valid:
-                st.error(validation_error)
-                return
-            
-            # Analyze chat data
-            results = process_chat_analysis(df)
-            
-            # Display metrics
-            render_metrics(results['basic_stats'])
+            figure_cache = get_figure_cache()
+            finished = True
+            if use_sample:
+                # Analyzed once per server process, shared by every visitor
+                results = load_sample_analysis()
+                if results is None:
+                    return
+                figure_cache = get_sample_figure_cache()
+            elif is_snapshot_upload(uploaded_file):
+                results = load_snapshot_upload(uploaded_file)
+                if results is None:
+                    return
+            else:
+                # Same chat content analyzed before (by any session) skips parsing and analysis.
+                # The digest itself is computed once per upload, not on every rerun
+                content_hash = get_upload_digest(uploaded_file, use_sample)
+                results = get_analysis_cache().get(content_hash)
+
+                if results is not None:
+                    st.sidebar.success(f"✅ Loaded {uploaded_file.name} from cache")
+                else:
+                    # Parsing and analysis run on the shared process pool
+                    results, finished = process_chat_analysis(uploaded_file, content_hash)
+                    if results is None:
+                        return
+                    if finished:
+                        st.sidebar.success(f"✅ Uploaded {uploaded_file.name}")
+                    else:
+                        render_analysis_progress(results)
             
-            # Render analysis tabs
-            render_analysis_tabs(results)
+            # Figure building of this render is timed for the debug panel
+            with pipeline_run('render_page', section=st.session_state.get('active_section')) as render_run:
+                # Display metrics
+                render_metrics(results['basic_stats'])
+
+                # Render analysis tabs
+                render_analysis_tabs(results, figure_cache)
+
+                if finished:
+                    name = "sample" if use_sample else os.path.splitext(uploaded_file.name)[0]
+                    render_snapshot_export(results, name)
+
+            # Cache counters and stage timings, for debugging reruns and slow chats
+            render_debug_panel(figure_cache.stats(), get_analysis_cache().stats(),
+                               get_analysis_executor().stats(), results.get('timings'), render_run.as_dict())
+
+            # Rerun to pick up the stages that finish in the background
+            if not finished:
+                time.sleep(ANALYSIS_POLL_SECONDS)
+                st.rerun()
             
         except Exception as e:
             handle_error(e)
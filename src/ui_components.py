@@ -3,6 +3,14 @@ UI Components for the streanlit app
 """
 
 import streamlit as st
+from datetime import timedelta
+from functools import partial
+
+# Results are read with analyzer helpers, imported in the sections that use them
+# so the landing page loads without pandas
+
+# A word cloud still rendering is checked this often
+WORD_CLOUD_POLL_SECONDS = 0.5
 
 
 def load_css():
@@ -45,11 +53,15 @@ def render_sidebar():
     
     uploaded_file = st.sidebar.file_uploader(
         "Choose a WhatsApp chat .txt file",
-        type=['txt'],
-        help="Export your WhatsApp chat and upload the .txt file here"
+        type=['txt', 'zip'],
+        help="Export your WhatsApp chat and upload the .txt file here, "
+             "or open an analysis snapshot (.zip) exported before"
     )
     
-    use_sample = st.sidebar.button("🧪 Use Sample Data", help="Try the app with sample data")
+    # Remembered in the session, so later reruns keep showing the sample until a file is uploaded
+    if st.sidebar.button("🧪 Use Sample Data", help="Try the app with sample data"):
+        st.session_state["use_sample"] = True
+    use_sample = uploaded_file is None and st.session_state.get("use_sample", False)
     
     return uploaded_file, use_sample
 
@@ -73,6 +85,13 @@ def render_metrics(stats):
     st.markdown("<br>", unsafe_allow_html=True)
 
 
+def render_pending(section):
+    """
+    Placeholder for a section whose analysis stage is still running in the background
+    """
+    st.info(f"⏳ Still analyzing {section}...")
+
+
 def render_chat_analysis_tab(results, visualizer_funcs):
     """
     Render the Chat Analysis tab content (formerly User Analysis)
@@ -94,8 +113,11 @@ def render_chat_analysis_tab(results, visualizer_funcs):
     
     with col2:
         st.markdown("#### ⏱️ Response Time per User")  
-        fig = visualizer_funcs['response_time'](results['avg_response_time_per_user'])
-        st.plotly_chart(fig, use_container_width=True)
+        if 'avg_response_time_per_user' in results:
+            fig = visualizer_funcs['response_time'](results['avg_response_time_per_user'])
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            render_pending("response times")
 
         st.markdown("#### 📏 Average Message Length")
         fig = visualizer_funcs['avg_length'](results['avg_message_length'])
@@ -125,11 +147,16 @@ def render_chat_analysis_tab(results, visualizer_funcs):
         - **Daily Average:** {results['basic_stats']['messages_per_day']:.1f} messages/day
         """)
 
+@st.fragment
 def render_user_analysis_tab(results, visualizer_funcs):
     """
-    Render the Individual User Analysis tab with user selector
+    Render the Individual User Analysis tab with user selector.
+    A fragment: changing the user reruns only this tab
     """
     st.markdown("#### 👤 Select User for Individual Analysis")
+    if 'all_users_data' not in results:
+        render_pending("user profiles")
+        return
     
     # User selector
     users = list(results['messages_per_user'].keys())
@@ -177,6 +204,11 @@ def render_user_analysis_tab(results, visualizer_funcs):
             else:
                 st.info("This user hasn't used any emojis yet!")
         
+        if user_data.get('weekday_hour_activity') is not None:
+            st.markdown("##### 🗓️ Activity by Weekday and Hour")
+            fig = visualizer_funcs['activity_heatmap'](user_data['weekday_hour_activity'])
+            st.plotly_chart(fig, use_container_width=True)
+
         # User insights
         with st.expander("🔍 User Insights"):
             # Calculate user's share of conversation
@@ -186,12 +218,23 @@ def render_user_analysis_tab(results, visualizer_funcs):
             # Find user's most active hour from pre-calculated data
             hourly_data = user_data['hourly_activity']
             most_active_hour = max(hourly_data.keys(), key=lambda k: hourly_data[k]) if hourly_data else "N/A"
+
+            # Top reply partner from the pre-calculated reply graph
+            partners = user_data.get('top_reply_partners', [])
+            top_partner = f"{partners[0][0]} ({partners[0][1]:,} replies)" if partners else "N/A"
+            percentiles = user_data.get('response_time_percentiles', {})
+            response_spread = f"{percentiles['median']} (p90 {percentiles['p90']})" if percentiles else "N/A"
+            phrases = user_data.get('top_phrases', [])
+            favorite_phrases = ", ".join(f'"{phrase}"' for phrase, _ in phrases[:3]) if phrases else "N/A"
             
             st.markdown(f"""
             **{selected_user}'s Chat Profile:**
             - **Contribution:** {user_percentage:.1f}% of all messages
             - **Most Active Hour:** {most_active_hour}:00
             - **Average Response Time:** {user_data['response_time']}
+            - **Median Response Time:** {response_spread}
+            - **Replies Most To:** {top_partner}
+            - **Favorite Phrases:** {favorite_phrases}
             - **Communication Style:** {"Emoji-heavy" if user_data['emoji_count'] > user_data['total_messages'] * 0.05 else "Text-focused"}
             """)
 
@@ -199,10 +242,22 @@ def render_words_emojis_tab(results, visualizer_funcs):
     """
     Render the Words & Emojis tab content (formerly Word Analysis)
     """
+    words_ready = 'word_vocabulary' in results
+    emojis_ready = 'most_common_emojis' in results
+
+    # The word cloud sits at the top of the tab but is filled in last. Rendering starts now
+    # with the current settings and runs in the background while the charts below render
+    cloud_container = st.container()
+    if words_ready:
+        request_user_word_cloud(results, visualizer_funcs, st.session_state.get("word_cloud_user", "Everyone"),
+                                st.session_state.get("word_cloud_top_n", 100))
+
     col1, col2 = st.columns(2)
     
     with col1:
-        if results['most_common_words']:
+        if not words_ready:
+            render_pending("words")
+        elif results['most_common_words']:
             st.markdown("#### 🔤 Most Common Words")
             fig = visualizer_funcs['common_words'](results['most_common_words'])
             st.plotly_chart(fig, use_container_width=True)
@@ -210,20 +265,152 @@ def render_words_emojis_tab(results, visualizer_funcs):
             st.info("No common words found in the analysis")
     
     with col2:
-        if results['most_common_emojis']:
+        if not emojis_ready:
+            render_pending("emojis")
+        elif results['most_common_emojis']:
             st.markdown("#### 😊 Most Common Emojis")
             fig = visualizer_funcs['most_common_emojis'](results['most_common_emojis'])
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.info("No emojis found in the chat")
     
+    col3, col4 = st.columns(2)
+
+    with col3:
+        if not words_ready:
+            render_pending("phrases")
+        elif results['most_common_bigrams']:
+            st.markdown("#### 💬 Most Common Phrases")
+            fig = visualizer_funcs['common_phrases'](results['most_common_bigrams'])
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.info("No common phrases found in the analysis")
+
+    with col4:
+        if not words_ready:
+            render_pending("phrases")
+        elif results['most_common_trigrams']:
+            st.markdown("#### 🗨️ Most Common 3-Word Phrases")
+            fig = visualizer_funcs['common_phrases'](results['most_common_trigrams'])
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.info("No common 3-word phrases found in the analysis")
+
     st.markdown("#### 😊 Emoji Usage per User")
-    if results['emoji_per_user']:
+    if not emojis_ready:
+        render_pending("emojis")
+    elif results['emoji_per_user']:
         fig = visualizer_funcs['emoji_per_user'](results['emoji_per_user'])
         st.plotly_chart(fig, use_container_width=True)
     else:
         st.info("No emoji usage data available")
 
+    if words_ready and 'search_index' in results:
+        render_search_section(results, visualizer_funcs)
+    elif words_ready:
+        st.info("🔎 Search is not available, this snapshot was exported without the search index")
+
+    with cloud_container:
+        if words_ready:
+            render_word_cloud_section(results, visualizer_funcs)
+        else:
+            st.markdown("#### ☁️ Word Cloud")
+            render_pending("words")
+
+
+def request_user_word_cloud(results, visualizer_funcs, user, top_n):
+    """
+    Request the word cloud of one user (or "Everyone"), returns a future of the PNG
+    or None when there are no words
+    """
+    if user == "Everyone":
+        frequencies = results['word_vocabulary']
+    elif 'all_users_data' in results and user in results['all_users_data']:
+        frequencies = results['all_users_data'][user].get('word_vocabulary', [])
+    else:
+        frequencies = []
+
+    if not frequencies or 'word_cloud' not in visualizer_funcs:
+        return None
+    return visualizer_funcs['word_cloud'](user, frequencies, top_n=top_n)
+
+
+@st.fragment
+def render_word_cloud_section(results, visualizer_funcs):
+    """
+    Render the word cloud controls and image.
+    A fragment: changing the settings reruns only this section
+    """
+    st.markdown("#### ☁️ Word Cloud")
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        # Per-user vocabularies come with the user profiles, the last stage
+        users = list(results['messages_per_user'].keys()) if 'all_users_data' in results else []
+        user = st.selectbox("Words of:", ["Everyone"] + users, key="word_cloud_user")
+    with col2:
+        top_n = st.slider("Number of words:", 20, 200, 100, step=10, key="word_cloud_top_n")
+
+    placeholder = st.empty()
+    cloud = request_user_word_cloud(results, visualizer_funcs, user, top_n)
+    if cloud is None:
+        placeholder.info("No words found for a word cloud")
+        return
+
+    if cloud.done():
+        placeholder.image(cloud.result(), use_container_width=True)
+    else:
+        with placeholder.container():
+            render_pending_word_cloud(cloud)
+
+
+@st.fragment(run_every=WORD_CLOUD_POLL_SECONDS)
+def render_pending_word_cloud(cloud):
+    """
+    Poll a word cloud still rendering, without holding the script thread on it.
+    Once it is done, rerun the app to draw it, which also stops the polling
+    """
+    if not cloud.done():
+        st.info("☁️ Rendering word cloud...")
+        return
+    st.rerun(scope="app")
+
+
+@st.fragment
+def render_search_section(results, visualizer_funcs):
+    """
+    Render the keyword search over the pre-built search index.
+    A fragment: a new query reruns only this section
+    """
+    st.markdown("#### 🔎 Search the Chat")
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        query = st.text_input("How often did anyone say...", key="search_query")
+    with col2:
+        prefix = st.checkbox("Match word prefixes", key="search_prefix")
+
+    if not query:
+        return
+
+    from analyzer import search_messages, search_term_per_user, search_term_timeline
+
+    # All lookups run on the index built during analysis, no message scanning
+    search_index = results['search_index']
+    matches = len(search_messages(search_index, query, prefix))
+    if matches == 0:
+        st.info(f"No messages found for '{query}'")
+        return
+
+    st.metric("💬 Matching Messages", f"{matches:,}")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("##### 📅 Over Time")
+        fig = visualizer_funcs['term_timeline'](search_term_timeline(search_index, query, prefix))
+        st.plotly_chart(fig, use_container_width=True)
+    with col2:
+        st.markdown("##### 👥 By User")
+        fig = visualizer_funcs['per_user'](search_term_per_user(search_index, query, prefix))
+        st.plotly_chart(fig, use_container_width=True)
+
 
 def render_time_analysis_tab(results, visualizer_funcs):
     """
@@ -233,12 +420,197 @@ def render_time_analysis_tab(results, visualizer_funcs):
     fig = visualizer_funcs['by_hour'](results['messages_by_hour'])
     st.plotly_chart(fig, use_container_width=True)
     
+    st.markdown("#### 🗓️ Activity by Weekday and Hour")
+    fig = visualizer_funcs['activity_heatmap'](results['activity_heatmap']['counts'].sum(axis=0))
+    st.plotly_chart(fig, use_container_width=True)
+
     # Show top active hours
     hours_sorted = sorted(results['messages_by_hour'].items(), key=lambda x: x[1], reverse=True)
     st.markdown("#### 🔥 Most Active Hours")
     for i, (hour, count) in enumerate(hours_sorted[:5]):
         st.markdown(f"**{i+1}.** {hour:02d}:00 - {count:,} messages")
 
+    render_activity_timeline(results, visualizer_funcs)
+
+
+def build_timeline_figure(timeline, visualizer_funcs, start, end, user=None, resolution="Day (7-day average)"):
+    """
+    Build the messages-over-time figure for a range, user and resolution, return (figure, counts)
+    """
+    from analyzer import timeline_daily_counts, timeline_rolling_average, timeline_rollup
+
+    # Every slice below is a lookup on the cumulative arrays, no message scanning
+    if resolution.startswith("Day"):
+        counts = timeline_daily_counts(timeline, start, end, user)
+        rolling = timeline_rolling_average(timeline, 30 if "30" in resolution else 7, start, end, user)
+        return visualizer_funcs['activity_timeline'](counts.to_dict(), rolling.to_dict()), counts
+    counts = timeline_rollup(timeline, 'W' if resolution == "Week" else 'M', start, end, user)
+    return visualizer_funcs['activity_timeline'](counts.to_dict()), counts
+
+
+@st.fragment
+def render_activity_timeline(results, visualizer_funcs):
+    """
+    Render the messages-over-time chart, sliced from the pre-calculated cumulative timeline.
+    A fragment: changing the range, user or resolution reruns only this chart
+    """
+    from analyzer import timeline_range_total
+    from visualizer import is_downsampled
+
+    st.markdown("#### 📈 Activity Over Time")
+    timeline = results['activity_timeline']
+    first_day = timeline['start'].astype(object)
+    last_day = (timeline['start'] + len(timeline['total_cumulative']) - 2).astype(object)
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        date_range = st.date_input("Date range:", (first_day, last_day),
+                                   min_value=first_day, max_value=last_day, key="timeline_range")
+    with col2:
+        user = st.selectbox("User:", ["Everyone"] + timeline['users'], key="timeline_user")
+    with col3:
+        resolution = st.selectbox("Resolution:", ["Day (7-day average)", "Day (30-day average)", "Week", "Month"],
+                                  key="timeline_resolution")
+
+    # The date input returns a single date while the user is still picking the range
+    start, end = (date_range[0], date_range[-1]) if date_range else (first_day, last_day)
+    user = None if user == "Everyone" else user
+
+    fig, counts = build_timeline_figure(timeline, visualizer_funcs, start, end, user, resolution)
+    st.plotly_chart(fig, use_container_width=True)
+    if is_downsampled(len(counts)):
+        st.caption("📉 Long range shown downsampled, narrow the date range to see every day")
+
+    total = timeline_range_total(timeline, start, end, user)
+    days = max((end - start).days + 1, 1)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("💬 Messages in Range", f"{total:,}")
+    with col2:
+        st.metric("📊 Daily Average in Range", f"{total / days:.1f}")
+    with col3:
+        last_30 = timeline_range_total(timeline, end - timedelta(days=29), end, user)
+        st.metric("📅 Last 30 Days of Range", f"{last_30:,}")
+
+
+def prebuild_figures(results, visualizer_funcs):
+    """
+    Build every figure the tabs show with their default settings (all users, the whole
+    timeline), so a later visit finds them all in the figure cache. Keep in step with the
+    tab renderers: tests/test_ui_components.py renders every tab and fails on a cache miss
+    """
+    from collections import Counter
+
+    figures = [
+        ('pie_chart', results['messages_per_user']), ('per_user', results['messages_per_user']),
+        ('message_bursts', results['message_bursts']), ('response_time', results['avg_response_time_per_user']),
+        ('avg_length', results['avg_message_length']), ('conversation_starters', results['conversation_starters']),
+        ('laughs', results['laughs_per_user']), ('by_hour', results['messages_by_hour']),
+        ('activity_heatmap', results['activity_heatmap']['counts'].sum(axis=0)),
+    ]
+    # Word and emoji charts are only shown when there is data
+    for name, key in (('common_words', 'most_common_words'), ('most_common_emojis', 'most_common_emojis'),
+                      ('common_phrases', 'most_common_bigrams'), ('common_phrases', 'most_common_trigrams'),
+                      ('emoji_per_user', 'emoji_per_user')):
+        if results[key]:
+            figures.append((name, results[key]))
+    for user_data in results['all_users_data'].values():
+        figures.append(('by_hour', user_data['hourly_activity']))
+        if user_data['emoji_count'] > 0:
+            figures.append(('most_common_emojis', Counter(user_data['user_emojis']).most_common(10)))
+        if user_data.get('weekday_hour_activity') is not None:
+            figures.append(('activity_heatmap', user_data['weekday_hour_activity']))
+
+    for name, data in figures:
+        visualizer_funcs[name](data)
+
+    timeline = results['activity_timeline']
+    first_day = timeline['start'].astype(object)
+    last_day = (timeline['start'] + len(timeline['total_cumulative']) - 2).astype(object)
+    build_timeline_figure(timeline, visualizer_funcs, first_day, last_day)
+    return len(figures) + 1
+
+
+def render_snapshot_export(results, name):
+    """
+    Render the snapshot download in the sidebar. The snapshot is built when the button is clicked
+    """
+    from snapshot import export_snapshot
+
+    st.sidebar.markdown("### 💾 Save Analysis")
+    include_indexes = st.sidebar.checkbox("Include search index", value=True, key="snapshot_indexes",
+                                          help="Keyword search needs it, leave it out for a smaller file")
+    st.sidebar.download_button(
+        "💾 Export Snapshot",
+        data=partial(export_snapshot, results, include_indexes),
+        file_name=f"{name}-analysis.zip",
+        mime="application/zip",
+        on_click="ignore",
+        help="Open the file here later to see this analysis again without re-analyzing the chat"
+    )
+
+
+def render_cache_stats(name, stats):
+    """
+    Render hit/miss counters and size of one cache
+    """
+    lookups = stats['hits'] + stats['misses']
+    hit_rate = stats['hits'] / lookups * 100 if lookups else 0.0
+    st.markdown(f"""
+    **{name}**
+    - **Hits:** {stats['hits']:,}
+    - **Misses:** {stats['misses']:,}
+    - **Hit Rate:** {hit_rate:.1f}%
+    - **Entries:** {stats['entries']:,}
+    - **Size:** {stats['bytes'] / 1024:,.1f} KB
+    """)
+
+
+def render_executor_stats(stats):
+    """
+    Render the load of the shared analysis pool
+    """
+    st.markdown(f"""
+    **Analysis Workers**
+    - **Running:** {stats['running']} / {stats['workers']}
+    - **Queued:** {stats['queued']}
+    - **Rejected:** {stats['rejected']:,}
+    """)
+
+
+def render_run_timings(name, timings, top=8):
+    """
+    Render the slowest stages (with their peak memory when traced) and the counters
+    of a pipeline run (see instrumentation)
+    """
+    stages = []
+    for stage, timing in list(timings['stages'].items())[:top]:
+        line = f"- **{stage}:** {timing['seconds']:.3f}s" + (f" ({timing['calls']} calls)" if timing['calls'] > 1 else "")
+        peak = timing.get('peak_bytes', timing.get('rss_peak_bytes'))
+        if peak is not None:
+            line += f", peak {peak / 1024 / 1024:,.1f} MB"
+        stages.append(line)
+    counters = [f"- {counter}: {value:,}" for counter, value in timings['counters'].items()]
+    st.markdown(f"**{name}** ({timings['seconds']:.2f}s)\n" + "\n".join(stages + counters))
+
+
+def render_debug_panel(figure_cache_stats, analysis_cache_stats, executor_stats=None,
+                       analysis_timings=None, page_timings=None):
+    """
+    Render the debug panel in the sidebar with cache and worker counters,
+    and the stage timings of the analysis and of this page render
+    """
+    with st.sidebar.expander("🐛 Debug Info"):
+        render_cache_stats("Figure Cache", figure_cache_stats)
+        render_cache_stats("Analysis Cache", analysis_cache_stats)
+        if executor_stats is not None:
+            render_executor_stats(executor_stats)
+        if analysis_timings:
+            render_run_timings("Analysis Timings", analysis_timings)
+        if page_timings:
+            render_run_timings("Page Render Timings", page_timings)
+
+
 def render_landing_page():
     """
     Render the landing page when no file is uploaded
@@ -2,9 +2,13 @@
 Visualization functions, as go.Figure graphs
 """
 
+import io
+import os
+import numpy as np
+import pandas as pd
 import plotly.graph_objects as go
-import plotly.express as px
-from hebrew_utils import fix_hebrew, fix_dict_keys
+from hebrew_utils import fix_labels
+from instrumentation import timed
 
 # Global constants - defined once, used everywhere
 COLORS = ['#54a0ff', '#4ecdc4', "#45bcd1", '#96ceb4', '#feca57', '#ff9ff3', "#54ebff", '#5f27cd']
@@ -33,6 +37,11 @@ TEXT_STYLE = {
     'weight': "bold"
 }
 
+# Long time series: above this many points traces switch to WebGL,
+# and they are downsampled to about one point per horizontal pixel before being sent
+WEBGL_POINT_THRESHOLD = 2000
+MAX_PLOT_POINTS = 1500
+
 # ----Helper functions:----
 # Standardized looking for the graphs
 
@@ -42,12 +51,10 @@ def create_axis_title(text):
 
 def prepare_user_data(data_dict):
     """Standard user data preparation"""
-    # Fixing keys and Hebrew text using HebrewUtils
-    data = fix_dict_keys(data_dict)
-    users = list(data.keys())
-    values = list(data.values())
-    fixed_users = [fix_hebrew(user) for user in users]
-    return fixed_users, values
+    # Labels stay in logical order: the browser lays out Hebrew (bidi) text in Plotly itself
+    users = list(data_dict.keys())
+    values = list(data_dict.values())
+    return users, values
 
 def create_bar_chart(x_data, y_data, colors=None, text_data=None, hover_template="", orientation='v'):
     """Create standardized bar chart"""
@@ -75,6 +82,64 @@ def create_bar_chart(x_data, y_data, colors=None, text_data=None, hover_template
             hovertemplate=hover_template
         )
 
+def downsample_lttb(x, y, max_points):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+    Returns the indices of max_points samples that keep the visual shape of the series
+    (peaks and dips survive, unlike plain decimation)
+    """
+    n = len(y)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Bucket edges for the points between the fixed first and last samples
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    prev = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        # Average of the next bucket is the third corner of the triangle
+        next_end = max(edges[i + 2], end + 1) if i + 2 < len(edges) else n
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+
+        # Pick the point in this bucket with the largest triangle area
+        areas = np.abs((x[prev] - avg_x) * (y[start:end] - y[prev]) - (x[prev] - x[start:end]) * (avg_y - y[prev]))
+        prev = start + int(np.argmax(areas))
+        selected[i + 1] = prev
+
+    return selected
+
+def is_downsampled(points) -> bool:
+    """Whether create_time_series_trace downsamples a series of this many points"""
+    return points > WEBGL_POINT_THRESHOLD
+
+def create_time_series_trace(dates, values, name, color, hover_template, max_points=MAX_PLOT_POINTS, as_bars=True):
+    """
+    Create a trace for a time series.
+    Short series are plain SVG traces (bars or lines); long ones become a WebGL line,
+    downsampled with LTTB so the browser only receives about max_points points
+    """
+    if not is_downsampled(len(values)):
+        if as_bars:
+            return go.Bar(x=dates, y=values, name=name, marker={'color': color}, hovertemplate=hover_template)
+        return go.Scatter(x=dates, y=values, name=name, mode='lines', line={'color': color, 'width': 3},
+                          hovertemplate=hover_template)
+
+    times = pd.DatetimeIndex(dates)
+    keep = downsample_lttb(times.asi8, values, max_points)
+    return go.Scattergl(
+        x=times[keep], y=np.asarray(values)[keep],
+        name=name,
+        mode='lines',
+        line={'color': color, 'width': 2 if as_bars else 3},
+        fill='tozeroy' if as_bars else None,
+        hovertemplate=hover_template
+    )
+
 def create_standard_layout(x_title, y_title, **kwargs):
     """Create standardized layout"""
     layout = COMMON_LAYOUT.copy()
@@ -89,6 +154,7 @@ def create_standard_layout(x_title, y_title, **kwargs):
 # ----Visualization functions:----
 # Returns go.Figure for to the streamlit app
 
+@timed()
 def get_fig_messages_by_hour(messages_by_hour: dict) -> go.Figure:
     """Create a line chart showing messages by hour of the day"""
     hours = list(messages_by_hour.keys())
@@ -112,6 +178,54 @@ def get_fig_messages_by_hour(messages_by_hour: dict) -> go.Figure:
     fig.update_layout(create_standard_layout("Hour of Day", "Number of Messages", margin={'l': 60, 'r': 60, 't': 30, 'b': 60}))
     return fig
 
+@timed()
+def get_fig_activity_timeline(message_counts: dict, rolling_average: dict = None, max_points=MAX_PLOT_POINTS) -> go.Figure:
+    """Create a timeline chart of messages over time, with an optional rolling average line.
+    Long ranges are rendered with WebGL and downsampled to max_points"""
+    traces = [
+        create_time_series_trace(
+            list(message_counts.keys()), list(message_counts.values()),
+            'Messages', 'rgba(16, 185, 129, 0.45)',
+            '<b>Date:</b> %{x|%d.%m.%Y}<br><b>Messages:</b> %{y}<extra></extra>',
+            max_points
+        )
+    ]
+    if rolling_average:
+        traces.append(create_time_series_trace(
+            list(rolling_average.keys()), list(rolling_average.values()),
+            'Rolling Average', '#feca57',
+            '<b>Date:</b> %{x|%d.%m.%Y}<br><b>Average:</b> %{y:.1f}<extra></extra>',
+            max_points, as_bars=False
+        ))
+
+    fig = go.Figure(data=traces)
+    fig.update_layout(create_standard_layout("Date", "Number of Messages",
+                                           bargap=0.1,
+                                           margin={'l': 60, 'r': 60, 't': 30, 'b': 60}))
+    return fig
+
+@timed()
+def get_fig_activity_heatmap(weekday_hour_counts) -> go.Figure:
+    """Create a heatmap of messages by weekday (rows, Monday first) and hour of day (columns)"""
+    days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+    fig = go.Figure(data=[
+        go.Heatmap(
+            z=np.asarray(weekday_hour_counts).tolist(),
+            x=list(range(24)), y=days,
+            colorscale=[[0, 'rgba(16, 185, 129, 0.05)'], [1, PRIMARY_GREEN]],
+            xgap=2, ygap=2,
+            hovertemplate='<b>%{y}</b> %{x}:00<br><b>Messages:</b> %{z}<extra></extra>'
+        )
+    ])
+
+    fig.update_layout(create_standard_layout("Hour of Day", "Day of Week",
+                                           xaxis={**AXIS_STYLE, 'title': create_axis_title("Hour of Day"), 'dtick': 1},
+                                           yaxis={**AXIS_STYLE, 'title': create_axis_title("Day of Week"), 'autorange': 'reversed'},
+                                           margin={'l': 110, 'r': 60, 't': 30, 'b': 60}))
+    return fig
+
+@timed()
 def get_fig_messages_per_user(messages_per_user: dict) -> go.Figure:
     """Create a bar chart showing messages per user"""
     fixed_users, counts = prepare_user_data(messages_per_user)
@@ -127,6 +241,7 @@ def get_fig_messages_per_user(messages_per_user: dict) -> go.Figure:
                                            xaxis={'tickangle': 45, **AXIS_STYLE, 'title': create_axis_title("Users")}))
     return fig
 
+@timed()
 def get_fig_avg_message_length(avg_length_per_user: dict) -> go.Figure:
     """Create a bar chart showing average message length per user"""
     fixed_users, avg_lengths = prepare_user_data(avg_length_per_user)
@@ -143,6 +258,7 @@ def get_fig_avg_message_length(avg_length_per_user: dict) -> go.Figure:
                                            xaxis={'tickangle': 45, **AXIS_STYLE, 'title': create_axis_title("Users")}))
     return fig
 
+@timed()
 def get_fig_laughs_per_user(laughs_per_user: dict) -> go.Figure:
     fixed_users, counts = prepare_user_data(laughs_per_user)
     
@@ -157,20 +273,18 @@ def get_fig_laughs_per_user(laughs_per_user: dict) -> go.Figure:
                                            xaxis={'tickangle': 45, **AXIS_STYLE, 'title': create_axis_title("Users")}))
     return fig
 
+@timed()
 def get_fig_most_common_words(common_words: list[tuple[str, int]]) -> go.Figure: 
     """Create a bar chart showing the most common words"""
     if not common_words:
         return go.Figure()
     
-    words_dict = dict(common_words[:10])
-    data = fix_dict_keys(words_dict)
-    words = list(data.keys())
-    counts = list(data.values())
-    fixed_words = [fix_hebrew(word) for word in words]
+    words = [word for word, count in common_words[:10]]
+    counts = [count for word, count in common_words[:10]]
     
     fig = go.Figure(data=[
         create_bar_chart(
-            fixed_words, counts,
+            words, counts,
             colors=[PRIMARY_GREEN] * len(words),
             # Make an horizontal bar chart
             orientation='h',
@@ -184,6 +298,31 @@ def get_fig_most_common_words(common_words: list[tuple[str, int]]) -> go.Figure:
                                            yaxis={'categoryorder': 'total ascending', **AXIS_STYLE, 'title': create_axis_title("Words")}))
     return fig
 
+@timed()
+def get_fig_most_common_phrases(common_phrases: list[tuple[str, int]]) -> go.Figure:
+    """Create a bar chart showing the most common phrases (bigrams / trigrams)"""
+    if not common_phrases:
+        return go.Figure()
+
+    phrases = [phrase for phrase, count in common_phrases[:10]]
+    counts = [count for phrase, count in common_phrases[:10]]
+
+    fig = go.Figure(data=[
+        create_bar_chart(
+            phrases, counts,
+            colors=[ACCENT_GREEN] * len(phrases),
+            orientation='h',
+            hover_template='<b>Phrase:</b> %{y}<br><b>Count:</b> %{x}<extra></extra>'
+        )
+    ])
+
+    fig.update_layout(create_standard_layout("Frequency", "Phrases",
+                                           height=500,
+                                           margin={'l': 180, 'r': 60, 't': 30, 'b': 60},
+                                           yaxis={'categoryorder': 'total ascending', **AXIS_STYLE, 'title': create_axis_title("Phrases")}))
+    return fig
+
+@timed()
 def get_fig_messages_pie_chart(messages_per_user: dict) -> go.Figure:
     """Create a pie chart showing message distribution per user"""
     fixed_users, counts = prepare_user_data(messages_per_user)
@@ -230,6 +369,7 @@ def get_fig_messages_pie_chart(messages_per_user: dict) -> go.Figure:
     })
     return fig
 
+@timed()
 def get_fig_response_time_per_user(avg_response_time_per_user: dict) -> go.Figure:
     """Create a bar chart showing average response time per user"""
     fixed_users, times = prepare_user_data(avg_response_time_per_user)
@@ -261,6 +401,7 @@ def get_fig_response_time_per_user(avg_response_time_per_user: dict) -> go.Figur
                                            xaxis={'tickangle': 45, **AXIS_STYLE, 'title': create_axis_title("Users")}))
     return fig
 
+@timed()
 def get_fig_emoji_per_user(emoji_per_user: dict) -> go.Figure:
     """Create a bar chart showing emoji usage per user"""
     fixed_users, counts = prepare_user_data(emoji_per_user)
@@ -276,6 +417,7 @@ def get_fig_emoji_per_user(emoji_per_user: dict) -> go.Figure:
                                            xaxis={'tickangle': 45, **AXIS_STYLE, 'title': create_axis_title("Users")}))
     return fig
 
+@timed()
 def get_fig_most_common_emojis(most_common_emojis: list[tuple[str, int]]) -> go.Figure:
     """Create a horizontal bar chart showing the most common emojis"""
     if not most_common_emojis:
@@ -299,6 +441,7 @@ def get_fig_most_common_emojis(most_common_emojis: list[tuple[str, int]]) -> go.
                                            yaxis={'categoryorder': 'total ascending', **AXIS_STYLE, 'title': create_axis_title("Emojis")}))
     return fig
 
+@timed()
 def get_fig_message_bursts(message_bursts: dict) -> go.Figure:
     """Create a bar chart showing message burst patterns per user"""
     fixed_users, counts = prepare_user_data(message_bursts)
@@ -314,6 +457,7 @@ def get_fig_message_bursts(message_bursts: dict) -> go.Figure:
                                            xaxis={'tickangle': 45, **AXIS_STYLE, 'title': create_axis_title("Users")}))
     return fig
 
+@timed()
 def get_fig_conversation_starters(conversation_starters: dict) -> go.Figure:
     """Create a bar chart showing conversation starters per user"""
     fixed_users, counts = prepare_user_data(conversation_starters)
@@ -327,4 +471,59 @@ def get_fig_conversation_starters(conversation_starters: dict) -> go.Figure:
     
     fig.update_layout(create_standard_layout("Users", "Conversations Started", 
                                            xaxis={'tickangle': 45, **AXIS_STYLE, 'title': create_axis_title("Users")}))
-    return fig
\ No newline at end of file
+    return fig
+
+
+@timed()
+def get_fig_term_timeline(term_timeline: dict, max_points=MAX_PLOT_POINTS) -> go.Figure:
+    """Create a bar chart showing how often a searched term was used over time"""
+    fig = go.Figure(data=[
+        create_time_series_trace(
+            list(term_timeline.keys()), list(term_timeline.values()),
+            'Messages', PRIMARY_GREEN,
+            '<b>Date:</b> %{x|%d.%m.%Y}<br><b>Messages:</b> %{y}<extra></extra>',
+            max_points
+        )
+    ])
+
+    fig.update_layout(create_standard_layout("Date", "Messages", margin={'l': 60, 'r': 60, 't': 30, 'b': 60}))
+    return fig
+
+# ----Word cloud:----
+# Rendered as a PNG image with the wordcloud package, not as a Plotly figure
+
+WORD_CLOUD_WIDTH = 1200
+WORD_CLOUD_HEIGHT = 500
+
+def get_word_cloud_font():
+    """Return a font path with Hebrew glyphs: the WORD_CLOUD_FONT env var,
+    else DejaVu Sans shipped with matplotlib (wordcloud's default font has no Hebrew)"""
+    if os.environ.get('WORD_CLOUD_FONT'):
+        return os.environ['WORD_CLOUD_FONT']
+    from matplotlib import font_manager
+    return font_manager.findfont('DejaVu Sans')
+
+@timed()
+def render_word_cloud(word_frequencies: list[tuple[str, int]], top_n=100,
+                      width=WORD_CLOUD_WIDTH, height=WORD_CLOUD_HEIGHT) -> bytes:
+    """Render a word cloud of the top_n (word, count) pairs and return it as PNG bytes"""
+    # Imported on first use, wordcloud pulls in matplotlib and PIL
+    from wordcloud import WordCloud
+
+    top_words = word_frequencies[:top_n]
+    # Matplotlib draws text left to right, so Hebrew is reordered for display here (and only here)
+    fixed_words = fix_labels(word for word, count in top_words)
+    frequencies = dict(zip(fixed_words, (count for word, count in top_words)))
+
+    cloud = WordCloud(
+        width=width, height=height,
+        mode='RGBA', background_color=None,
+        font_path=get_word_cloud_font(),
+        max_words=top_n,
+        random_state=0,
+        color_func=lambda *args, random_state, **kwargs: random_state.choice(COLORS + [PRIMARY_GREEN])
+    ).generate_from_frequencies(frequencies)
+
+    buffer = io.BytesIO()
+    cloud.to_image().save(buffer, format='PNG')
+    return buffer.getvalue()
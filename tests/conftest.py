@@ -0,0 +1,27 @@
+"""
+Make the app modules importable the way streamlit runs them (flat imports from src/),
+and skip the wall-clock benchmark tests unless pytest runs with --run-benchmarks
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+
+def pytest_addoption(parser):
+    parser.addoption("--run-benchmarks", action="store_true", help="Also run the wall-clock benchmark tests")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: wall-clock budget test, skipped unless --run-benchmarks")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-benchmarks"):
+        return
+    skip = pytest.mark.skip(reason="wall-clock benchmark, run with --run-benchmarks")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
@@ -0,0 +1,158 @@
+"""
+Tester for the analysis process pool.
+"""
+import os
+import time
+
+import pytest
+
+from src.analysis_executor import (AnalysisExecutor, ExecutorBusyError, JobFailedError, ChatTooLargeError,
+                                   CHAT_MEMORY_FACTOR, MAX_ADMITTED_CHAT_MB, publish_stage)
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'conversation_sample.txt')
+
+
+def sleep_then_publish(seconds, stage):
+    # Module level, so the pool can send it to the workers
+    time.sleep(seconds)
+    publish_stage(stage, {stage: True})
+    return {}
+
+
+def wait_for(executor, key, timeout=60):
+    deadline = time.monotonic() + timeout
+    while executor.status(key)['state'] in ('queued', 'running'):
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    return executor.status(key)
+
+
+def test_analysis_executor_analyzes_chat_bytes():
+    with open(SAMPLE_PATH, 'rb') as f:
+        data = f.read()
+
+    executor = AnalysisExecutor(max_workers=1, max_queued=1)
+    try:
+        executor.submit('sample', data)
+        # The same key joins the running job instead of queueing a second one
+        executor.submit('sample', data)
+        assert executor.stats()['running'] + executor.stats()['queued'] == 1
+
+        status = wait_for(executor, 'sample')
+        assert status['state'] == 'done'
+        assert status['stages'] == ['basic', 'responses', 'emojis', 'words', 'users', 'timings']
+        assert status['progress'] == (len(data), len(data))
+
+        # The result is the merge of the published stages
+        results = executor.result('sample')
+        assert results['basic_stats']['total_messages'] > 0
+        assert 'all_users_data' in results
+
+        # With the stage timings and counters of the worker's run
+        timings = results['timings']
+        assert timings['run'] == 'analyze_chat_bytes' and timings['chat'] == 'sample'
+        assert {'parse', 'preprocess_df', 'extract_emojis', 'calculate_text_frequencies'} <= set(timings['stages'])
+        assert timings['counters']['parse.messages'] == results['basic_stats']['total_messages']
+        assert timings['counters']['parse.bytes'] == len(data)
+        assert executor.partial_results('sample').keys() == results.keys()
+    finally:
+        executor.shutdown()
+
+
+def test_analysis_executor_admission_control_and_timeout():
+    executor = AnalysisExecutor(max_workers=1, max_queued=1, job_timeout=0.5)
+    try:
+        executor.submit('a', 2, fn=time.sleep)
+        executor.submit('b', 0.1, fn=time.sleep)
+        with pytest.raises(ExecutorBusyError):
+            executor.submit('c', 0, fn=time.sleep)
+        assert executor.stats()['rejected'] == 1
+
+        time.sleep(1)
+        assert executor.status('a')['state'] == 'timeout'
+        with pytest.raises(JobFailedError):
+            executor.result('a')
+        # Waiting in the queue does not count toward a job's timeout
+        assert executor.status('b')['state'] == 'queued'
+        # The timed-out job holds its slot until its worker is done with it
+        with pytest.raises(ExecutorBusyError):
+            executor.submit('c', 0, fn=time.sleep)
+
+        assert wait_for(executor, 'b')['state'] == 'done'
+        executor.submit('c', 0, fn=time.sleep)
+    finally:
+        executor.shutdown(wait=False)
+
+
+def test_analysis_executor_resubmitting_a_timed_out_key():
+    executor = AnalysisExecutor(max_workers=1, max_queued=1, job_timeout=0.3)
+    try:
+        executor.submit('a', 1.2, 'old', fn=sleep_then_publish)
+        time.sleep(0.8)
+        assert executor.status('a')['state'] == 'timeout'
+
+        # The new submission takes the queue slot, the timed-out one still holds the only worker
+        assert executor.submit('a', 0, 'new', fn=sleep_then_publish)
+        with pytest.raises(ExecutorBusyError):
+            executor.submit('b', 0, fn=time.sleep)
+        assert executor.stats() == {'running': 1, 'queued': 1, 'rejected': 1, 'workers': 1}
+
+        # The stage the timed-out run publishes when it ends does not land on the new job
+        assert wait_for(executor, 'a')['state'] == 'done'
+        assert executor.status('a')['stages'] == ['new', 'timings']
+    finally:
+        executor.shutdown()
+
+
+def test_analysis_executor_replaces_a_broken_pool():
+    executor = AnalysisExecutor(max_workers=1, max_queued=0)
+    try:
+        # The worker process dies, which breaks the pool under the job
+        executor.submit('crash', 1, fn=os._exit)
+        assert wait_for(executor, 'crash')['state'] == 'failed'
+        with pytest.raises(JobFailedError):
+            executor.result('crash')
+        # Later jobs run on a new pool
+        executor.submit('next', 0, fn=time.sleep)
+        assert wait_for(executor, 'next')['state'] == 'done'
+    finally:
+        executor.shutdown()
+
+
+def test_analysis_executor_reports_failures():
+    executor = AnalysisExecutor(max_workers=1, max_queued=0)
+    try:
+        executor.submit('bad', -1, fn=time.sleep)
+        assert wait_for(executor, 'bad')['state'] == 'failed'
+        with pytest.raises(JobFailedError):
+            executor.result('bad')
+        # A failed key can be submitted again
+        executor.submit('bad', 0, fn=time.sleep)
+        assert wait_for(executor, 'bad')['state'] == 'done'
+    finally:
+        executor.shutdown()
+
+
+def test_analysis_executor_size_limit_and_memory_budget():
+    executor = AnalysisExecutor(max_workers=2, max_queued=2, max_chat_bytes=1000,
+                                memory_budget_bytes=1500 * CHAT_MEMORY_FACTOR)
+    try:
+        with pytest.raises(ChatTooLargeError):
+            executor.submit('huge', b'x' * 1001)
+        # Each chat fits, but not both at once: the second one is asked to retry
+        executor.submit('a', 1, fn=time.sleep, size=1000)
+        with pytest.raises(ExecutorBusyError):
+            executor.submit('b', 1, fn=time.sleep, size=1000)
+        assert executor.submit('c', 0, fn=time.sleep, size=500)
+        assert not executor.submit('c', 0, fn=time.sleep, size=500)
+    finally:
+        executor.shutdown()
+
+    # Upload limits follow MAX_ADMITTED_CHAT_MB: the default pool admits that much, and not a MB more
+    executor = AnalysisExecutor()
+    try:
+        executor.check_size(MAX_ADMITTED_CHAT_MB * 1024 * 1024)
+        with pytest.raises(ChatTooLargeError):
+            executor.check_size((MAX_ADMITTED_CHAT_MB + 1) * 1024 * 1024)
+    finally:
+        executor.shutdown()
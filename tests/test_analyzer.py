@@ -16,6 +16,26 @@ from src.analyzer import (
     calculate_conversation_starters,
     analyze_chat,
     calculate_all_user_analysis,
+    calculate_reply_graph,
+    get_top_reply_partners,
+    get_pair_response_times,
+    calculate_response_time_histograms,
+    calculate_response_time_percentiles,
+    merge_response_time_histograms,
+    histogram_percentile,
+    build_search_index,
+    search_messages,
+    search_term_per_user,
+    search_term_timeline,
+    calculate_text_frequencies,
+    calculate_activity_timeline,
+    timeline_range_total,
+    timeline_daily_counts,
+    timeline_rolling_average,
+    timeline_rollup,
+    calculate_activity_heatmap,
+    iter_analysis_stages,
+    ANALYSIS_STAGES,
 )
 
 # ---------- Helpers ----------
@@ -304,3 +324,215 @@ def test_analyze_chat_end_to_end_contract():
     assert result["basic_stats"]["total_messages"] == 6
     assert result["basic_stats"]["total_users"] == 3
     assert result["messages_per_user"]["Alice"] == 3
+
+
+def test_iter_analysis_stages_adds_up_to_analyze_chat():
+    """
+    The stages come in order, basic stats first, and together hold every analyze_chat key.
+    """
+    stages = list(iter_analysis_stages(small_fixture()))
+    assert [stage for stage, _ in stages] == list(ANALYSIS_STAGES)
+    assert "basic_stats" in stages[0][1]
+    assert "emoji_per_user" not in stages[0][1]
+
+    merged = {}
+    for _, stage_results in stages:
+        merged.update(stage_results)
+    result = analyze_chat(small_fixture())
+    assert merged.keys() == result.keys()
+    assert merged["emoji_per_user"] == result["emoji_per_user"]
+
+    assert list(iter_analysis_stages(small_fixture().iloc[:0])) == []
+
+
+def test_calculate_reply_graph_pairs_and_partners():
+    """
+    Test the sparse reply graph.
+    Uses the same timeline as the response time test, so the pairs are known:
+    B->A 30s, A->B 60s, C->A 30s, B->C 420s
+    """
+    t0 = datetime(2025,8,5,10,0,0)
+    rows = [
+        (t0 + timedelta(seconds=0),   "A", "hi"),
+        (t0 + timedelta(seconds=30),  "B", "hey"),
+        (t0 + timedelta(seconds=90),  "B", "more"),
+        (t0 + timedelta(seconds=150), "A", "ok"),
+        (t0 + timedelta(seconds=180), "C", "yo"),
+        (t0 + timedelta(seconds=600), "B", "later"),
+    ]
+    df = preprocess_df(make_df(rows))
+    graph = calculate_reply_graph(df)
+
+    assert graph["users"] == ["A", "B", "C"]
+    assert graph["counts"].sum() == 4
+    # Only pairs that occurred are stored
+    assert len(graph["partners"]) == 4
+
+    partners = get_top_reply_partners(graph, "B")
+    assert {p for p, _, _ in partners} == {"A", "C"}
+    assert dict((p, mean) for p, _, mean in partners)["C"] == 420
+
+    assert list(get_pair_response_times(graph, "A", "B")) == [60]
+    assert len(get_pair_response_times(graph, "C", "B")) == 0
+    # A name missing from the graph never matches the user sorted after it
+    assert len(get_pair_response_times(graph, "A", "Aa")) == 0
+    assert len(get_pair_response_times(graph, "B", "Zed")) == 0
+    assert get_top_reply_partners(graph, "Nobody") == []
+
+
+def test_response_time_histograms_percentiles_and_merge():
+    """
+    Test the log-bucketed response time histograms.
+    Percentiles are estimates, so they should land in the right bucket (within ~20%),
+    and merging two halves should give the same counts as the full chat.
+    """
+    t0 = datetime(2025,8,5,10,0,0)
+    rows = []
+    t = t0
+    # A replies to B after 60s nine times, then once after 1 hour
+    for i, gap in enumerate([60] * 9 + [3600]):
+        rows.append((t, "B", f"q{i}"))
+        t += timedelta(seconds=gap)
+        rows.append((t, "A", f"a{i}"))
+        t += timedelta(hours=7)  # over the cap, B's next message is not a reply
+    df = preprocess_df(make_df(rows))
+
+    hist = calculate_response_time_histograms(df)
+    a_row = hist["counts"][hist["users"].index("A")]
+    assert a_row.sum() == 10
+    assert hist["counts"][hist["users"].index("B")].sum() == 0
+
+    assert abs(histogram_percentile(a_row, hist["edges"], 50) - 60) < 60 * 0.2
+    assert histogram_percentile(a_row, hist["edges"], 99) > 3600 * 0.8
+
+    percentiles = calculate_response_time_percentiles(hist)
+    assert set(percentiles["A"]) == {"median", "p90", "p99"}
+    assert "B" not in percentiles
+
+    half = len(df) // 2
+    merged = merge_response_time_histograms(
+        calculate_response_time_histograms(df.iloc[:half].reset_index(drop=True)),
+        calculate_response_time_histograms(df.iloc[half:].reset_index(drop=True)),
+    )
+    assert merged["users"] == hist["users"]
+    assert (merged["counts"] == hist["counts"]).all()
+
+
+def test_search_index_exact_prefix_and_timelines():
+    """
+    Test the inverted index.
+    Stopwords are not indexed, a message counts once per word,
+    and prefix queries match every word starting with the query.
+    """
+    rows = [
+        (datetime(2025,8,5,9,0,0),  "A", "pizza tonight? pizza!"),
+        (datetime(2025,8,5,9,5,0),  "B", "the pizzeria is closed"),
+        (datetime(2025,8,6,9,0,0),  "A", "burger then"),
+        (datetime(2025,8,13,9,0,0), "B", "Pizza again"),
+    ]
+    df = preprocess_df(make_df(rows))
+    index = build_search_index(df)
+
+    assert "the" not in index["vocabulary"]
+    assert index["vocabulary"] == sorted(index["vocabulary"])
+    assert list(search_messages(index, "pizza")) == [0, 3]
+    assert list(search_messages(index, "PIZ", prefix=True)) == [0, 1, 3]
+    assert list(search_messages(index, "pizza again")) == [3]
+    assert len(search_messages(index, "sushi")) == 0
+
+    assert search_term_per_user(index, "pizza") == {"A": 1, "B": 1}
+    daily = search_term_timeline(index, "pizza", freq="D")
+    assert sum(daily.values()) == 2 and len(daily) == 9
+    assert sum(search_term_timeline(index, "pizza", user="B").values()) == 1
+    # Unknown users match nothing, rather than whoever sorts next
+    assert search_term_timeline(index, "pizza", user="AA") == {}
+    assert search_term_timeline(index, "pizza", user="Zed") == {}
+
+
+def test_calculate_text_frequencies_phrases_and_pruning():
+    """
+    Test bigram/trigram counting.
+    Phrases must not cross stopwords, per-user phrases come from the same pass,
+    and a tiny max_phrases keeps the counters bounded without losing the top phrase.
+    """
+    rows = [
+        (datetime(2025,8,5,9,0,0), "A", "happy birthday dear friend"),
+        (datetime(2025,8,5,9,1,0), "B", "happy birthday!"),
+        (datetime(2025,8,5,9,2,0), "B", "going to the beach"),
+        (datetime(2025,8,5,9,3,0), "A", "happy birthday again"),
+    ]
+    df = preprocess_df(make_df(rows))
+    words, ngrams, user_phrases, user_words = calculate_text_frequencies(df, vocabulary_size=50)
+
+    assert dict(words)["happy"] == 3
+    bigrams = dict(ngrams[2])
+    assert bigrams["happy birthday"] == 3
+    # "to the" are stopwords, so no phrase crosses them
+    assert not any("beach" in phrase for phrase in bigrams)
+    assert dict(ngrams[3])["happy birthday dear"] == 1
+    assert user_phrases["B"][0] == ("happy birthday", 1)
+    assert dict(user_words["A"])["happy"] == 2
+    assert "beach" in dict(user_words["B"])
+
+    _, pruned, _, _ = calculate_text_frequencies(df, max_phrases=4)
+    assert dict(pruned[2])["happy birthday"] >= 1
+    assert len(pruned[2]) <= 4
+
+    # The word frequency contract is unchanged
+    assert calculate_word_frequency(df) == words
+
+
+def test_activity_timeline_prefix_sum_queries():
+    """
+    Test the cumulative per-day timeline.
+    Range totals, rolling averages and rollups are all derived from prefix sums,
+    so compare them against plain counts on the fixture.
+    """
+    rows = [
+        (datetime(2025,7,30,9,0,0), "A", "x"),
+        (datetime(2025,7,30,9,5,0), "B", "x"),
+        (datetime(2025,8,1,9,0,0),  "A", "x"),
+        (datetime(2025,8,4,9,0,0),  "A", "x"),
+        (datetime(2025,8,4,9,1,0),  "A", "x"),
+    ]
+    df = preprocess_df(make_df(rows))
+    timeline = calculate_activity_timeline(df)
+
+    assert timeline["cumulative"].shape == (2, 7)
+    assert timeline_range_total(timeline) == 5
+    assert timeline_range_total(timeline, "2025-07-31", "2025-08-04", user="A") == 3
+    assert timeline_range_total(timeline, "2025-07-30", "2025-07-30", user="B") == 1
+    assert timeline_range_total(timeline, "2020-01-01", "2020-02-01") == 0
+
+    daily = timeline_daily_counts(timeline)
+    assert list(daily) == [2, 0, 1, 0, 0, 2]
+
+    rolling = timeline_rolling_average(timeline, window=3, start="2025-08-01")
+    assert list(rolling) == [1.0, 1 / 3, 1 / 3, 2 / 3]
+
+    weekly = timeline_rollup(timeline, "W")
+    assert list(weekly) == [3, 2]
+    monthly = timeline_rollup(timeline, "M", user="A")
+    assert list(monthly) == [1, 3]
+
+
+def test_calculate_activity_heatmap_single_aggregation():
+    """
+    Test the hour x weekday heatmap.
+    Aug 4, 2025 is a Monday, so weekday codes are easy to check.
+    """
+    rows = [
+        (datetime(2025,8,4,9,0,0),   "A", "x"),   # Monday 9:00
+        (datetime(2025,8,4,9,30,0),  "A", "x"),   # Monday 9:00
+        (datetime(2025,8,10,23,0,0), "B", "x"),   # Sunday 23:00
+    ]
+    df = preprocess_df(make_df(rows))
+    heatmap = calculate_activity_heatmap(df)
+
+    assert heatmap["counts"].shape == (2, 7, 24)
+    assert heatmap["counts"][0, 0, 9] == 2
+    assert heatmap["counts"][1, 6, 23] == 1
+    assert heatmap["counts"].sum() == 3
+
+    result = analyze_chat(make_df(rows))
+    assert result["all_users_data"]["B"]["weekday_hour_activity"][6, 23] == 1
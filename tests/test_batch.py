@@ -0,0 +1,96 @@
+"""
+Tester for the headless batch analysis.
+"""
+import io
+import json
+import os
+import subprocess
+import sys
+
+import pandas as pd
+
+from src.analyzer import SUMMARY_METRICS
+from src.batch import analyze_chat_file, analyze_chats, metrics_to_rows
+from src.instrumentation import pipeline_run
+from src.main import build_arg_parser
+
+REPO_DIR = os.path.join(os.path.dirname(__file__), '..')
+SAMPLE_PATH = os.path.join(REPO_DIR, 'src', 'conversation_sample.txt')
+
+
+def test_cli_metrics_match_analyzer():
+    args = build_arg_parser().parse_args(['analyze', 'a.txt'])
+    assert tuple(args.metrics) == SUMMARY_METRICS
+    args = build_arg_parser().parse_args(['analyze', 'a.txt', '--format', 'parquet', '--metrics', 'basic_stats'])
+    assert args.format == 'parquet' and args.metrics == ['basic_stats'] and args.output is None
+
+
+def test_metrics_to_rows_flattens_nested_metrics():
+    summary = {
+        'basic_stats': {'total_messages': 3},
+        'most_common_words': [['coffee', 2]],
+        'response_time_percentiles': {'Alice': {'median': '17s'}},
+    }
+    assert metrics_to_rows('chat.txt', summary) == [
+        ('chat.txt', 'basic_stats', 'total_messages', None, 3.0, None),
+        ('chat.txt', 'most_common_words', 'coffee', None, 2.0, None),
+        ('chat.txt', 'response_time_percentiles', 'Alice', 'median', None, '17s'),
+    ]
+
+
+def test_analyze_chats_writes_one_file_per_chat(tmp_path):
+    empty = tmp_path / 'empty.txt'
+    empty.write_text('not a chat\n', encoding='utf-8')
+
+    summaries = analyze_chats([SAMPLE_PATH, str(empty)], str(tmp_path / 'out'), output_format='parquet',
+                              metrics=('basic_stats', 'messages_per_user'), workers=1)
+    # Chats without messages are skipped
+    assert list(summaries) == [SAMPLE_PATH]
+    table = pd.read_parquet(tmp_path / 'out' / 'conversation_sample.parquet')
+    assert set(table['metric']) == {'basic_stats', 'messages_per_user'}
+    assert table.loc[table['key'] == 'total_messages', 'value'].item() == 124
+
+
+def test_analyze_chat_file_never_builds_the_search_index():
+    with pipeline_run('batch') as run:
+        results = analyze_chat_file(SAMPLE_PATH)
+    assert 'search_index' not in results and 'word_vocabulary' in results
+    assert 'build_search_index' not in run.as_dict()['stages']
+
+
+def test_analyze_command_reports_missing_chats_and_keeps_stdout_parseable(tmp_path):
+    """
+    A chat that cannot be read becomes an error line or row, stdout stays pure JSON lines / Parquet
+    """
+    missing = str(tmp_path / 'missing.txt')
+    command = [sys.executable, '-m', 'src.main', 'analyze', missing, SAMPLE_PATH, '--metrics', 'basic_stats',
+               '--workers', '1']
+
+    result = subprocess.run(command, cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    lines = [json.loads(line) for line in result.stdout.splitlines()]
+    assert lines[0]['chat'] == missing and lines[0]['error'].startswith('FileNotFoundError')
+    assert lines[1]['metrics']['basic_stats']['total_messages'] == 124
+    assert 'Could not analyze' in result.stderr
+
+    result = subprocess.run(command + ['--format', 'parquet'], cwd=REPO_DIR, capture_output=True, check=True)
+    table = pd.read_parquet(io.BytesIO(result.stdout))
+    error = table[table['metric'] == 'error']
+    assert error['chat'].tolist() == [missing] and error['text'].item().startswith('FileNotFoundError')
+    assert table.loc[table['key'] == 'total_messages', 'value'].item() == 124
+
+
+def test_analyze_command_runs_without_ui_libraries():
+    """
+    The analyze command streams JSON lines and never imports Streamlit or Plotly
+    """
+    code = (
+        "import runpy, sys\n"
+        f"sys.argv = ['main.py', 'analyze', {SAMPLE_PATH!r}, '--metrics', 'basic_stats', '--workers', '1']\n"
+        "runpy.run_module('src.main', run_name='__main__')\n"
+        "print(sorted(m for m in ('streamlit', 'plotly') if m in sys.modules), file=sys.stderr)\n"
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=REPO_DIR, capture_output=True, text=True, check=True)
+
+    line = json.loads(result.stdout)
+    assert line['metrics']['basic_stats']['total_messages'] == 124
+    assert result.stderr.strip().splitlines()[-1] == '[]'
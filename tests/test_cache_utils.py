@@ -0,0 +1,79 @@
+"""
+Tester for the caching utilities.
+"""
+import os
+
+from src.cache_utils import AnalysisCache, content_digest, ANALYSIS_RESULTS_VERSION
+
+
+def test_content_digest_is_stable_and_content_based():
+    a = b"[5.8.2025, 15:40:24] \xd7\x99: hi\n"
+    assert content_digest(a) == content_digest(bytes(a))
+    assert content_digest(memoryview(a)) == content_digest(a)
+    assert content_digest(a) != content_digest(a + b" ")
+
+def test_analysis_cache_memory_budget_evicts_lru():
+    results = {"basic_stats": {"total_messages": 1}, "payload": "x" * 1000}
+    cache = AnalysisCache(max_bytes=2500)
+
+    cache.put("a", results)
+    cache.put("b", results)
+    cache.get("a")                 # "a" is now the most recently used
+    cache.put("c", results)        # over budget, evicts "b"
+
+    assert cache.get("a") is results
+    assert cache.get("b") is None
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["bytes"] <= 2500
+
+def test_analysis_cache_persists_on_disk(tmp_path):
+    results = {"basic_stats": {"total_messages": 42}}
+    AnalysisCache(cache_dir=str(tmp_path)).put("digest", results)
+
+    # A fresh cache (e.g. after a restart) loads the results back from disk
+    restarted = AnalysisCache(cache_dir=str(tmp_path))
+    assert restarted.get("digest") == results
+    assert restarted.get("other") is None
+    assert not list(tmp_path.glob("*.tmp"))
+
+def test_analysis_cache_disk_versions_corruption_and_budget(tmp_path):
+    results = {"payload": "x" * 1000}
+    cache = AnalysisCache(cache_dir=str(tmp_path), disk_max_bytes=2500)
+    cache.put("a", results)
+    # Results of another version are never loaded
+    assert [p.name for p in tmp_path.iterdir()] == [f"a.v{ANALYSIS_RESULTS_VERSION}.pkl"]
+    (tmp_path / "b.v0.pkl").write_bytes((tmp_path / f"a.v{ANALYSIS_RESULTS_VERSION}.pkl").read_bytes())
+    assert AnalysisCache(cache_dir=str(tmp_path)).get("b") is None
+
+    # A truncated file is a miss, and is deleted
+    path = tmp_path / f"c.v{ANALYSIS_RESULTS_VERSION}.pkl"
+    path.write_bytes(b"\x80\x05truncated")
+    assert AnalysisCache(cache_dir=str(tmp_path)).get("c") is None
+    assert not path.exists()
+
+    # Over the disk budget, the least recently used files go first
+    os.utime(tmp_path / "b.v0.pkl", (0, 0))
+    cache.put("d", results)
+    assert sorted(p.name for p in tmp_path.iterdir()) == [f"a.v{ANALYSIS_RESULTS_VERSION}.pkl",
+                                                          f"d.v{ANALYSIS_RESULTS_VERSION}.pkl"]
+
+
+def test_analysis_cache_skips_results_on_disk_and_deletes_stale_temp_files(tmp_path):
+    cache = AnalysisCache(cache_dir=str(tmp_path))
+    cache.put("a", {"payload": "x" * 1000})
+    path = tmp_path / f"a.v{ANALYSIS_RESULTS_VERSION}.pkl"
+    data = path.read_bytes()
+
+    # Results already on disk are neither pickled (a lambda cannot be) nor written again
+    other = AnalysisCache(cache_dir=str(tmp_path))
+    other.put("a", {"payload": lambda: None})
+    assert path.read_bytes() == data
+    assert other.stats()["bytes"] == len(data)
+
+    # Temp files left by a crashed write are deleted once stale, ones being written are kept
+    (tmp_path / "crashed.tmp").write_bytes(b"partial")
+    os.utime(tmp_path / "crashed.tmp", (0, 0))
+    (tmp_path / "writing.tmp").write_bytes(b"partial")
+    cache.put("b", {"payload": "y"})
+    assert sorted(p.name for p in tmp_path.iterdir()) == [f"a.v{ANALYSIS_RESULTS_VERSION}.pkl",
+                                                          f"b.v{ANALYSIS_RESULTS_VERSION}.pkl", "writing.tmp"]
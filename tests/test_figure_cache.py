@@ -0,0 +1,84 @@
+"""
+Tester for the figure cache.
+"""
+import os
+
+import plotly.graph_objects as go
+from src.figure_cache import FigureCache
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'conversation_sample.txt')
+
+# --- Helpers ---
+
+def make_fig(values):
+    """
+    A tiny figure builder that counts how often it actually runs.
+    """
+    make_fig.calls += 1
+    return go.Figure(data=[go.Bar(x=list(range(len(values))), y=values)])
+
+make_fig.calls = 0
+
+
+def test_hit_returns_equal_figure_without_rebuilding():
+    cache = FigureCache()
+    make_fig.calls = 0
+
+    first = cache.get_or_build(make_fig, "chat-1", [1, 2, 3])
+    second = cache.get_or_build(make_fig, "chat-1", [1, 2, 3])
+
+    assert make_fig.calls == 1
+    assert second.to_json() == first.to_json()
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+def test_fingerprint_and_params_are_part_of_the_key():
+    cache = FigureCache()
+    make_fig.calls = 0
+
+    cache.get_or_build(make_fig, "chat-1", [1, 2, 3])
+    cache.get_or_build(make_fig, "chat-2", [1, 2, 3])
+    cache.get_or_build(make_fig, "chat-1", [3, 2, 1])
+
+    assert make_fig.calls == 3
+    assert cache.stats()["entries"] == 3
+
+def test_memory_budget_evicts_least_recently_used():
+    one_fig = len(make_fig([1, 2, 3]).to_json())
+    cache = FigureCache(max_bytes=one_fig * 2 + 10)
+
+    cache.get_or_build(make_fig, "chat", [1, 2, 3])
+    cache.get_or_build(make_fig, "chat", [4, 5, 6])
+    cache.get_or_build(make_fig, "chat", [1, 2, 3])   # refresh the first entry
+    cache.get_or_build(make_fig, "chat", [7, 8, 9])   # evicts [4, 5, 6]
+
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["bytes"] <= cache.max_bytes
+
+    make_fig.calls = 0
+    cache.get_or_build(make_fig, "chat", [1, 2, 3])
+    assert make_fig.calls == 0
+    cache.get_or_build(make_fig, "chat", [4, 5, 6])
+    assert make_fig.calls == 1
+
+def test_prebuilt_sample_figures_are_hits_for_the_tabs():
+    from src.analyzer import analyze_chat
+    from src.parser import parse_whatsapp
+    from src.streamlit_app import get_visualizer_functions
+    from src.ui_components import prebuild_figures, build_timeline_figure
+
+    results = analyze_chat(parse_whatsapp(SAMPLE_PATH))
+    cache = FigureCache()
+    funcs = get_visualizer_functions("sample", figure_cache=cache)
+    prebuild_figures(results, funcs)
+    built = cache.stats()["misses"]
+    assert built == cache.stats()["entries"] > 20
+
+    # What the tabs ask for with their default settings is already built
+    funcs['pie_chart'](results['messages_per_user'])
+    user_data = next(iter(results['all_users_data'].values()))
+    funcs['by_hour'](user_data['hourly_activity'])
+    timeline = results['activity_timeline']
+    last_day = (timeline['start'] + len(timeline['total_cumulative']) - 2).astype(object)
+    build_timeline_figure(timeline, funcs, timeline['start'].astype(object), last_day)
+    assert cache.stats()["misses"] == built and cache.stats()["hits"] == 3
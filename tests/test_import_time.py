@@ -0,0 +1,29 @@
+"""
+Tester for the import-time budget of the entry modules.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+BENCH_DIR = os.path.join(os.path.dirname(__file__), '..', 'benchmarks')
+BENCHMARK = os.path.join(BENCH_DIR, 'bench_import_time.py')
+
+
+def test_entry_modules_do_not_load_heavy_libraries(monkeypatch):
+    monkeypatch.syspath_prepend(BENCH_DIR)
+    from bench_import_time import FORBIDDEN_IMPORTS, loaded_modules
+
+    for module, forbidden in FORBIDDEN_IMPORTS.items():
+        assert loaded_modules(module, forbidden) == [], module
+
+
+@pytest.mark.benchmark
+def test_import_time_within_budget():
+    """
+    Entry modules import within their time budget. Wall-clock, so only with --run-benchmarks
+    (on a quiet machine, e.g. as its own CI step)
+    """
+    result = subprocess.run([sys.executable, BENCHMARK, '--repeats', '3'], capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
@@ -0,0 +1,81 @@
+import json
+import logging
+import os
+import pstats
+
+from src.analyzer import analyze_chat
+from src.instrumentation import PROFILE_DIR_ENV, count, current_run, pipeline_run, stage, timed
+from src.parser import parse_whatsapp
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'conversation_sample.txt')
+
+
+@timed()
+def double(x):
+    return x * 2
+
+
+def test_pipeline_run_collects_stages_and_counters():
+    # Outside a run nothing is kept
+    assert double(2) == 4 and current_run() is None
+    count('ignored')
+
+    with pipeline_run('upload', chat='abc') as run:
+        double(1)
+        double(2)
+        with stage('parse'):
+            count('parse.messages', 10)
+            count('parse.messages', 5)
+        # A nested run is part of the outer one
+        with pipeline_run('analyze_chat') as inner:
+            assert inner is run
+            count('analyze.messages', 15)
+
+    timings = run.as_dict()
+    assert timings['run'] == 'upload' and timings['chat'] == 'abc'
+    assert timings['stages']['double']['calls'] == 2 and timings['stages']['parse']['calls'] == 1
+    assert timings['counters'] == {'parse.messages': 15, 'analyze.messages': 15}
+    assert timings['seconds'] >= timings['stages']['parse']['seconds']
+    assert current_run() is None
+
+
+def test_analyze_chat_logs_its_run_and_writes_a_profile(tmp_path, monkeypatch, caplog):
+    monkeypatch.setenv(PROFILE_DIR_ENV, str(tmp_path))
+    df = parse_whatsapp(SAMPLE_PATH)
+
+    with caplog.at_level(logging.DEBUG, logger='whatsapp_analyzer.timing'):
+        analyze_chat(df)
+
+    events = [json.loads(record.getMessage()) for record in caplog.records]
+    runs = [event for event in events if event['event'] == 'run']
+    assert len(runs) == 1 and runs[0]['run'] == 'analyze_chat'
+    assert runs[0]['counters']['analyze.messages'] == len(df)
+    assert {'preprocess_df', 'calculate_response_analysis', 'extract_emojis',
+            'calculate_text_frequencies', 'calculate_all_user_analysis'} <= set(runs[0]['stages'])
+    # Every stage is logged as it finishes, at DEBUG level
+    assert any(event['event'] == 'stage' and event['stage'] == 'extract_emojis' for event in events)
+
+    # The profile dump of the run opens with pstats
+    assert os.path.dirname(runs[0]['profile']) == str(tmp_path)
+    functions = {name for _, _, name in pstats.Stats(runs[0]['profile']).stats}
+    assert 'calculate_text_frequencies' in functions
+
+
+def test_traced_memory_of_nested_stages():
+    with pipeline_run('memory', trace_memory='tracemalloc') as run:
+        with stage('outer'):
+            kept = bytearray(4 * 1024 * 1024)
+            with stage('inner'):
+                temporary = bytearray(16 * 1024 * 1024)
+                del temporary
+
+    timings = run.as_dict()
+    inner, outer = timings['stages']['inner'], timings['stages']['outer']
+    mb = 1024 * 1024
+    # The inner peak counts for the stage around it, the freed buffer is not retained
+    assert 16 * mb <= inner['peak_bytes'] < 17 * mb and abs(inner['retained_bytes']) < mb
+    assert 20 * mb <= outer['peak_bytes'] < 21 * mb and 4 * mb <= outer['retained_bytes'] < 5 * mb
+    assert timings['memory']['peak_bytes'] >= outer['peak_bytes']
+    if os.path.exists('/proc/self/statm'):
+        assert 'rss_peak_bytes' in inner and 'rss_peak_bytes' in timings['memory']
+    assert len(kept) == 4 * mb
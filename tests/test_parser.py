@@ -1,8 +1,11 @@
 """
 Tester for the parser functions.
 """
+import io
+
 import pandas as pd
-from src.parser import parse_whatsapp
+import pytest
+from src.parser import parse_whatsapp, parse_whatsapp_stream, ChatFormatError, FORMAT_SNIFF_BYTES
 
 # --- Helpers ---
 HE_HEBREW = "[5.8.2025, 15:40:24] יונתן: מה קורה?\n"
@@ -75,3 +78,22 @@ def test_24h_time_parsing(tmp_path):
     df = parse_whatsapp(str(p))
     assert df.iloc[0]["datetime"].hour == 23
     assert df.iloc[1]["datetime"].hour == 13
+
+def test_stream_parse_matches_file_parse_across_chunk_boundaries(tmp_path):
+    # Tiny chunks split lines and multi-byte Hebrew characters
+    p = tmp_path / "chat.txt"
+    p.write_text(MIXED_CHAT, encoding="utf-8")
+    data = MIXED_CHAT.encode("utf-8")
+    progress = []
+    df = parse_whatsapp_stream(io.BytesIO(data), len(data), on_progress=lambda *a: progress.append(a), chunk_size=7)
+    pd.testing.assert_frame_equal(df, parse_whatsapp(str(p)))
+    assert progress[-1] == (len(data), len(data))
+
+def test_stream_parse_aborts_early_on_other_formats():
+    stream = io.BytesIO(b"just some notes: nothing here\n" * 100000)
+    with pytest.raises(ChatFormatError):
+        parse_whatsapp_stream(stream, chunk_size=1024)
+    # Gave up after the first few KB, not the whole 3 MB
+    assert stream.tell() <= FORMAT_SNIFF_BYTES
+    with pytest.raises(ChatFormatError):
+        parse_whatsapp_stream(io.BytesIO("שלום".encode("utf-16")))
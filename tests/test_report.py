@@ -0,0 +1,60 @@
+"""
+Tester for the headless report generator.
+"""
+import json
+import os
+import src.report
+from src.report import generate_report, generate_reports
+from src.parser import parse_whatsapp
+from src.analyzer import analyze_chat
+from src.batch import analyze_chat_file
+
+SAMPLE_CHAT = os.path.join(os.path.dirname(__file__), "..", "src", "conversation_sample.txt")
+
+
+def analyze_or_fail(path):
+    # Module level, so the pool can send it to the workers
+    if os.path.basename(path).startswith("broken"):
+        raise RuntimeError("analysis failed")
+    return analyze_chat_file(path)
+
+
+def test_generate_report_self_contained_html_and_metrics(tmp_path):
+    results = analyze_chat(parse_whatsapp(SAMPLE_CHAT))
+    written = generate_report(results, str(tmp_path), formats=("html", "json"))
+
+    metrics = json.loads(open(written["json"], encoding="utf-8").read())
+    assert metrics["basic_stats"]["total_messages"] == 124
+    assert "search_index" not in metrics
+
+    page = open(written["html"], encoding="utf-8").read()
+    # Plotly is inlined, so the page works on its own
+    assert "<script src=" not in page
+    assert 'id="messages_per_user"' in page and 'id="activity_timeline"' in page
+
+def test_generate_reports_batch_shares_plotly_bundle(tmp_path):
+    chats = tmp_path / "chats"
+    chats.mkdir()
+    for name in ("one", "two"):
+        (chats / f"{name}.txt").write_text(open(SAMPLE_CHAT, encoding="utf-8").read(), encoding="utf-8")
+    (chats / "empty.txt").write_text("", encoding="utf-8")
+
+    out = tmp_path / "reports"
+    reports = generate_reports([str(chats / "*.txt")], str(out), formats=("html", "json"), workers=2)
+
+    assert len(reports) == 2
+    assert sorted(os.listdir(out)) == ["assets", "one", "two"]
+    page = (out / "one" / "report.html").read_text(encoding="utf-8")
+    assert '<script src="../assets/plotly.min.js">' in page
+
+
+def test_generate_reports_skips_failed_chats(tmp_path, monkeypatch, capsys):
+    (tmp_path / "broken.txt").write_text(open(SAMPLE_CHAT, encoding="utf-8").read(), encoding="utf-8")
+    monkeypatch.setattr(src.report, "analyze_chat_file", analyze_or_fail)
+
+    out = tmp_path / "reports"
+    reports = generate_reports([str(tmp_path / "broken.txt"), SAMPLE_CHAT], str(out), formats=("json",), workers=1)
+
+    assert list(reports) == [SAMPLE_CHAT]
+    assert "broken.txt, skipped: RuntimeError: analysis failed" in capsys.readouterr().out
+    assert os.path.exists(out / "conversation_sample" / "metrics.json")
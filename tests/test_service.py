@@ -0,0 +1,87 @@
+"""
+Tester for the local HTTP analysis service.
+"""
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+# The pool and cache classes as the service module imports them (flat, from src/),
+# so it catches the same ExecutorBusyError class
+from src.service import AnalysisExecutor, AnalysisCache, AnalysisService, content_digest, create_server
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'conversation_sample.txt')
+
+
+@pytest.fixture
+def service_url():
+    service = AnalysisService(AnalysisExecutor(max_workers=1, max_queued=0), AnalysisCache(), max_upload_bytes=64 * 1024)
+    server = create_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", service
+    server.shutdown()
+    server.server_close()
+    service.executor.shutdown(wait=False)
+
+
+def request(url, data=None, headers=None):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data, headers=headers or {})) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_service_analyzes_and_caches_chats(service_url):
+    url, service = service_url
+    with open(SAMPLE_PATH, 'rb') as f:
+        data = f.read()
+
+    status, body = request(f"{url}/analyze?metrics=basic_stats", data)
+    assert status == 200
+    assert body['metrics'] == {'basic_stats': {'total_messages': 124, 'total_users': 4,
+                                               'date_range_days': 2, 'messages_per_day': 62.0}}
+
+    # The result is cached under its content hash
+    status, body = request(f"{url}/analysis/{body['hash']}?metrics=messages_per_user")
+    assert status == 200 and body['metrics']['messages_per_user']['John Smith'] == 30
+    assert service.cache.stats()['entries'] == 1
+
+    assert request(f"{url}/analysis/b2-{'0' * 32}")[0] == 404
+    assert request(f"{url}/analyze", b'not a chat')[0] == 422
+
+
+def test_service_limits_and_backpressure(service_url):
+    url, service = service_url
+    assert request(f"{url}/analyze", b'x' * (64 * 1024 + 1))[0] == 413
+    assert request(f"{url}/analyze", b'x', headers={'Content-Length': 'abc'})[0] == 400
+
+    # The only worker is busy and no job may wait, so new chats are turned away
+    service.executor.submit('busy', 2, fn=time.sleep)
+    status, body = request(f"{url}/analyze", b'[5.8.2025, 08:30:15] John: hi\n')
+    assert status == 503 and 'full' in body['error']
+
+
+def test_service_exports_and_imports_snapshots(service_url):
+    url, service = service_url
+    with open(SAMPLE_PATH, 'rb') as f:
+        status, body = request(f"{url}/analyze?metrics=basic_stats", f.read())
+    digest = body['hash']
+
+    with urllib.request.urlopen(f"{url}/analysis/{digest}/snapshot") as response:
+        assert response.headers['Content-Type'] == 'application/zip'
+        snapshot = response.read()
+
+    # A fresh cache opens the snapshot without analyzing anything, under the snapshot's own hash
+    service.cache.clear()
+    status, body = request(f"{url}/snapshot", snapshot)
+    assert status == 200 and body['hash'] == content_digest(snapshot) != digest
+    assert service.cache.stats()['entries'] == 1 and service.cache.get(digest) is None
+    status, body = request(f"{url}/analysis/{body['hash']}?metrics=basic_stats")
+    assert status == 200 and body['metrics']['basic_stats']['total_messages'] == 124
+    assert request(f"{url}/snapshot", b'PK not a zip')[0] == 422
@@ -0,0 +1,93 @@
+"""
+Tester for analysis snapshots.
+"""
+import io
+import json
+import os
+import zipfile
+
+import numpy as np
+import pytest
+
+from src.analyzer import analyze_chat
+from src.parser import parse_whatsapp
+from src import snapshot
+from src.snapshot import export_snapshot, import_snapshot, SnapshotError, SNAPSHOT_VERSION
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'conversation_sample.txt')
+
+
+@pytest.fixture(scope="module")
+def results():
+    results = analyze_chat(parse_whatsapp(SAMPLE_PATH))
+    results['fingerprint'] = 'b2-' + '1' * 32
+    return results
+
+
+def assert_same(a, b):
+    """
+    Equal values of the same types, arrays with the same dtype
+    """
+    if isinstance(a, np.ndarray):
+        assert b.dtype == a.dtype and np.array_equal(a, b)
+    elif isinstance(a, dict):
+        assert type(b) is dict and list(a) == list(b)
+        for key in a:
+            assert_same(a[key], b[key])
+    elif isinstance(a, (list, tuple)):
+        assert type(b) is type(a) and len(b) == len(a)
+        for x, y in zip(a, b):
+            assert_same(x, y)
+    else:
+        assert a == b
+
+
+def rewrite_manifest(data, **changes):
+    """
+    Return the snapshot with manifest fields changed
+    """
+    source, target = zipfile.ZipFile(io.BytesIO(data)), io.BytesIO()
+    with zipfile.ZipFile(target, 'w') as archive:
+        for info in source.infolist():
+            content = source.read(info)
+            if info.filename == 'manifest.json':
+                content = json.dumps({**json.loads(content), **changes})
+            archive.writestr(info.filename, content)
+    return target.getvalue()
+
+
+def test_snapshot_round_trip_is_exact(results):
+    data = export_snapshot(results)
+    assert_same(results, import_snapshot(data))
+
+    # Keys like hours stay ints and (item, count) pairs stay tuples
+    restored = import_snapshot(io.BytesIO(data))
+    assert 8 in restored['messages_by_hour']
+    assert restored['most_common_words'][0] == results['most_common_words'][0]
+
+    without_index = import_snapshot(export_snapshot(results, include_indexes=False))
+    assert 'search_index' not in without_index
+    assert len(export_snapshot(results, include_indexes=False)) < len(data)
+
+
+def test_snapshot_versions_are_checked(results, monkeypatch):
+    data = export_snapshot(results)
+
+    with pytest.raises(SnapshotError, match="newer"):
+        import_snapshot(rewrite_manifest(data, version=SNAPSHOT_VERSION + 1))
+    with pytest.raises(SnapshotError, match="Not an analysis snapshot"):
+        import_snapshot(rewrite_manifest(data, format='something-else'))
+    with pytest.raises(SnapshotError, match="Not an analysis snapshot"):
+        import_snapshot(b'not a zip file')
+
+    # Old versions are migrated step by step, or rejected without a migration
+    monkeypatch.setattr(snapshot, 'SNAPSHOT_VERSION', 2)
+    with pytest.raises(SnapshotError, match="no longer supported"):
+        import_snapshot(data)
+    monkeypatch.setitem(snapshot.MIGRATIONS, 1, lambda old: {**old, 'migrated': True})
+    assert import_snapshot(data)['migrated']
+
+
+def test_snapshot_size_limit(results):
+    with pytest.raises(SnapshotError, match="larger"):
+        import_snapshot(export_snapshot(results), max_bytes=1024)
@@ -0,0 +1,95 @@
+"""
+Tester for the synthetic chat generator and the benchmarks.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from src.parser import parse_whatsapp
+
+BENCH_DIR = os.path.join(os.path.dirname(__file__), '..', 'benchmarks')
+
+
+@pytest.fixture
+def synthetic_chat(monkeypatch):
+    """
+    The generator module, imported from benchmarks/ the way the benchmark scripts do
+    """
+    monkeypatch.syspath_prepend(BENCH_DIR)
+    import synthetic_chat
+    return synthetic_chat
+
+
+def test_synthetic_chat_is_deterministic_and_parses_to_its_messages(tmp_path, synthetic_chat):
+    generate_chat, write_chat = synthetic_chat.generate_chat, synthetic_chat.write_chat
+    knobs = dict(users=9, hebrew_ratio=0.0, emoji_density=1.5, multiline_ratio=0.3, system_ratio=0.2, seed=4)
+    data = generate_chat(3000, **knobs)
+    assert data == generate_chat(3000, **knobs)
+    assert data != generate_chat(3000, **{**knobs, 'seed': 5})
+
+    path = tmp_path / 'chat.txt'
+    assert write_chat(str(path), 3000, chunk_lines=100, **knobs) == len(data) == path.stat().st_size
+    # System lines and continuation lines are there, but only the messages are parsed
+    assert len(data.decode('utf-8').splitlines()) > 3000 * 1.2
+    df = parse_whatsapp(str(path))
+    assert len(df) == 3000 and df['user'].nunique() == 9
+    assert not df['message'].str.contains('[֐-׿]').any() and not df['user'].str.contains('[֐-׿]').any()
+
+    hebrew = generate_chat(500, hebrew_ratio=1.0, emoji_density=0.0, date_style='slashes').decode('utf-8')
+    assert '😂' not in hebrew and hebrew.startswith('[01/01/2023')
+
+
+def test_scaling_benchmark_flags_regressions(tmp_path):
+    """
+    Results are written as JSON, and a step slower than the baseline fails the run
+    """
+    baseline, output = tmp_path / 'baseline.json', tmp_path / 'results.json'
+    command = [sys.executable, os.path.join(BENCH_DIR, 'bench_scaling.py'), '--sizes', '2000', '--repeats', '1',
+               '--data-dir', str(tmp_path), '--baseline', str(baseline), '--output', str(output)]
+    subprocess.run(command + ['--save-baseline'], capture_output=True, text=True, check=True)
+
+    results = json.loads(output.read_text())
+    steps = results['sizes']['2000']['steps']
+    assert {'parse', 'emoji_extraction', 'text_frequencies', 'analyze_chat'} <= set(steps)
+    assert results['sizes']['2000']['parsed_messages'] == 2000
+
+    # A baseline ten times faster than this machine
+    recorded = json.loads(baseline.read_text())
+    for step in recorded['sizes']['2000']['steps'].values():
+        step['seconds'] = 1.0
+        step['messages_per_second'] *= 10
+    baseline.write_text(json.dumps(recorded))
+
+    result = subprocess.run(command, capture_output=True, text=True)
+    assert result.returncode == 1
+    assert 'parse at 2,000 messages' in result.stdout
+
+
+def test_memory_benchmark_flags_regressions(tmp_path):
+    """
+    Every stage gets peak and retained memory, and a stage peaking above the baseline fails the run
+    """
+    baseline, output = tmp_path / 'baseline.json', tmp_path / 'results.json'
+    command = [sys.executable, os.path.join(BENCH_DIR, 'bench_memory.py'), '--sizes', '2000',
+               '--data-dir', str(tmp_path), '--baseline', str(baseline), '--output', str(output)]
+    subprocess.run(command + ['--save-baseline'], capture_output=True, text=True, check=True)
+
+    measured = json.loads(output.read_text())['sizes']['2000']
+    assert measured['parsed_messages'] == 2000
+    assert {'parse', 'preprocess_df', 'extract_emojis', 'build_search_index'} <= set(measured['stages'])
+    assert measured['stages']['parse']['peak_bytes'] > measured['stages']['parse']['retained_bytes'] > 0
+    assert measured['job']['peak_bytes'] >= measured['stages']['parse']['peak_bytes']
+
+    # A baseline where every stage needed half the memory
+    recorded = json.loads(baseline.read_text())
+    entry = recorded['sizes']['2000']
+    for stage in [entry['job'], *entry['stages'].values()]:
+        stage['peak_bytes'] = max(stage['peak_bytes'] // 2, 1024 * 1024)
+    baseline.write_text(json.dumps(recorded))
+
+    result = subprocess.run(command, capture_output=True, text=True)
+    assert result.returncode == 1
+    assert '❌ job at 2,000 messages: peak' in result.stdout
@@ -0,0 +1,81 @@
+"""
+Tester for the dashboard components.
+"""
+import os
+
+from streamlit.testing.v1 import AppTest
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'conversation_sample.txt')
+
+
+def render_prebuilt_sample(sample_path):
+    """
+    App script: analyze the sample and prebuild its figures once, then render the tabs
+    """
+    import streamlit as st
+    from analyzer import analyze_chat
+    from figure_cache import FigureCache
+    from parser import parse_whatsapp
+    from streamlit_app import get_visualizer_functions, render_analysis_tabs
+    from ui_components import prebuild_figures
+
+    if 'figure_cache' not in st.session_state:
+        results = analyze_chat(parse_whatsapp(sample_path))
+        results['fingerprint'] = 'sample'
+        figure_cache = FigureCache()
+        prebuild_figures(results, get_visualizer_functions('sample', figure_cache))
+        st.session_state.update(results=results, figure_cache=figure_cache,
+                                prebuilt=figure_cache.stats()['misses'])
+    render_analysis_tabs(st.session_state.results, st.session_state.figure_cache)
+    st.session_state.new_misses = st.session_state.figure_cache.stats()['misses'] - st.session_state.prebuilt
+
+
+def test_prebuild_figures_covers_every_default_figure():
+    """
+    Opening any tab (and any user) with default settings finds all its figures prebuilt
+    """
+    from src.streamlit_app import ANALYSIS_SECTIONS
+
+    app = AppTest.from_function(render_prebuilt_sample, args=(SAMPLE_PATH,), default_timeout=60)
+    app.run()
+    users = list(app.session_state.results['messages_per_user'])
+    for section in ANALYSIS_SECTIONS:
+        app.session_state['active_section'] = section
+        for user in (users if section == "User Analysis" else users[:1]):
+            app.session_state['user_selector'] = user
+            app.run()
+            assert not app.exception
+            assert app.session_state.new_misses == 0, (section, user)
+
+
+def render_word_cloud_future():
+    """
+    App script: the word cloud section, with a word cloud future the test completes
+    """
+    import streamlit as st
+    from concurrent.futures import Future
+    from ui_components import render_word_cloud_section
+
+    cloud = st.session_state.setdefault('cloud', Future())
+    results = {'word_vocabulary': [('coffee', 3)], 'messages_per_user': {}}
+    render_word_cloud_section(results, {'word_cloud': lambda user, frequencies, top_n: cloud})
+
+
+def test_word_cloud_section_does_not_wait_for_the_cloud():
+    """
+    A word cloud still rendering shows a notice and lets the run finish, the image comes on a later run
+    """
+    import io
+    from PIL import Image
+
+    app = AppTest.from_function(render_word_cloud_future, default_timeout=10)
+    app.run()
+    assert not app.exception
+    assert [info.value for info in app.info] == ["Rendering word cloud..."]
+
+    png = io.BytesIO()
+    Image.new('RGB', (4, 4)).save(png, format='PNG')
+    app.session_state.cloud.set_result(png.getvalue())
+    app.run()
+    assert not app.exception
+    assert not app.info and len(app.get('image')) == 1
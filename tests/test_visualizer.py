@@ -0,0 +1,64 @@
+"""
+Tester for the visualizer helpers.
+"""
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from src.visualizer import (
+    downsample_lttb,
+    get_fig_activity_timeline,
+    get_fig_messages_per_user,
+    get_fig_most_common_phrases,
+    get_fig_most_common_words,
+    is_downsampled,
+    WEBGL_POINT_THRESHOLD,
+    render_word_cloud,
+)
+
+
+def test_downsample_lttb_keeps_endpoints_and_peaks():
+    y = np.zeros(10_000)
+    y[4321] = 100
+    keep = downsample_lttb(np.arange(len(y)), y, 500)
+
+    assert len(keep) == 500
+    assert keep[0] == 0 and keep[-1] == len(y) - 1
+    assert (np.diff(keep) > 0).all()
+    assert 4321 in keep
+
+def test_downsample_lttb_short_series_untouched():
+    assert list(downsample_lttb(np.arange(5), np.arange(5), 100)) == [0, 1, 2, 3, 4]
+
+def test_activity_timeline_switches_to_webgl_for_long_series():
+    short = dict(zip(pd.date_range("2024-01-01", periods=30), range(30)))
+    fig = get_fig_activity_timeline(short)
+    assert isinstance(fig.data[0], go.Bar)
+
+    # Up to the threshold every point is sent, as the timeline caption tells the user
+    n = WEBGL_POINT_THRESHOLD
+    assert not is_downsampled(n)
+    fig = get_fig_activity_timeline(dict(zip(pd.date_range("2000-01-01", periods=n), range(n))))
+    assert len(fig.data[0].x) == n
+
+    n = WEBGL_POINT_THRESHOLD + 1
+    assert is_downsampled(n)
+    long = dict(zip(pd.date_range("2000-01-01", periods=n), range(n)))
+    fig = get_fig_activity_timeline(long, long, max_points=300)
+    assert all(isinstance(trace, go.Scattergl) for trace in fig.data)
+    assert len(fig.data[0].x) == 300
+
+def test_plotly_figures_get_hebrew_labels_in_logical_order():
+    # The browser applies the bidi algorithm itself, reordering here would show them backwards
+    fig = get_fig_messages_per_user({'יונתן כהן': 5, 'דנה לוי 2': 3, 'John': 1})
+    assert list(fig.data[0].x) == ['יונתן כהן', 'דנה לוי 2', 'John']
+
+    fig = get_fig_most_common_words([('שלום', 9), ('coffee', 4)])
+    assert list(fig.data[0].y) == ['שלום', 'coffee']
+
+    fig = get_fig_most_common_phrases([('בוקר טוב', 3)])
+    assert list(fig.data[0].y) == ['בוקר טוב']
+
+def test_render_word_cloud_png_with_hebrew():
+    words = [("שלום", 50), ("hello", 30), ("בוקר", 20), ("coffee", 10)]
+    png = render_word_cloud(words, top_n=3, width=300, height=150)
+    assert png.startswith(b"\x89PNG")